@@ -3,166 +3,65 @@ import os
 import traceback
 import tempfile
 import json
-import uuid
-from typing import Dict, Any, List, Optional
-
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import base64
+import shutil
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel, Field
 
-# OCR / image libs
-from pdf2image import convert_from_path
-from PIL import Image
-import pytesseract
-import cv2
-import numpy as np
-
-# -----------------------
-# Tesseract / Poppler setup
-# - Use environment variables when provided
-#   - TESSERACT_CMD  -> full path to tesseract executable (optional)
-#   - POPPLER_PATH   -> directory containing pdftoppm (optional on Windows)
-# -----------------------
-if os.environ.get("TESSERACT_CMD"):
-    pytesseract.pytesseract.tesseract_cmd = os.environ["TESSERACT_CMD"]
-# If not provided, assume tesseract is on PATH (Dockerfile / system install should ensure that)
-
-# -----------------------
-# Try to import extractor(s)
-# Prefer DocumentExtractor (src.parsers.doc_extractor) if present,
-# otherwise try prescription parser class or function names.
-# All imports are best-effort; failing to import is non-fatal.
-# -----------------------
-DocumentExtractor = None
-PrescriptionParser = None
-extract_entities_func = None
-PatientDetails = None
-
-try:
-    from src.parsers.doc_extractor import DocumentExtractor  # type: ignore
-except Exception:
-    DocumentExtractor = None
-
-# PrescriptionParser class (common)
-if DocumentExtractor is None:
-    try:
-        from src.parsers.prescription_parser import PrescriptionParser  # type: ignore
-    except Exception:
-        PrescriptionParser = None
-    try:
-        # fallback to top-level file name used in earlier exercises
-        from extract_entities_regex import PrescriptionParser as PrescriptionParser2  # type: ignore
-        if PrescriptionParser is None:
-            PrescriptionParser = PrescriptionParser2
-    except Exception:
-        pass
-
-# function-style extractors
-try:
-    from src.parsers.prescription_parser import extract_entities_from_ocr_text as extract_entities_func  # type: ignore
-except Exception:
-    extract_entities_func = None
-
-if extract_entities_func is None:
-    try:
-        from extract_entities_regex import extract_entities as extract_entities_func  # type: ignore
-    except Exception:
-        extract_entities_func = None
-
-# PatientDetails normalizer (optional)
-try:
-    from src.models.patient_details import PatientDetails  # type: ignore
-except Exception:
-    try:
-        from patient_details import PatientDetails  # type: ignore
-    except Exception:
-        PatientDetails = None
-
-# -----------------------
-# Helpers: poppler/tesseract env, pdf->images, preprocessing, ocr
-# -----------------------
-def set_external_binaries() -> Optional[str]:
-    """
-    Read POPPLER_PATH (dir with pdftoppm) and TESSERACT_CMD env vars.
-    Return poppler_path (or None).
-    """
-    poppler_path = os.environ.get("POPPLER_PATH")
-    # TESSERACT_CMD applied earlier at import time; re-read if needed
-    tcmd = os.environ.get("TESSERACT_CMD")
-    if tcmd:
-        pytesseract.pytesseract.tesseract_cmd = tcmd
-    return poppler_path
-
-def pdf_to_images(pdf_path: str, poppler_path: Optional[str] = None, dpi: int = 300):
-    if poppler_path:
-        return convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path)
-    return convert_from_path(pdf_path, dpi=dpi)
-
-def preprocess_image_for_ocr(pil_image: Image.Image) -> Image.Image:
-    arr = np.array(pil_image.convert("RGB"))
-    gray = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-    denoised = cv2.medianBlur(gray, 3)
-    thresh = cv2.adaptiveThreshold(
-        denoised, 255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY,
-        blockSize=15,
-        C=9
-    )
-    return Image.fromarray(thresh)
-
-def ocr_pages(pages: List[Image.Image]) -> str:
-    out = []
-    for i, p in enumerate(pages, start=1):
-        proc = preprocess_image_for_ocr(p)
-        txt = pytesseract.image_to_string(proc, config="--oem 3 --psm 6")
-        out.append(f"===== PAGE {i} =====\n{txt}\n")
-    return "\n".join(out)
-
-def run_extractor_on_text(ocr_text: str) -> Dict[str, Any]:
-    """
-    Try DocumentExtractor, PrescriptionParser (class), or extract function.
-    Always return a dict (maybe empty).
-    """
-    try:
-        if DocumentExtractor is not None:
-            try:
-                de = DocumentExtractor()
-                # DocumentExtractor.extract_from_text() typically returns dict with keys "entities","patient",...
-                res = de.extract_from_text(ocr_text)
-                # prefer nested 'entities' if present
-                if isinstance(res, dict) and "entities" in res:
-                    return res.get("entities", {}) or {}
-                if isinstance(res, dict):
-                    return res
-                return {}
-            except Exception:
-                print("=== DocumentExtractor error ===")
-                print(traceback.format_exc())
-                return {}
-        if PrescriptionParser is not None:
-            try:
-                p = PrescriptionParser(ocr_text)
-                if hasattr(p, "parse"):
-                    return p.parse() or {}
-                return {}
-            except Exception:
-                print("=== PrescriptionParser error ===")
-                print(traceback.format_exc())
-                return {}
-        if extract_entities_func is not None:
-            try:
-                return extract_entities_func(ocr_text) or {}
-            except Exception:
-                print("=== extract_entities_func error ===")
-                print(traceback.format_exc())
-                return {}
-    except Exception:
-        print("=== Unknown extractor error ===")
-        print(traceback.format_exc())
-        return {}
-    return {}
+# The extraction pipeline and its env-driven components (rasterizer, OCR
+# limits, page memory budget, dedup, gate...) live in pipeline.py, which
+# worker.py imports as well
+from pipeline import (extract_pdf_file, extract_documents, set_external_binaries, OcrOptions, PARSER_VERSION,
+                      MEMORY_GOVERNOR, MemoryBudgetExceeded, PAGE_CACHE, OCR_CONCURRENCY, OCR_PROCESS_WORKERS,
+                      CancelToken, EXTRACT_TIMEOUT_SECONDS, EXTRACT_MAX_TIMEOUT_SECONDS)
+from src.parsers.field_targets import parse_fields
+from src.runtime.shared_pages import live_segments
+
+# Job queue for split API / worker deployments:
+#   OCR_MODE=inline (default) -> /extract runs OCR in this process
+#   OCR_MODE=queue            -> /extract enqueues; `python worker.py` processes do the OCR
+OCR_MODE = os.environ.get("OCR_MODE", "inline").lower()
+JOB_QUEUE = None
+if OCR_MODE == "queue":
+    from src.jobs.queue import JobQueue
+    JOB_QUEUE = JobQueue.from_env()
+# finished jobs are purged (JOB_RETENTION_SECONDS) from the enqueue path at most this often
+JOB_GC_INTERVAL_SECONDS = float(os.environ.get("JOB_GC_INTERVAL_SECONDS", "600"))
+_last_job_gc = 0.0
+
+# Conditional GET (ETag / If-None-Match) and Cache-Control for the polled read endpoints
+from src.runtime.http_cache import make_etag, not_modified, cache_headers, NO_STORE, REVALIDATE, FINAL
+from src.jobs.queue import DONE as JOB_DONE, FAILED as JOB_FAILED
+
+# Resumable (tus-style) uploads spooled to disk (see UPLOAD_* env vars)
+from src.jobs.uploads import UploadSpool, UploadError
+UPLOADS = UploadSpool.from_env()
+UPLOAD_GC_INTERVAL_SECONDS = float(os.environ.get("UPLOAD_GC_INTERVAL_SECONDS", "600"))
+
+# Per-request timing trace and the admin-only profiler
+from src.runtime.timing import RequestTimer, RequestTimerMiddleware
+from src.runtime.profiler import run_profiled
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Admission control: interactive / bulk lanes (see ADMISSION_* env vars)
+from src.runtime.admission import AdmissionController, AdmissionRejected
+ADMISSION = AdmissionController.from_env()
+
+# Stored extractions (JSONL) and their columnar export (pyarrow optional)
+from src.store.jsonl_store import JsonlStore, StoreBusy, parse_ts
+from src.store.reparse import reparse_store
+from src.store.stats import StoreStats
+from src.store.columnar import stream_ipc, ColumnarUnavailable, TABLES as COLUMNAR_TABLES
 
 # -----------------------
 # FastAPI application
@@ -177,81 +76,376 @@ ALLOWED_ORIGINS = [
     "http://localhost",
 ]
 
+app.add_middleware(RequestTimerMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # resumable upload clients read these from PATCH / HEAD / POST /uploads responses
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Tus-Resumable", "Retry-After", "ETag"],
 )
 
 # -----------------------
 # /extract endpoint
 # -----------------------
+
+def request_ocr_options(fields: Optional[str]) -> OcrOptions:
+    """OcrOptions for a request's ?fields= (400 on unknown field names)."""
+    try:
+        return OcrOptions(fields=parse_fields(fields or "") or None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def request_timeout(request: Request, timeout: Optional[float]) -> float:
+    """
+    Deadline for a request: ?timeout= query param, else X-Request-Timeout
+    header, else EXTRACT_TIMEOUT_SECONDS; capped at EXTRACT_MAX_TIMEOUT_SECONDS.
+    """
+    if timeout is None:
+        try:
+            timeout = float(request.headers.get("x-request-timeout") or EXTRACT_TIMEOUT_SECONDS)
+        except ValueError:
+            timeout = EXTRACT_TIMEOUT_SECONDS
+    if timeout <= 0:
+        timeout = EXTRACT_TIMEOUT_SECONDS
+    return min(timeout, EXTRACT_MAX_TIMEOUT_SECONDS)
+
+async def run_cancellable(request: Request, token: CancelToken, func, *args):
+    """
+    Run a blocking pipeline call in the threadpool while watching for the
+    client going away; on disconnect the token is cancelled, which stops
+    pending pages and kills running tesseract/pdftoppm children.
+    """
+    task = asyncio.ensure_future(run_in_threadpool(func, *args))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=0.5)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                token.cancel("client disconnected")
+    finally:
+        token.close()
+
 @app.post("/extract")
-async def extract_prescription(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def extract_prescription(request: Request,
+                               file: UploadFile = File(...),
+                               timeout: Optional[float] = Query(default=None, description="Deadline in seconds"),
+                               profile: bool = Query(default=False, description="Admin only: attach a profiler report"),
+                               priority: Optional[str] = Query(default=None, description="interactive (default) or bulk"),
+                               fields: Optional[str] = Query(default=None, description="Comma-separated fields; stop OCR once they are found")) -> Dict[str, Any]:
     poppler_path = set_external_binaries()
-    warnings: List[str] = []
+    timer = getattr(request.state, "timer", None) or RequestTimer()
 
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF uploads are supported.")
+    if profile and (not ADMIN_TOKEN or request.headers.get("x-admin-token") != ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid X-Admin-Token.")
+    options = request_ocr_options(fields)
+
+    if JOB_QUEUE is not None:
+        return await enqueue_extraction(file, request_timeout(request, timeout), options)
 
+    # request arrival -> multipart body received (before any admission wait)
+    timer.add("upload", timer.total_seconds())
     try:
-        with tempfile.TemporaryDirectory() as td:
-            tmp_pdf = os.path.join(td, "upload.pdf")
-            # read file content
+        async with admitted(timer, priority or request.headers.get("x-priority")):
+            return await _extract_admitted(request, file, poppler_path, timer, timeout, profile, options)
+    except AdmissionRejected as e:
+        return JSONResponse(status_code=e.status_code,
+                            content={"detail": f"Server is saturated ({e.reason}); retry later.", "lane": e.lane},
+                            headers={"Retry-After": str(e.retry_after)})
+
+@asynccontextmanager
+async def admitted(timer: RequestTimer, lane: Optional[str]):
+    """ADMISSION.admit(lane), with the wait for a slot recorded as the "queue" stage."""
+    t0 = time.perf_counter()
+    async with ADMISSION.admit(lane):
+        timer.add("queue", time.perf_counter() - t0)
+        yield
+
+async def _extract_admitted(request: Request, file: UploadFile, poppler_path: Optional[str],
+                            timer: RequestTimer, timeout: Optional[float], profile: bool,
+                            options: Optional[OcrOptions] = None) -> JSONResponse:
+    with tempfile.TemporaryDirectory() as td:
+        tmp_pdf = os.path.join(td, "upload.pdf")
+        # spooling the received body to disk counts as upload too
+        with timer.span("upload"):
             content = await file.read()
             with open(tmp_pdf, "wb") as fw:
                 fw.write(content)
-
-            # pdf -> images
-            pages = []
-            try:
-                pages = pdf_to_images(tmp_pdf, poppler_path=poppler_path, dpi=300)
-            except Exception:
-                warnings.append("PDF->image conversion failed (poppler may be missing). OCR skipped.")
-                print("=== PDF->IMAGE ERROR ===")
-                print(traceback.format_exc())
-
-            # OCR
-            ocr_text = ""
-            if pages:
-                try:
-                    ocr_text = ocr_pages(pages)
-                except Exception:
-                    warnings.append("OCR failed (tesseract may be missing). Using placeholder text.")
-                    print("=== OCR ERROR ===")
-                    print(traceback.format_exc())
-                    ocr_text = "### OCR_FAILED ###\n"
-            else:
-                ocr_text = "### NO_PAGES ###\n"
-
-            # run extractor
-            entities = run_extractor_on_text(ocr_text) or {}
-
-            # patient normalization if available
-            patient_obj = None
-            if PatientDetails is not None:
-                try:
-                    patient = PatientDetails.from_extractor(entities or {})
-                    patient_obj = patient.to_model().dict()
-                except Exception:
-                    warnings.append("PatientDetails normalization failed.")
-                    print("=== PATIENT DETAILS ERROR ===")
-                    print(traceback.format_exc())
-
-            result = {"text": ocr_text, "entities": entities, "patient": patient_obj, "warnings": warnings}
-            return JSONResponse(status_code=200, content=result)
-
+            del content
+        return await _extract_spooled(request, tmp_pdf, poppler_path, timer, timeout, profile, options)
+
+async def _extract_spooled(request: Request, pdf_path: str, poppler_path: Optional[str],
+                           timer: RequestTimer, timeout: Optional[float], profile: bool,
+                           options: Optional[OcrOptions] = None) -> JSONResponse:
+    """Run the pipeline on a PDF already on disk (admission already granted)."""
+    token = CancelToken(request_timeout(request, timeout))
+    try:
+        # OCR + extraction off the event loop so other requests keep being served
+        if profile:
+            result, report = await run_cancellable(request, token, run_profiled, extract_pdf_file,
+                                                   pdf_path, poppler_path, token, timer, options)
+            result["profile"] = report
+        else:
+            result = await run_cancellable(request, token, extract_pdf_file, pdf_path, poppler_path, token, timer,
+                                           options)
+        headers = {"Server-Timing": timer.server_timing()}
+        if result.get("partial") and not result.get("pages"):
+            return JSONResponse(status_code=504, content={"detail": f"No page finished in time ({token.reason}).",
+                                                          "warnings": result.get("warnings", [])},
+                                headers=headers)
+        return JSONResponse(status_code=200, content=result, headers=headers)
+
+    except MemoryBudgetExceeded as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Server is busy processing other documents; retry later."},
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception:
         print("=== SERVER ERROR ===")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Internal Server Error — see server logs.")
+    finally:
+        token.close()
+
+async def enqueue_extraction(file: UploadFile, timeout: float, options: Optional[OcrOptions] = None) -> JSONResponse:
+    """Spool the upload for the worker pool and answer 202 with the job location."""
+    def spool(path: str) -> None:
+        with open(path, "wb") as fw:
+            shutil.copyfileobj(file.file, fw)
+    return await _enqueue_job(spool, job_options(timeout, file.filename, options))
+
+def job_options(timeout: float, filename: Optional[str], options: Optional[OcrOptions]) -> Dict[str, Any]:
+    """Per-job options stored with a queued job; worker.py turns them back into OcrOptions."""
+    out: Dict[str, Any] = {"timeout": timeout, "filename": filename}
+    if options is not None and options.fields:
+        out["fields"] = list(options.fields)
+    return out
+
+async def purge_finished_jobs() -> None:
+    """Drop finished jobs older than JOB_RETENTION_SECONDS, at most once per JOB_GC_INTERVAL_SECONDS."""
+    global _last_job_gc
+    now = time.monotonic()
+    if now - _last_job_gc < JOB_GC_INTERVAL_SECONDS:
+        return
+    _last_job_gc = now
+    try:
+        removed = await run_in_threadpool(JOB_QUEUE.purge)
+        if removed:
+            print(f"=== PURGED {removed} FINISHED JOBS ===")
+    except Exception:
+        print("=== JOB GC ERROR ===")
+        print(traceback.format_exc())
+
+async def _enqueue_job(fill, options: Dict[str, Any]) -> JSONResponse:
+    """fill(path) puts the PDF at the job's payload path; then the job is queued."""
+    await purge_finished_jobs()
+    job_id, path = JOB_QUEUE.new_payload_path()
+    try:
+        await run_in_threadpool(fill, path)
+        await run_in_threadpool(JOB_QUEUE.enqueue, job_id, path, options)
+    except Exception:
+        print("=== ENQUEUE ERROR ===")
+        print(traceback.format_exc())
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise HTTPException(status_code=500, detail="Failed to queue extraction job.")
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"},
+                        headers={"Location": f"/jobs/{job_id}"})
+
+def job_cache(status: str, updated: float) -> Tuple[str, str]:
+    """(ETag, Cache-Control) for a job state; finished jobs never change."""
+    return (make_etag("job", status, repr(updated)),
+            FINAL if status in (JOB_DONE, JOB_FAILED) else REVALIDATE)
+
+@app.get("/jobs/{job_id}")
+def get_job(request: Request, job_id: str):
+    """
+    Job status and result. ETag = status + last update, checked without
+    loading the result; finished jobs never change and may be cached.
+    """
+    if JOB_QUEUE is None:
+        raise HTTPException(status_code=404, detail="Job queue is not enabled (OCR_MODE=queue).")
+    version = JOB_QUEUE.version(job_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    cached = not_modified(request.headers.get("if-none-match"), *job_cache(*version))
+    if cached is not None:
+        return cached
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    # from the row actually returned, in case the job moved on in between
+    return JSONResponse(content={
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created": job["created"],
+        "updated": job["updated"],
+        "result": job["result"],
+        "error": job["error"],
+    }, headers=cache_headers(*job_cache(job["status"], job["updated"])))
+
+# -----------------------
+# Resumable uploads (tus-style)
+#   POST   /uploads               Upload-Length (+ optional Upload-Metadata) -> 201, Location
+#   PATCH  /uploads/{id}          Upload-Offset, body = next bytes            -> 204, Upload-Offset
+#   HEAD   /uploads/{id}          -> Upload-Offset / Upload-Length (where to resume)
+#   DELETE /uploads/{id}          -> 204
+#   POST   /uploads/{id}/extract  -> same response as /extract (202 in queue mode)
+# -----------------------
+TUS_VERSION = "1.0.0"
+_last_upload_gc = 0.0
+
+def upload_metadata(header: Optional[str]) -> Dict[str, str]:
+    """Decode tus Upload-Metadata: comma-separated "key base64(value)" pairs."""
+    out: Dict[str, str] = {}
+    for pair in (header or "").split(","):
+        parts = pair.strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        try:
+            out[parts[0]] = base64.b64decode(parts[1]).decode("utf-8") if len(parts) > 1 else ""
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail=f"Bad Upload-Metadata value for {parts[0]!r}.")
+    return out
+
+async def purge_stale_uploads() -> None:
+    """Drop abandoned uploads, at most once per UPLOAD_GC_INTERVAL_SECONDS."""
+    global _last_upload_gc
+    now = time.monotonic()
+    if now - _last_upload_gc < UPLOAD_GC_INTERVAL_SECONDS:
+        return
+    _last_upload_gc = now
+    try:
+        removed = await run_in_threadpool(UPLOADS.purge)
+        if removed:
+            print(f"=== PURGED {removed} STALE UPLOADS ===")
+    except Exception:
+        print("=== UPLOAD GC ERROR ===")
+        print(traceback.format_exc())
+
+def _upload_info(upload_id: str) -> Dict[str, Any]:
+    try:
+        return UPLOADS.info(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.post("/uploads")
+async def create_upload(request: Request):
+    await purge_stale_uploads()
+    try:
+        length = int(request.headers.get("upload-length", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Length header is required.")
+    meta = upload_metadata(request.headers.get("upload-metadata"))
+    if meta.get("filename") and not meta["filename"].lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF uploads are supported.")
+    try:
+        upload_id = await run_in_threadpool(UPLOADS.create, length, meta)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return JSONResponse(status_code=201, content={"upload_id": upload_id, "offset": 0, "length": length},
+                        headers={"Location": f"/uploads/{upload_id}", "Upload-Offset": "0",
+                                 "Tus-Resumable": TUS_VERSION})
+
+@app.patch("/uploads/{upload_id}")
+async def patch_upload(upload_id: str, request: Request):
+    """
+    Append the request body at Upload-Offset. Bytes go to the spool file
+    as they arrive; if the connection drops, what was received is kept
+    and HEAD reports the offset to resume from.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream.")
+    try:
+        offset = int(request.headers.get("upload-offset", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required.")
+    try:
+        with UPLOADS.writer(upload_id, offset) as write:
+            try:
+                async for piece in request.stream():
+                    if piece:
+                        await run_in_threadpool(write, piece)
+            except ClientDisconnect:
+                pass
+        info = UPLOADS.info(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(status_code=204, headers={"Upload-Offset": str(info["offset"]),
+                                              "Tus-Resumable": TUS_VERSION})
+
+@app.head("/uploads/{upload_id}")
+def upload_offset(upload_id: str):
+    info = _upload_info(upload_id)
+    return Response(status_code=200, headers={"Upload-Offset": str(info["offset"]),
+                                              "Upload-Length": str(info["length"]),
+                                              "Cache-Control": "no-store",
+                                              "Tus-Resumable": TUS_VERSION})
+
+@app.delete("/uploads/{upload_id}")
+def delete_upload(upload_id: str):
+    _upload_info(upload_id)
+    UPLOADS.delete(upload_id)
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
+
+@app.post("/uploads/{upload_id}/extract")
+async def extract_upload(request: Request, upload_id: str,
+                         timeout: Optional[float] = Query(default=None, description="Deadline in seconds"),
+                         profile: bool = Query(default=False, description="Admin only: attach a profiler report"),
+                         priority: Optional[str] = Query(default=None, description="interactive (default) or bulk"),
+                         fields: Optional[str] = Query(default=None, description="Comma-separated fields; stop OCR once they are found")):
+    """
+    Extract a completed upload. The upload is consumed on success (or
+    when handed to the job queue); after a 429/503/504 it stays in place
+    so the client can retry without re-sending the file.
+    """
+    poppler_path = set_external_binaries()
+    timer = getattr(request.state, "timer", None) or RequestTimer()
+    if profile and (not ADMIN_TOKEN or request.headers.get("x-admin-token") != ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid X-Admin-Token.")
+    options = request_ocr_options(fields)
+    info = _upload_info(upload_id)
+    if info["offset"] != info["length"]:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete: {info['offset']} of {info['length']} bytes.")
+
+    if JOB_QUEUE is not None:
+        return await _enqueue_job(lambda path: UPLOADS.take(upload_id, path),
+                                  job_options(request_timeout(request, timeout),
+                                              info["metadata"].get("filename"), options))
+
+    try:
+        async with admitted(timer, priority or request.headers.get("x-priority")):
+            response = await _extract_spooled(request, info["path"], poppler_path, timer, timeout, profile, options)
+    except AdmissionRejected as e:
+        return JSONResponse(status_code=e.status_code,
+                            content={"detail": f"Server is saturated ({e.reason}); retry later.", "lane": e.lane},
+                            headers={"Retry-After": str(e.retry_after)})
+    if response.status_code == 200:
+        UPLOADS.delete(upload_id)
+    return response
 
 # -----------------------
 # Storage endpoints
+# - STORE_FILE -> append-only JSONL store (default stored_extractions.jsonl)
 # -----------------------
-STORE_FILE = "stored_extractions.jsonl"
+STORE_FILE = os.environ.get("STORE_FILE", "stored_extractions.jsonl")
+STORE = JsonlStore(STORE_FILE)
+
+# Aggregates behind /stats (see src/store/stats.py)
+# - STATS_STATE_FILE    -> where the aggregates are saved between restarts
+#                          (default: <STORE_FILE>.stats.json, "" = not saved)
+# - STATS_SAVE_SECONDS  -> save at most this often
+STATS = StoreStats(STORE, state_path=os.environ.get("STATS_STATE_FILE", STORE_FILE + ".stats.json") or None,
+                   save_interval=float(os.environ.get("STATS_SAVE_SECONDS", "30")))
 
 class MedicineModel(BaseModel):
     name: str = Field(default="")
@@ -266,36 +460,185 @@ class ExtractedEntityModel(BaseModel):
     medicines: List[MedicineModel] = Field(default_factory=list)
     refills: Optional[int] = Field(default=0)
     warnings: Optional[List[str]] = Field(default_factory=list)
+    patient: Optional[Dict[str, Any]] = Field(default=None)
+    # "text" and "parser_version" of the /extract response, so the record can be re-parsed later
+    raw_text: Optional[str] = Field(default=None)
+    parser_version: Optional[int] = Field(default=None)
+
+# fields reparse recomputes from raw_text (warnings describe the OCR run and are kept)
+REPARSED_FIELDS = ("doctor_name", "patient_name", "date", "patient_address", "medicines", "refills", "patient")
 
 @app.post("/store")
-async def store_extraction(item: ExtractedEntityModel):
+def store_extraction(item: ExtractedEntityModel):
     rec = item.dict()
-    rec["_id"] = str(uuid.uuid4())
-    rec["_ts"] = __import__("datetime").datetime.utcnow().isoformat() + "Z"
-    os.makedirs(os.path.dirname(STORE_FILE) or ".", exist_ok=True)
-    with open(STORE_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    version = rec.pop("parser_version")
+    for key in ("raw_text", "patient"):
+        if rec[key] is None:
+            del rec[key]
+    if version is not None:
+        rec["_parser_version"] = version
+    rec = STORE.append(rec)
+    try:
+        # reads just the appended line, never waits on /stats; anything it
+        # skips (backfill, rebuild after a rewrite) is done by the next /stats
+        STATS.catch_up(backfill=False)
+    except Exception:
+        print("=== STATS UPDATE FAILED ===")
+        print(traceback.format_exc())
     return {"status": "ok", "id": rec["_id"]}
 
+def reparse_fields(raw_text: str) -> Dict[str, Any]:
+    """
+    Text-level extraction of a stored record's fields (runs in the
+    /store/reparse thread, or in reparse_store.py's pool workers). A multi-prescription text keeps the first prescription's
+    fields, as /extract returns them.
+    """
+    entities, patient_obj, _ = extract_documents(raw_text, [], parallel=False)
+    entities = {k: v for k, v in (entities or {}).items() if k in REPARSED_FIELDS and v is not None}
+    item = ExtractedEntityModel(**entities, patient=patient_obj)
+    return item.dict(include=set(REPARSED_FIELDS))
+
+# One re-parse at a time, run in a background thread of this process. It
+# parses in that thread (workers=0): the API never spawns a pool of its
+# own for it. Bulk upgrades with all cores: reparse_store.py.
+_reparse_lock = threading.Lock()
+_reparse_state: Dict[str, Any] = {"status": "idle"}
+
+def _require_admin(request: Request, what: str) -> None:
+    if not ADMIN_TOKEN or request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail=f"{what} requires a valid X-Admin-Token.")
+
+def _run_reparse(force: bool) -> None:
+    try:
+        res = reparse_store(STORE, reparse_fields, PARSER_VERSION, workers=0, force=force)
+        _reparse_state.update(status="done", result=res)
+    except StoreBusy as e:
+        _reparse_state.update(status="failed", error=str(e))
+    except Exception:
+        print("=== REPARSE ERROR ===")
+        print(traceback.format_exc())
+        _reparse_state.update(status="failed", error="Reparse failed; see server log.")
+    finally:
+        _reparse_state["finished"] = time.time()
+        _reparse_lock.release()
+
+@app.post("/store/reparse")
+def reparse_stored(request: Request, force: bool = False):
+    """
+    Start re-running text-level extraction for stored records whose
+    _parser_version is older than PARSER_VERSION (or all with force=true),
+    rewriting the store in place. Admin only (X-Admin-Token). Returns 202
+    at once; GET /store/reparse (the Location) reports progress and, when
+    done, counts and throughput. 409 while a reparse is running here.
+    """
+    _require_admin(request, "Reparse")
+    if not _reparse_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A reparse is already running.")
+    try:
+        _reparse_state.clear()
+        _reparse_state.update(status="running", force=force, started=time.time())
+        body = dict(_reparse_state)
+        threading.Thread(target=_run_reparse, args=(force,), name="store-reparse", daemon=True).start()
+    except BaseException:
+        _reparse_state.update(status="failed", error="Could not start the reparse.")
+        _reparse_lock.release()
+        raise
+    return JSONResponse(status_code=202, content=body,
+                        headers={"Location": "/store/reparse"})
+
+@app.get("/store/reparse")
+def reparse_status(request: Request):
+    """State of the last reparse started here: idle, running, done (with result) or failed."""
+    _require_admin(request, "Reparse status")
+    return JSONResponse(content=dict(_reparse_state), headers=cache_headers(None, NO_STORE))
+
 @app.get("/list")
-def list_saved(limit: int = 50) -> Dict[str, Any]:
-    out: List[Dict[str, Any]] = []
-    if not os.path.exists(STORE_FILE):
-        return {"count": 0, "results": []}
+def list_saved(request: Request, limit: int = 50):
+    """Last `limit` stored records. ETag = store version; If-None-Match answers 304 without reading."""
+    etag = make_etag("list", STORE.version(), limit)
+    cached = not_modified(request.headers.get("if-none-match"), etag, REVALIDATE)
+    if cached is not None:
+        return cached
     try:
-        with open(STORE_FILE, "r", encoding="utf-8") as f:
-            lines = [l.strip() for l in f if l.strip()]
-            for ln in lines[-limit:][::-1]:
-                try:
-                    out.append(json.loads(ln))
-                except Exception:
-                    continue
+        out = STORE.tail(limit)
     except Exception:
         print("=== READ STORE FAILED ===")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Failed to read store.")
-    return {"count": len(out), "results": out}
+    return JSONResponse(content={"count": len(out), "results": out}, headers=cache_headers(etag, REVALIDATE))
+
+@app.get("/stats")
+def store_stats(request: Request, days: int = Query(30, ge=0, le=366), top: int = Query(10, ge=0, le=100)):
+    """
+    Live aggregates over the store: records per day (last `days` days with
+    records), the `top` medicines, refills and warning rates. Maintained
+    incrementally; the first call backfills from the store once. ETag =
+    store version, so If-None-Match answers 304 without any work.
+    """
+    etag = make_etag("stats", STORE.version(), days, top)
+    cached = not_modified(request.headers.get("if-none-match"), etag, REVALIDATE)
+    if cached is not None:
+        return cached
+    try:
+        STATS.catch_up()
+        out = STATS.snapshot(days=days, top=top)
+    except Exception:
+        print("=== STATS FAILED ===")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Failed to compute store statistics.")
+    return JSONResponse(content=out, headers=cache_headers(etag, REVALIDATE))
+
+@app.get("/export/{table}.arrow")
+def export_arrow(request: Request, table: str, since: Optional[str] = None,
+                 chunk: int = Query(10000, ge=1, le=100000)):
+    """
+    Stream stored records as an Arrow IPC stream, one table per request:
+    /export/extractions.arrow or /export/medicines.arrow (flattened, keyed
+    by extraction_id). ?since=<ISO ts> exports only records changed after
+    that watermark, re-parsed ones included; clients keep the latest _ts /
+    _reparsed_ts of what they received.
+    """
+    if table not in COLUMNAR_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table; expected one of {list(COLUMNAR_TABLES)}.")
+    try:
+        watermark = parse_ts(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be an ISO-8601 timestamp.")
+    etag = make_etag("export", table, STORE.version(), since or "", chunk)
+    cached = not_modified(request.headers.get("if-none-match"), etag, REVALIDATE)
+    if cached is not None:
+        return cached
+    try:
+        body = stream_ipc(STORE, table, since=watermark, chunk_size=chunk)
+        first = next(body)
+    except ColumnarUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    def chunks():
+        yield first
+        yield from body
+
+    return StreamingResponse(chunks(), media_type="application/vnd.apache.arrow.stream",
+                             headers=cache_headers(etag, REVALIDATE))
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 while the interactive lane is saturated, so the LB routes elsewhere."""
+    body = {"ready": ADMISSION.ready, "lanes": ADMISSION.snapshot(),
+            "memory_waiting": MEMORY_GOVERNOR.snapshot()["waiting"]}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body,
+                        headers=cache_headers(None, NO_STORE))
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    out: Dict[str, Any] = {"status": "ok", "memory": MEMORY_GOVERNOR.snapshot(),
+                           "admission": ADMISSION.snapshot()}
+    if PAGE_CACHE is not None:
+        out["page_cache"] = PAGE_CACHE.stats()
+    if JOB_QUEUE is not None:
+        out["jobs"] = JOB_QUEUE.counts()
+    if OCR_CONCURRENCY is not None:
+        out["ocr_concurrency"] = OCR_CONCURRENCY.snapshot()
+    if OCR_PROCESS_WORKERS > 0:
+        out["ocr_process_pool"] = {"workers": OCR_PROCESS_WORKERS, "shared_pages": live_segments()}
+    return JSONResponse(content=out, headers=cache_headers(None, NO_STORE))
@@ -0,0 +1,117 @@
+"""
+bench_normalize.py
+
+Usage:
+    python benchmarks/bench_normalize.py [stored_extractions.jsonl] [--repeat N]
+
+Re-normalizes the stored JSONL history two ways and prints timings:
+  - per-record: PatientDetails.from_extractor(rec).to_model().dict()
+    (the path /extract used, once per request, twice with DocumentExtractor)
+  - batch:      PatientDetails.from_extractor_many(records) + to_dict()
+It also times the old strptime loop against the compiled, memoized
+parse_date on the dates found in the history.
+If the store file is missing, a synthetic history is generated.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.models.patient_details import PatientDetails, DATE_FORMATS, parse_date  # noqa: E402
+
+
+def legacy_parse_date(dt_str):
+    # previous implementation: one strptime attempt (and exception) per format
+    if not dt_str:
+        return None
+    dt_str = dt_str.strip()
+    for p in DATE_FORMATS:
+        try:
+            return datetime.strptime(dt_str, p).date().isoformat()
+        except Exception:
+            continue
+    y = re.search(r'\b(19|20)\d{2}\b', dt_str)
+    return f"{y.group(0)}-01-01" if y else None
+
+
+def load_records(path):
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for ln in f:
+            ln = ln.strip()
+            if ln:
+                try:
+                    out.append(json.loads(ln))
+                except Exception:
+                    continue
+    return out
+
+
+def synthetic_records(n=20000, seed=0):
+    rng = random.Random(seed)
+    names = ["Marta  Sharapova", "Virat Kohli Date", "Adarta Sharapova", "John   Doe"]
+    dates = ["5/11/2022", "2/05/2022", "wfil/2022", "12 Mar 2021", "2021-04-01", "Jan 3, 2020", None]
+    meds = [("Prednisone", "20 mg", "Taper 5 mg every 3 days"),
+            ("Lialda", "2.4 gram", "take 2 pill  everyday for 1 month"),
+            ("Omeprazole", "40 mg", "Use two tablets daily")]
+    out = []
+    for _ in range(n):
+        out.append({
+            "doctor_name": "John Smith",
+            "patient_name": rng.choice(names),
+            "date": rng.choice(dates),
+            "patient_address": " 9 tennis court,  new Russia, DC. ",
+            "medicines": [dict(zip(("name", "strength", "directions"), m)) for m in rng.sample(meds, 2)],
+            "refills": rng.randint(0, 3),
+            "warnings": [],
+        })
+    return out
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("store", nargs="?", default="stored_extractions.jsonl")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    if os.path.exists(args.store):
+        records = load_records(args.store)
+        source = args.store
+    else:
+        records = synthetic_records()
+        source = "synthetic"
+    n = len(records)
+    print(f"[INFO] {n} records ({source})")
+
+    per_record = timed(lambda: [PatientDetails.from_extractor(r).to_model().dict() for r in records], args.repeat)
+    batch = timed(lambda: [p.to_dict() for p in PatientDetails.from_extractor_many(records)], args.repeat)
+    print(f"per-record : {per_record:8.3f}s  {n / per_record:10.0f} rec/s")
+    print(f"batch      : {batch:8.3f}s  {n / batch:10.0f} rec/s  ({per_record / batch:.1f}x)")
+
+    dates = [r.get("date") for r in records if r.get("date")]
+    legacy = timed(lambda: [legacy_parse_date(d) for d in dates], args.repeat)
+    def compiled_run():
+        parse_date.cache_clear()
+        return [parse_date(d) for d in dates]
+    compiled = timed(compiled_run, args.repeat)
+    print(f"dates (strptime loop) : {legacy:8.3f}s for {len(dates)} dates")
+    print(f"dates (compiled+memo) : {compiled:8.3f}s  ({legacy / max(compiled, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
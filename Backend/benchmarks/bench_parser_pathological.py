@@ -0,0 +1,102 @@
+"""
+bench_parser_pathological.py
+
+Usage:
+    python benchmarks/bench_parser_pathological.py [--sizes 1000,4000,16000,64000]
+                                                   [--max-exponent 1.3] [--legacy]
+
+Times PrescriptionParser(text).parse() on adversarial OCR garbage at
+growing input sizes, two shapes per family:
+  - one long line   (bounded by MAX_LINE_CHARS)
+  - many lines      (the document itself grows)
+For each family it prints seconds per size and the fitted growth
+exponent (slope of log(time) over log(size)); ~1.0 is linear, 2.0 is
+quadratic. Exits 1 if any exponent exceeds --max-exponent, so it can
+gate CI. --legacy also times the old unanchored "(\\d+)\\s+me" cleanup on
+a digit run to show the quadratic case the anchored pattern removed.
+"""
+import argparse
+import math
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.parsers.prescription_parser import PrescriptionParser, MAX_LINE_CHARS  # noqa: E402
+
+# family -> unit string repeated to the target size
+FAMILIES = {
+    "digit-run": "1",
+    "spaced-digits": "1 ",
+    "name-labels": "Name ",
+    "name-no-date": "Name: A b ",
+    "letters-digits": "ab1 ",
+    "dotted-caps": "A.",
+    "month-words": "Jan ",
+    "separators": "a - , : ",
+    "refill-labels": "Refill ",
+    "dr-labels": "Dr ",
+    "long-word": "b",
+}
+
+
+def make_text(unit: str, size: int, many_lines: bool) -> str:
+    body = (unit * (size // len(unit) + 1))[:size]
+    if not many_lines:
+        return body
+    width = MAX_LINE_CHARS
+    return "\n".join(body[i:i + width] for i in range(0, len(body), width))
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def exponent(sizes, times) -> float:
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-6)) for t in times]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,4000,16000,64000")
+    ap.add_argument("--max-exponent", type=float, default=1.3)
+    ap.add_argument("--legacy", action="store_true")
+    args = ap.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    worst = 0.0
+    print(f"{'family':28s}" + "".join(f"{s:>10d}" for s in sizes) + "   exponent")
+    for name, unit in FAMILIES.items():
+        for many in (False, True):
+            # no budget: measure the matching cost itself
+            times = [best_of(lambda: PrescriptionParser(make_text(unit, s, many), budget_seconds=1e9).parse())
+                     for s in sizes]
+            # a line-capped single line stops growing; only fit where the input actually grows
+            k = exponent(sizes, times) if many else 0.0
+            worst = max(worst, k)
+            label = f"{name} ({'lines' if many else 'one line'})"
+            print(f"{label:28s}" + "".join(f"{t:10.4f}" for t in times) + (f"   {k:8.2f}" if many else "          -"))
+
+    if args.legacy:
+        legacy = re.compile(r'(\d+)\s+(me|m g|mgm)\b', re.I)
+        lsizes = [s for s in sizes if s <= 16000]
+        times = [best_of(lambda: legacy.sub(r'\1 mg', "1" * s + " x"), repeat=1) for s in lsizes]
+        print(f"{'legacy digit-run cleanup':28s}" + "".join(f"{t:10.4f}" for t in times)
+              + f"   {exponent(lsizes, times):8.2f}")
+
+    print(f"worst growth exponent: {worst:.2f} (limit {args.max_exponent})")
+    return 1 if worst > args.max_exponent else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
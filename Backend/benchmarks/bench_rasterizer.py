@@ -0,0 +1,96 @@
+"""
+bench_rasterizer.py
+
+Usage:
+    python benchmarks/bench_rasterizer.py [pre_1.pdf pre_2.pdf ...] [--dpi 300] [--repeat 5]
+
+Rasterizes each PDF page by page with every available backend (poppler
+via pdf2image, PDFium via pypdfium2) the way iter_pdf_pages does, up to
+the grayscale array preprocessing works on, and prints per-file:
+  - seconds per page (best of --repeat, layout included)
+  - bytes per page handed to the pipeline (RGB for poppler, gray for PDFium)
+  - mean absolute grey difference between the backends' pages
+A backend whose library or binaries are missing is reported and skipped.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from src.ocr.rasterizer import PdfiumRasterizer, PopplerRasterizer, RasterizerUnavailable  # noqa: E402
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_PDFS = [os.path.join(HERE, "pre_1.pdf"), os.path.join(HERE, "pre_2.pdf")]
+
+
+def to_gray(page):
+    if isinstance(page, np.ndarray):
+        return page
+    return cv2.cvtColor(np.asarray(page.convert("RGB")), cv2.COLOR_RGB2GRAY)
+
+
+def raw_bytes(page):
+    if isinstance(page, np.ndarray):
+        return page.nbytes
+    return page.width * page.height * len(page.getbands())
+
+
+def run(rasterizer, path, dpi):
+    count, _ = rasterizer.layout(path)
+    grays, nbytes = [], 0
+    for i in range(1, count + 1):
+        for page in rasterizer.render(path, i, dpi):
+            nbytes += raw_bytes(page)
+            grays.append(to_gray(page))
+    return grays, nbytes
+
+
+def backends():
+    out = [PopplerRasterizer(os.environ.get("POPPLER_PATH"))]
+    try:
+        out.append(PdfiumRasterizer())
+    except RasterizerUnavailable as e:
+        print(f"pdfium: skipped ({e})")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdfs", nargs="*", default=DEFAULT_PDFS)
+    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    for path in args.pdfs:
+        print(f"\n{os.path.basename(path)} @ {args.dpi} dpi")
+        pages = {}
+        for r in backends():
+            try:
+                best = None
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    grays, nbytes = run(r, path, args.dpi)
+                    dt = time.perf_counter() - t0
+                    best = dt if best is None else min(best, dt)
+            except Exception as e:
+                print(f"  {r.name:8s} skipped ({type(e).__name__}: {e})")
+                continue
+            pages[r.name] = grays
+            n = max(1, len(grays))
+            print(f"  {r.name:8s} {len(grays)} pages  {best / n:7.3f}s/page  "
+                  f"{nbytes / n / 1e6:6.1f} MB/page  {grays[0].shape[1]}x{grays[0].shape[0]}")
+        if len(pages) == 2:
+            diffs = []
+            for a, b in zip(pages["poppler"], pages["pdfium"]):
+                h, w = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+                diffs.append(float(np.abs(a[:h, :w].astype(np.int16) - b[:h, :w]).mean()))
+            print(f"  mean |poppler - pdfium| grey level per page: {[round(d, 2) for d in diffs]}")
+
+
+if __name__ == "__main__":
+    main()
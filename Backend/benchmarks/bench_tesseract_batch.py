@@ -0,0 +1,110 @@
+"""
+bench_tesseract_batch.py
+
+Usage:
+    python benchmarks/bench_tesseract_batch.py [file.pdf ...] [--pages 8] [--repeat 3]
+
+Runs tesseract over the same preprocessed pages three ways and prints
+seconds per page:
+  - pytesseract: pytesseract.image_to_string per page (PNG temp file each)
+  - runner:      tesseract_runner.image_to_string per page (PBM/PGM on tmpfs)
+  - batch:       one PageBatch, a single tesseract process for all pages
+Texts from the three paths are compared; any page that differs is
+reported. Without PDFs, synthetic text pages are rendered. Needs the
+tesseract binary (and poppler for PDFs).
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytesseract  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from src.ocr import tesseract_runner  # noqa: E402
+from src.ocr.tesseract_runner import PageBatch  # noqa: E402
+from src.ocr.preprocess import preprocess_image_for_ocr  # noqa: E402
+
+CONFIG = "--oem 3 --psm 6"
+LINES = [
+    "Patient Name: Jane Doe   DOB: 03/14/1962",
+    "Rx: Amoxicillin 500 mg capsule",
+    "Sig: take 1 capsule by mouth three times daily",
+    "Qty: 30   Refills: 2",
+    "Prescriber: Dr. A. Smith   NPI 1234567890",
+]
+
+
+def synthetic_pages(n):
+    pages = []
+    for i in range(n):
+        img = Image.new("L", (1700, 2200), 255)
+        draw = ImageDraw.Draw(img)
+        for j, line in enumerate(LINES * 6):
+            draw.text((120, 120 + j * 60), f"{line} #{i}", fill=0)
+        pages.append(img.resize((3400, 4400)))
+    return pages
+
+
+def pdf_pages(paths):
+    from pdf2image import convert_from_path
+    pages = []
+    for path in paths:
+        pages.extend(convert_from_path(path, dpi=300))
+    return pages
+
+
+def timed(fn, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdfs", nargs="*")
+    ap.add_argument("--pages", type=int, default=8, help="synthetic pages when no PDFs are given")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+        sys.exit("tesseract not found on PATH; run this where the OCR stack is installed")
+
+    pages = pdf_pages(args.pdfs) if args.pdfs else synthetic_pages(args.pages)
+    procs = [preprocess_image_for_ocr(p) for p in pages]
+    n = len(procs)
+    print(f"{n} pages, scratch dir {tesseract_runner.scratch_dir() or 'default temp'}")
+
+    def per_page_pytesseract():
+        return [pytesseract.image_to_string(p, config=CONFIG) for p in procs]
+
+    def per_page_runner():
+        return [tesseract_runner.image_to_string(p, config=CONFIG) for p in procs]
+
+    def batched():
+        with PageBatch() as batch:
+            for p in procs:
+                batch.add(p)
+            return batch.run(CONFIG)
+
+    results = {}
+    for name, fn in (("pytesseract", per_page_pytesseract), ("runner", per_page_runner), ("batch", batched)):
+        secs, texts = timed(fn, args.repeat)
+        results[name] = texts
+        print(f"{name:12s} {secs:8.3f}s total  {secs / n:7.3f}s/page")
+
+    base = [t.strip() for t in results["pytesseract"]]
+    for name in ("runner", "batch"):
+        diff = [i + 1 for i, t in enumerate(results[name]) if t.strip() != base[i]]
+        print(f"{name:12s} pages differing from pytesseract: {diff or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
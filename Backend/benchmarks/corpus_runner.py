@@ -0,0 +1,231 @@
+"""
+corpus_runner.py - accuracy vs. speed regression runner
+
+Usage:
+    python benchmarks/corpus_runner.py [--corpus benchmarks/corpus]
+                                       [--configs baseline,dpi200,...]
+                                       [--out results.json] [--compare previous.json]
+
+The corpus is a directory of ground-truth JSON files, one per document,
+with the expected doctor_name, patient_name, date, patient_address,
+medicines and refills. The PDF is the sibling file with the same stem,
+or the path in the JSON's "pdf" key (relative to the JSON file).
+
+Every document is run through the full /extract pipeline
+(pipeline.extract_pdf_file) under each named configuration. Reported per config:
+  - per-field precision / recall (medicines are matched by name, as a set)
+  - pages per second and CPU-seconds per document (this process plus
+    tesseract/pdftoppm children)
+Results are written as sorted, indented JSON so two runs can be diffed
+across commits; --compare prints the accuracy/speed deltas directly.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pipeline  # noqa: E402
+from pipeline import OcrOptions, extract_pdf_file, set_external_binaries  # noqa: E402
+from src.models.patient_details import parse_date  # noqa: E402
+
+FIELDS = ("doctor_name", "patient_name", "date", "patient_address", "medicines", "refills")
+
+# named pipeline configurations; add new speed knobs here
+CONFIGS = {
+    "baseline": OcrOptions(),
+    "dpi200": OcrOptions(dpi=200),
+    "dpi150": OcrOptions(dpi=150),
+    "otsu": OcrOptions(preprocess="otsu"),
+    "no-preprocess": OcrOptions(preprocess="none"),
+    "psm4": OcrOptions(tesseract_config="--oem 3 --psm 4"),
+    # force tiling on every page, to check the strip merge against whole-page OCR
+    "tiled": OcrOptions(tile_min_pixels=1),
+}
+
+
+# -----------------------
+# scoring
+# -----------------------
+def norm_text(v) -> str:
+    if v is None:
+        return ""
+    v = re.sub(r"[^a-z0-9 ]+", " ", str(v).lower())
+    return re.sub(r"\s+", " ", v).strip()
+
+
+def norm_date(v) -> str:
+    if not v:
+        return ""
+    return parse_date(str(v)) or norm_text(v)
+
+
+def med_names(meds) -> set:
+    out = set()
+    for m in meds or []:
+        name = m.get("name") if isinstance(m, dict) else m
+        if norm_text(name):
+            out.add(norm_text(name))
+    return out
+
+
+def score_field(field, truth, pred):
+    """Return (tp, fp, fn) for one field of one document."""
+    if field == "medicines":
+        t, p = med_names(truth), med_names(pred)
+        return len(t & p), len(p - t), len(t - p)
+    if field == "refills":
+        t = int(truth or 0)
+        p = int(pred or 0)
+        if t == p:
+            return (1, 0, 0) if t else (0, 0, 0)
+        return (0, 1 if p else 0, 1 if t else 0)
+    n = norm_date if field == "date" else norm_text
+    t, p = n(truth), n(pred)
+    if not p:
+        return (0, 0, 1 if t else 0)
+    if p == t:
+        return (1, 0, 0)
+    return (0, 1, 1 if t else 0)
+
+
+def load_corpus(corpus_dir):
+    docs = []
+    for gt_path in sorted(glob.glob(os.path.join(corpus_dir, "*.json"))):
+        with open(gt_path, "r", encoding="utf-8") as f:
+            truth = json.load(f)
+        pdf = truth.get("pdf") or os.path.splitext(os.path.basename(gt_path))[0] + ".pdf"
+        pdf = os.path.normpath(os.path.join(os.path.dirname(gt_path), pdf))
+        if not os.path.exists(pdf):
+            print(f"[SKIP] no PDF for {gt_path}")
+            continue
+        docs.append((os.path.splitext(os.path.basename(gt_path))[0], pdf, truth))
+    return docs
+
+
+def cpu_seconds() -> float:
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime
+
+
+def run_config(name, options, docs, poppler_path):
+    counts = {f: [0, 0, 0] for f in FIELDS}
+    per_doc = {}
+    pages = 0
+    wall = 0.0
+    cpu = 0.0
+    for doc_name, pdf, truth in docs:
+        c0, t0 = cpu_seconds(), time.perf_counter()
+        result = extract_pdf_file(pdf, poppler_path, options=options)
+        wall += time.perf_counter() - t0
+        cpu += cpu_seconds() - c0
+        pages += len(result.get("pages") or [])
+        entities = result.get("entities") or {}
+        row = {}
+        for f in FIELDS:
+            tp, fp, fn = score_field(f, truth.get(f), entities.get(f))
+            counts[f][0] += tp
+            counts[f][1] += fp
+            counts[f][2] += fn
+            row[f] = "ok" if not fp and not fn else ("missed" if not fp else "wrong")
+        if result.get("warnings"):
+            row["warnings"] = result["warnings"]
+        per_doc[doc_name] = row
+
+    fields = {}
+    for f, (tp, fp, fn) in counts.items():
+        fields[f] = {
+            "tp": tp, "fp": fp, "fn": fn,
+            "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+        }
+    n_docs = max(len(docs), 1)
+    return {
+        "options": {"dpi": options.dpi, "tesseract_config": options.tesseract_config,
+                    "preprocess": options.preprocess},
+        "docs": len(docs),
+        "pages": pages,
+        "pages_per_second": round(pages / wall, 3) if wall else None,
+        "cpu_seconds_per_doc": round(cpu / n_docs, 3),
+        "wall_seconds": round(wall, 3),
+        "fields": fields,
+        "per_doc": per_doc,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_report(results, previous=None):
+    for name, r in results["configs"].items():
+        prev = (previous or {}).get("configs", {}).get(name)
+        speed = f"{r['pages_per_second']} pages/s, {r['cpu_seconds_per_doc']} cpu-s/doc"
+        if prev and prev.get("pages_per_second") and r.get("pages_per_second"):
+            speed += f"  (was {prev['pages_per_second']} pages/s, {prev['cpu_seconds_per_doc']} cpu-s/doc)"
+        print(f"\n== {name}: {speed}")
+        for f in FIELDS:
+            m = r["fields"][f]
+            line = f"  {f:16s} P={m['precision']!s:6s} R={m['recall']!s:6s}"
+            if prev:
+                pm = prev["fields"].get(f, {})
+                if (pm.get("precision"), pm.get("recall")) != (m["precision"], m["recall"]):
+                    line += f"  (was P={pm.get('precision')} R={pm.get('recall')})"
+            print(line)
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--corpus", default=os.path.join(here, "corpus"))
+    ap.add_argument("--configs", default="baseline", help="comma separated; 'all' for every config: "
+                                                          + ",".join(CONFIGS))
+    ap.add_argument("--out", default=None, help="write results JSON here")
+    ap.add_argument("--compare", default=None, help="previous results JSON to diff against")
+    ap.add_argument("--use-cache", action="store_true", help="keep PAGE_CACHE_DIR enabled")
+    args = ap.parse_args(argv)
+
+    names = list(CONFIGS) if args.configs == "all" else [c.strip() for c in args.configs.split(",") if c.strip()]
+    unknown = [n for n in names if n not in CONFIGS]
+    if unknown:
+        ap.error(f"unknown config(s): {', '.join(unknown)}")
+
+    # measure the pipeline itself: no cross-document dedup, no cached rasters
+    pipeline.PAGE_DEDUP_INDEX = None
+    if not args.use_cache:
+        pipeline.PAGE_CACHE = None
+
+    docs = load_corpus(args.corpus)
+    poppler_path = set_external_binaries()
+    results = {
+        "commit": git_commit(),
+        "corpus": sorted(d[0] for d in docs),
+        "configs": {name: run_config(name, CONFIGS[name], docs, poppler_path) for name in names},
+    }
+
+    previous = None
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(results, previous)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n[OK] Wrote: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+export_store.py - columnar export of stored extractions
+
+Usage:
+    python export_store.py --out DIR [--format parquet|arrow] [--since TS | --full]
+                           [--chunk N] [--store stored_extractions.jsonl]
+
+Writes the records saved through POST /store as two tables, extractions
+and medicines (one row per medicine), under DIR/<table>/part-<ts>.<ext>
+(see src/store/columnar.py). Runs are incremental: by default only
+records changed after the watermark left in DIR/_watermark by the
+previous run are exported (records re-parsed since are exported again);
+--since overrides it and --full exports everything, replacing the parts
+already in DIR. Memory stays bounded by --chunk rows.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from src.store.columnar import export_files, read_watermark, ColumnarUnavailable
+from src.store.jsonl_store import JsonlStore, parse_ts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export stored extractions to Parquet / Arrow")
+    ap.add_argument("--out", required=True, help="output directory")
+    ap.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    ap.add_argument("--store", default=os.environ.get("STORE_FILE", "stored_extractions.jsonl"))
+    ap.add_argument("--since", help="export records changed after this ISO timestamp")
+    ap.add_argument("--full", action="store_true", help="export everything and replace the existing parts")
+    ap.add_argument("--chunk", type=int, default=10000, help="rows per record batch")
+    args = ap.parse_args(argv)
+
+    if args.since:
+        since = parse_ts(args.since)
+    elif args.full:
+        since = None
+    else:
+        since = read_watermark(args.out)
+
+    t0 = time.perf_counter()
+    try:
+        res = export_files(JsonlStore(args.store), args.out, since=since,
+                           fmt=args.format, chunk_size=max(1, args.chunk), replace=since is None)
+    except ColumnarUnavailable as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    res["seconds"] = round(time.perf_counter() - t0, 3)
+    print(json.dumps(res, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,941 @@
+"""
+pipeline.py - the extraction pipeline shared by the API and the workers
+
+rasterize -> gate / dedup -> preprocess -> OCR -> split -> extract ->
+normalize, configured from env vars at import time. app.py (OCR_MODE=inline)
+and worker.py (OCR_MODE=queue) both run extract_pdf_file from here; the
+API-only state (upload spool, store, admission, job queue client,
+profiler) stays in app.py, so a worker process never builds it.
+"""
+import os
+import traceback
+import time
+import threading
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass
+
+# OCR / image libs
+from pdf2image import convert_from_path
+from PIL import Image
+import pytesseract
+import cv2
+import numpy as np
+
+
+# -----------------------
+# Tesseract / Poppler setup
+# - Use environment variables when provided
+#   - TESSERACT_CMD  -> full path to tesseract executable (optional)
+#   - POPPLER_PATH   -> directory containing pdftoppm (optional on Windows)
+# -----------------------
+if os.environ.get("TESSERACT_CMD"):
+    pytesseract.pytesseract.tesseract_cmd = os.environ["TESSERACT_CMD"]
+# If not provided, assume tesseract is on PATH (Dockerfile / system install should ensure that)
+
+# -----------------------
+# Try to import extractor(s)
+# Prefer DocumentExtractor (src.parsers.doc_extractor) if present,
+# otherwise try prescription parser class or function names.
+# All imports are best-effort; failing to import is non-fatal.
+# -----------------------
+DocumentExtractor = None
+PrescriptionParser = None
+extract_entities_func = None
+PatientDetails = None
+
+try:
+    from src.parsers.doc_extractor import DocumentExtractor  # type: ignore
+except Exception:
+    DocumentExtractor = None
+
+# PrescriptionParser class (common)
+if DocumentExtractor is None:
+    try:
+        from src.parsers.prescription_parser import PrescriptionParser  # type: ignore
+    except Exception:
+        PrescriptionParser = None
+    try:
+        # fallback to top-level file name used in earlier exercises
+        from extract_entities_regex import PrescriptionParser as PrescriptionParser2  # type: ignore
+        if PrescriptionParser is None:
+            PrescriptionParser = PrescriptionParser2
+    except Exception:
+        pass
+
+# version stamped on extractions and stored records (see /store/reparse)
+try:
+    from src.parsers.prescription_parser import PARSER_VERSION  # type: ignore
+except Exception:
+    PARSER_VERSION = 0
+
+# function-style extractors
+try:
+    from src.parsers.prescription_parser import extract_entities_from_ocr_text as extract_entities_func  # type: ignore
+except Exception:
+    extract_entities_func = None
+
+if extract_entities_func is None:
+    try:
+        from extract_entities_regex import extract_entities as extract_entities_func  # type: ignore
+    except Exception:
+        extract_entities_func = None
+
+# Near-duplicate page detection (optional, see PAGE_DEDUP_* env vars)
+try:
+    from src.ocr.page_hash import PageHashIndex  # type: ignore
+    PAGE_DEDUP_INDEX = PageHashIndex.from_env()
+except Exception:
+    PAGE_DEDUP_INDEX = None
+
+# Process-wide budget for page pixel buffers (see PAGE_MEMORY_* env vars)
+from src.runtime.memory_governor import (MemoryGovernor, MemoryBudgetExceeded, Reservation, estimate_page_bytes,
+                                        PAGE_BYTES_PER_PIXEL, GRAY_PAGE_BYTES_PER_PIXEL)
+MEMORY_GOVERNOR = MemoryGovernor.from_env()
+
+# PDF rasterizer backend
+# - RASTERIZER -> auto (= poppler for now) | poppler | pdfium (in-process, needs pypdfium2;
+#                 one render at a time per process, see src/ocr/rasterizer.py)
+from src.ocr.rasterizer import (make_rasterizer, PopplerRasterizer, RasterizerUnavailable,
+                                POPPLER as RASTERIZER_POPPLER, DEFAULT_PAGE_SIZE)
+RASTERIZER = os.environ.get("RASTERIZER", "auto").strip().lower()
+try:
+    make_rasterizer(RASTERIZER)
+except (RasterizerUnavailable, ValueError) as e:
+    print(f"=== RASTERIZER: {e}; using poppler ===")
+    RASTERIZER = RASTERIZER_POPPLER
+
+# Optional on-disk cache of rasterized grayscale pages (see PAGE_CACHE_* env vars)
+from src.ocr.page_cache import PageArtifactCache, file_sha256
+PAGE_CACHE = PageArtifactCache.from_env()
+
+# Tiled OCR for oversized pages (A3 / high-resolution photo scans)
+# - OCR_TILE_MIN_PIXELS -> tile pages above this many pixels (default 12M; 0 disables)
+# - OCR_TILE_HEIGHT / OCR_TILE_OVERLAP -> strip height and overlap in pixels
+# - OCR_TILE_WORKERS    -> strips OCR'd in parallel per page
+from src.ocr.tiling import ocr_tiled, top_band
+OCR_TILE_MIN_PIXELS = int(os.environ.get("OCR_TILE_MIN_PIXELS", "12000000"))
+OCR_TILE_HEIGHT = int(os.environ.get("OCR_TILE_HEIGHT", "2000"))
+OCR_TILE_OVERLAP = int(os.environ.get("OCR_TILE_OVERLAP", "200"))
+OCR_TILE_WORKERS = int(os.environ.get("OCR_TILE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Batched OCR: all regular-size pages of a document in one tesseract process
+# - OCR_BATCH_PAGES=1 -> enable (default off; per-page calls keep partial results on timeout)
+OCR_BATCH_PAGES = os.environ.get("OCR_BATCH_PAGES", "0").lower() in ("1", "true", "yes")
+
+# OCR process pool: preprocessing + tesseract per page in worker processes,
+# pages handed over through shared memory (see src/runtime/shared_pages.py)
+# - OCR_PROCESS_WORKERS -> worker processes (default 0 = OCR in the request thread)
+from src.runtime.shared_pages import SharedPageSet, PageRef
+from src.ocr.pool_worker import PageSettings, init_worker, ocr_shared_page, parse_document
+OCR_PROCESS_WORKERS = int(os.environ.get("OCR_PROCESS_WORKERS", "0"))
+_OCR_POOL: Optional[ProcessPoolExecutor] = None
+_OCR_POOL_LOCK = threading.Lock()
+
+# Multi-prescription PDFs (see src/parsers/doc_splitter.py); with several
+# prescriptions, each is parsed on its own, in the OCR process pool when
+# OCR_PROCESS_WORKERS > 0
+# - DOC_SPLIT_ENABLED    -> "0" to parse a PDF as one document (default on)
+# - DOC_SPLIT_HEAD_LINES -> first lines of a page searched for a header
+# - DOC_SPLIT_MIN_CUES   -> header cues (doctor / patient / date) that start a document
+from src.parsers.doc_splitter import split_documents, page_texts, join_pages, page_span
+DOC_SPLIT_ENABLED = os.environ.get("DOC_SPLIT_ENABLED", "1").lower() in ("1", "true", "yes")
+DOC_SPLIT_HEAD_LINES = int(os.environ.get("DOC_SPLIT_HEAD_LINES", "8"))
+DOC_SPLIT_MIN_CUES = int(os.environ.get("DOC_SPLIT_MIN_CUES", "2"))
+
+# Field-targeted extraction (?fields=...): OCR the top band of a page first
+# - FIELD_BAND_FRACTION -> share of the page height OCR'd in the first step (default 0.25)
+from src.parsers.field_targets import all_settled, can_stop_early, band_can_settle
+FIELD_BAND_FRACTION = float(os.environ.get("FIELD_BAND_FRACTION", "0.25"))
+
+# Blank / unreadable page gate, checked before any OCR work (see PAGE_GATE_* env vars)
+from src.ocr.page_gate import PageGate, OK as GATE_OK, BLANK as GATE_BLANK, UNREADABLE as GATE_UNREADABLE
+PAGE_GATE = PageGate.from_env()
+
+# Per-request deadlines / cancellation (tesseract runs through a killable runner)
+from src.runtime.cancellation import CancelToken, OperationCancelled
+from src.ocr.tesseract_runner import image_to_string as run_tesseract, PageBatch
+EXTRACT_TIMEOUT_SECONDS = float(os.environ.get("EXTRACT_TIMEOUT_SECONDS", "120"))
+EXTRACT_MAX_TIMEOUT_SECONDS = float(os.environ.get("EXTRACT_MAX_TIMEOUT_SECONDS", "600"))
+
+# Adaptive cap on concurrent tesseract processes + their OpenMP/OpenCV thread share
+# (see OCR_WORKERS_* / OCR_AIMD_* env vars)
+from src.ocr.tesseract_runner import use_limiter
+from src.runtime.ocr_concurrency import OcrConcurrency, available_cpus
+OCR_CONCURRENCY = OcrConcurrency.from_env()
+use_limiter(OCR_CONCURRENCY)
+
+# Per-request timing trace
+from src.runtime.timing import RequestTimer
+
+# PatientDetails normalizer (optional)
+try:
+    from src.models.patient_details import PatientDetails  # type: ignore
+except Exception:
+    try:
+        from patient_details import PatientDetails  # type: ignore
+    except Exception:
+        PatientDetails = None
+
+# -----------------------
+# Helpers: poppler/tesseract env, pdf->images, preprocessing, ocr
+# -----------------------
+@dataclass
+class OcrOptions:
+    """
+    Knobs of the OCR pipeline that trade speed against accuracy.
+    The defaults are what /extract uses; benchmarks/corpus_runner.py
+    evaluates named variations of them.
+      - dpi:              rasterization resolution
+      - tesseract_config: passed to tesseract (engine / page segmentation mode)
+      - preprocess:       "adaptive" (median + adaptive threshold), "otsu"
+                          (single global threshold) or "none" (grayscale only)
+      - tile_min_pixels:  pages larger than this are OCR'd as overlapping
+                          horizontal strips in parallel (0 disables tiling)
+      - tile_height / tile_overlap: strip size and shared rows, in pixels
+      - batch_pages:      OCR the document's pages with one tesseract process
+                          (see ocr_document_batched)
+      - fields:           only these entity fields are needed; OCR stops once
+                          they are settled (see ocr_document_for_fields)
+    """
+    dpi: int = 300
+    tesseract_config: str = "--oem 3 --psm 6"
+    preprocess: str = "adaptive"
+    tile_min_pixels: int = OCR_TILE_MIN_PIXELS
+    tile_height: int = OCR_TILE_HEIGHT
+    tile_overlap: int = OCR_TILE_OVERLAP
+    batch_pages: bool = OCR_BATCH_PAGES
+    fields: Optional[Tuple[str, ...]] = None
+
+from src.ocr.preprocess import page_to_gray, preprocess_image_for_ocr
+
+def set_external_binaries() -> Optional[str]:
+    """
+    Read POPPLER_PATH (dir with pdftoppm) and TESSERACT_CMD env vars.
+    Return poppler_path (or None).
+    """
+    poppler_path = os.environ.get("POPPLER_PATH")
+    # TESSERACT_CMD applied earlier at import time; re-read if needed
+    tcmd = os.environ.get("TESSERACT_CMD")
+    if tcmd:
+        pytesseract.pytesseract.tesseract_cmd = tcmd
+    return poppler_path
+
+def pdf_to_images(pdf_path: str, poppler_path: Optional[str] = None, dpi: int = 300):
+    if poppler_path:
+        return convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path)
+    return convert_from_path(pdf_path, dpi=dpi)
+
+def open_rasterizer(pdf_path: str, poppler_path: Optional[str] = None):
+    """
+    (rasterizer, (page_count, [(width_pt, height_pt) per page])) for a PDF:
+    the RASTERIZER backend, or poppler when PDFium cannot read the file.
+    """
+    rasterizer = make_rasterizer(RASTERIZER, poppler_path)
+    if rasterizer.name != RASTERIZER_POPPLER:
+        try:
+            return rasterizer, rasterizer.layout(pdf_path)
+        except Exception:
+            print("=== PDFIUM LAYOUT ERROR (falling back to poppler) ===")
+            print(traceback.format_exc())
+            rasterizer = PopplerRasterizer(poppler_path)
+    return rasterizer, rasterizer.layout(pdf_path)
+
+def iter_pdf_pages(pdf_path: str, poppler_path: Optional[str] = None, dpi: int = 300,
+                   governor: Optional[MemoryGovernor] = None, layout=None,
+                   token: Optional[CancelToken] = None,
+                   cache: Optional[PageArtifactCache] = None, pdf_hash: Optional[str] = None,
+                   timer: Optional[RequestTimer] = None, rasterizer=None,
+                   held: Optional[Reservation] = None):
+    """
+    Rasterize one page at a time. With a governor, each page's buffers,
+    estimated from that page's own size, are reserved before the page is
+    rendered and released only when the consumer asks for the next page
+    (or closes the generator), so the reservation covers preprocessing and
+    OCR of that page too. A consumer that is done with a page earlier
+    passes `held` and releases it itself (ocr_document_pooled, once the
+    page is in shared memory).
+    With a token, rendering is bounded by the remaining deadline and no
+    new page is started once the token is cancelled.
+    With a page cache (and the PDF's sha256), pages are yielded as
+    grayscale arrays: memory-mapped from the cache when present, else
+    rasterized once and stored for the next run. The PDFium rasterizer
+    yields grayscale arrays in any case.
+    """
+    if rasterizer is None or layout is None:
+        rasterizer, layout = open_rasterizer(pdf_path, poppler_path)
+    count, sizes = layout
+    use_cache = cache is not None and bool(pdf_hash)
+    held = held if held is not None else Reservation()
+    for i in range(1, count + 1):
+        wait = timeout = None
+        if token is not None:
+            token.check()
+            timeout = wait = token.remaining()
+            if wait is not None:
+                wait = min(wait, governor.wait_seconds) if governor is not None else wait
+        cached = cache.get(pdf_hash, i, dpi) if use_cache else None
+        if governor is not None:
+            w_pt, h_pt = sizes[min(i, len(sizes)) - 1] if sizes else DEFAULT_PAGE_SIZE
+            per_pixel = GRAY_PAGE_BYTES_PER_PIXEL if cached is not None or rasterizer.gray else PAGE_BYTES_PER_PIXEL
+            held.acquire(governor, estimate_page_bytes(w_pt, h_pt, dpi, per_pixel), timeout=wait)
+        try:
+            if cached is not None:
+                yield cached
+                continue
+            t0 = time.perf_counter()
+            rendered = rasterizer.render(pdf_path, i, dpi, timeout=timeout, token=token)
+            if use_cache:
+                rendered = [page_to_gray(img) for img in rendered]
+                for gray in rendered:
+                    cache.put(pdf_hash, i, dpi, gray)
+            if timer is not None:
+                timer.add("rasterize", time.perf_counter() - t0, page=i)
+            for img in rendered:
+                yield img
+        finally:
+            held.release()
+
+def ocr_document(pages: List[Image.Image], dedup_index=None,
+                 token: Optional[CancelToken] = None,
+                 timer: Optional[RequestTimer] = None,
+                 options: Optional[OcrOptions] = None,
+                 gate: Optional[PageGate] = None) -> Dict[str, Any]:
+    """
+    OCR every page and return {"text": ..., "pages": [per-page info]}.
+    When a page gate is given, blank and unreadable pages are detected on
+    a downscaled copy and skipped without preprocessing or tesseract.
+    When a dedup index is given, each raw page is perceptually hashed
+    first; a repeat of an earlier page reuses that page's text
+    instead of running preprocessing + tesseract again.
+    If the token is cancelled mid-way, the pages finished so far are
+    returned and "cancelled" holds the reason.
+    """
+    out = []
+    page_info: List[Dict[str, Any]] = []
+    cancelled = None
+    try:
+        for i, p in enumerate(pages, start=1):
+            txt, info = ocr_page(i, p, dedup_index=dedup_index, token=token, timer=timer,
+                                 options=options, gate=gate)
+            out.append(f"===== PAGE {i} =====\n{txt}\n")
+            page_info.append(info)
+    except OperationCancelled as e:
+        cancelled = e.reason
+    return {"text": "\n".join(out), "pages": page_info, "cancelled": cancelled}
+
+def ocr_page(i: int, p, dedup_index=None, token: Optional[CancelToken] = None,
+             timer: Optional[RequestTimer] = None, options: Optional[OcrOptions] = None,
+             gate: Optional[PageGate] = None, proc: Optional[Image.Image] = None):
+    """
+    OCR a single page; return (text, info) where info is the per-page report.
+    proc is the already preprocessed page, when the caller has it.
+    """
+    timer = timer or RequestTimer()
+    options = options or OcrOptions()
+    if token is not None:
+        token.check()
+    info: Dict[str, Any] = {"page": i, "deduplicated": False}
+    if gate_rejects(i, p, gate, timer, info):
+        return "", info
+    page_hash = None
+    if dedup_index is not None:
+        page_hash = dedup_index.hash_page(p)
+        match = dedup_index.lookup(page_hash)
+        if match is not None:
+            info["deduplicated"] = True
+            info.update(match.to_dict())
+            return match.text, info
+    if proc is None:
+        with timer.span("preprocess", page=i):
+            proc = preprocess_image_for_ocr(p, options.preprocess)
+    with timer.span("ocr", page=i):
+        txt = ocr_image(proc, options, token, info)
+    if page_hash is not None:
+        dedup_index.add(page_hash, txt)
+    return txt, info
+
+def gate_rejects(i: int, p, gate: Optional[PageGate], timer: RequestTimer, info: Dict[str, Any]) -> bool:
+    """Run the page gate; on a blank/unreadable page record why in info and return True."""
+    if gate is None:
+        return False
+    with timer.span("gate", page=i):
+        verdict = gate.assess(p)
+    if verdict["verdict"] == GATE_OK:
+        return False
+    info.update({"skipped": verdict["verdict"], "skip_reason": verdict["reason"], "gate": verdict["metrics"]})
+    return True
+
+def ocr_document_batched(pages, dedup_index=None,
+                         token: Optional[CancelToken] = None,
+                         timer: Optional[RequestTimer] = None,
+                         options: Optional[OcrOptions] = None,
+                         gate: Optional[PageGate] = None) -> Dict[str, Any]:
+    """
+    Like ocr_document, but regular-size pages are written to one PageBatch
+    (1-bit files on tmpfs) as they are preprocessed and OCR'd by a single
+    tesseract process at the end: one process start and model load per
+    document instead of per page. Gated, deduplicated and oversized
+    (tiled) pages are handled as in ocr_page. A cancellation before the
+    batch has run loses the batched pages.
+    """
+    timer = timer or RequestTimer()
+    options = options or OcrOptions()
+    texts: List[Optional[str]] = []
+    page_info: List[Dict[str, Any]] = []
+    pending: Dict[int, Tuple[int, Any]] = {}  # batch index -> (position in texts, page hash)
+    copies: List[Tuple[int, int]] = []  # (position in texts, batch index) of repeats within the batch
+    queued = None
+    if dedup_index is not None:
+        # repeats of a page still waiting in the batch are not in dedup_index yet
+        queued = dedup_index.scratch()
+    cancelled = None
+    with PageBatch() as batch:
+        try:
+            for i, p in enumerate(pages, start=1):
+                if token is not None:
+                    token.check()
+                info: Dict[str, Any] = {"page": i, "deduplicated": False}
+                page_info.append(info)
+                if gate_rejects(i, p, gate, timer, info):
+                    texts.append("")
+                    continue
+                page_hash = None
+                if dedup_index is not None:
+                    page_hash = dedup_index.hash_page(p)
+                    match = dedup_index.lookup(page_hash)
+                    if match is not None:
+                        info["deduplicated"] = True
+                        info.update(match.to_dict())
+                        texts.append(match.text)
+                        continue
+                    match = queued.lookup(page_hash)
+                    if match is not None:
+                        info["deduplicated"] = True
+                        info.update(match.to_dict())
+                        copies.append((len(texts), int(match.text)))
+                        texts.append(None)
+                        continue
+                with timer.span("preprocess", page=i):
+                    proc = preprocess_image_for_ocr(p, options.preprocess)
+                if options.tile_min_pixels and proc.width * proc.height > options.tile_min_pixels:
+                    with timer.span("ocr", page=i):
+                        txt = ocr_image(proc, options, token, info)
+                    if page_hash is not None:
+                        dedup_index.add(page_hash, txt)
+                    texts.append(txt)
+                    continue
+                idx = batch.add(proc)
+                pending[idx] = (len(texts), page_hash)
+                if queued is not None:
+                    queued.add(page_hash, str(idx))
+                info["batched"] = True
+                texts.append(None)
+            with timer.span("ocr"):
+                results = batch.run(options.tesseract_config, token=token)
+            for idx, txt in enumerate(results):
+                pos, page_hash = pending[idx]
+                texts[pos] = txt
+                if page_hash is not None:
+                    dedup_index.add(page_hash, txt)
+            for pos, idx in copies:
+                texts[pos] = results[idx]
+        except OperationCancelled as e:
+            cancelled = e.reason
+    # like ocr_document, only pages that got their text are reported
+    done = [(txt, info) for txt, info in zip(texts, page_info) if txt is not None]
+    out = [f"===== PAGE {info['page']} =====\n{txt}\n" for txt, info in done]
+    return {"text": "\n".join(out), "pages": [info for _, info in done], "cancelled": cancelled}
+
+def ocr_process_pool() -> ProcessPoolExecutor:
+    global _OCR_POOL
+    with _OCR_POOL_LOCK:
+        if _OCR_POOL is None:
+            # spawn: forking the threaded API process is not safe; workers import
+            # src.ocr.pool_worker only, never this module
+            _OCR_POOL = ProcessPoolExecutor(OCR_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=init_worker,
+                                            initargs=(pytesseract.pytesseract.tesseract_cmd,))
+        return _OCR_POOL
+
+def discard_ocr_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool (a worker died) so the next request starts a fresh one."""
+    global _OCR_POOL
+    with _OCR_POOL_LOCK:
+        if _OCR_POOL is pool:
+            _OCR_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def pool_page_settings(options: OcrOptions) -> PageSettings:
+    return PageSettings(options.preprocess, options.tesseract_config, options.tile_min_pixels,
+                        options.tile_height, options.tile_overlap, OCR_TILE_WORKERS)
+
+def ocr_document_pooled(pages, dedup_index=None,
+                        token: Optional[CancelToken] = None,
+                        timer: Optional[RequestTimer] = None,
+                        options: Optional[OcrOptions] = None,
+                        gate: Optional[PageGate] = None,
+                        governor: Optional[MemoryGovernor] = None,
+                        limiter: Optional[OcrConcurrency] = None,
+                        held: Optional[Reservation] = None) -> Dict[str, Any]:
+    """
+    Like ocr_document, but preprocessing + tesseract run in the OCR process
+    pool. The gate and dedup run here first; a page that needs OCR is
+    copied once into shared memory and the worker maps it (nothing page-sized
+    goes through the pipe). At most OCR_PROCESS_WORKERS pages are in flight,
+    each reserved in the memory governor as a gray page and holding a
+    tesseract slot of the limiter, whose OMP_THREAD_LIMIT share goes along
+    with the page (without a limiter: cores // OCR_PROCESS_WORKERS); the
+    slot is given back with the CPU time the worker reports for the page,
+    and waits for budget or slots end at the request deadline. `held`
+    is the page's render reservation from iter_pdf_pages: it is released
+    before the shared copy is reserved, so a page is not counted twice. A
+    segment is unlinked as soon as its page is back. On cancellation or error, pages not yet
+    started are cancelled and every segment is unlinked before returning;
+    a page already in a worker runs until its own deadline.
+    """
+    timer = timer or RequestTimer()
+    options = options or OcrOptions()
+    pool = ocr_process_pool()
+    texts: List[Optional[str]] = []
+    page_info: List[Dict[str, Any]] = []
+    settings = pool_page_settings(options)
+    # future -> (position, ref, page hash, reserved bytes, holds a limiter slot)
+    inflight: Dict[Any, Tuple[int, PageRef, Any, int, bool]] = {}
+    copies: List[Tuple[int, int]] = []  # (position, position of the in-flight original)
+    queued = None
+    if dedup_index is not None:
+        queued = dedup_index.scratch()
+    cancelled = None
+
+    def collect() -> None:
+        done = ()
+        while not done:
+            # short waits, so a client disconnect is noticed without a deadline
+            done, _ = wait_futures(list(inflight), timeout=0.25, return_when=FIRST_COMPLETED)
+            if token is not None:
+                token.check()
+        for fut in done:
+            pos, ref, page_hash, reserved, slotted = inflight.pop(fut)
+            shared.release(ref)
+            if governor is not None:
+                governor.release(reserved)
+            if slotted:
+                # the worker's CPU time is invisible to this process's getrusage
+                limiter.release(usage=None if fut.exception() else fut.result().get("usage"))
+            res = fut.result()
+            texts[pos] = res["text"]
+            page_info[pos].update(res["info"])
+            for stage, secs in res["timings"].items():
+                timer.add(stage, secs, page=pos + 1)
+            if page_hash is not None:
+                dedup_index.add(page_hash, res["text"])
+
+    def reserve(nbytes: int) -> int:
+        # never block on the budget while our own finished pages could free it,
+        # nor past the request deadline
+        while True:
+            wait = 0 if inflight else governor.wait_seconds
+            if token is not None and token.remaining() is not None:
+                wait = min(wait, token.remaining())
+            try:
+                return governor.acquire(nbytes, timeout=wait)
+            except MemoryBudgetExceeded:
+                if not inflight:
+                    raise
+                collect()
+
+    def take_slot() -> bool:
+        if limiter is None:
+            return False
+        while not limiter.acquire(token, blocking=not inflight):
+            collect()
+        return True
+
+    with SharedPageSet() as shared:
+        try:
+            for i, p in enumerate(pages, start=1):
+                if token is not None:
+                    token.check()
+                info: Dict[str, Any] = {"page": i, "deduplicated": False}
+                page_info.append(info)
+                if gate_rejects(i, p, gate, timer, info):
+                    texts.append("")
+                    continue
+                page_hash = None
+                if dedup_index is not None:
+                    page_hash = dedup_index.hash_page(p)
+                    match = dedup_index.lookup(page_hash)
+                    if match is not None:
+                        info["deduplicated"] = True
+                        info.update(match.to_dict())
+                        texts.append(match.text)
+                        continue
+                    match = queued.lookup(page_hash)
+                    if match is not None:
+                        info["deduplicated"] = True
+                        info.update(match.to_dict())
+                        copies.append((len(texts), int(match.text)))
+                        texts.append(None)
+                        continue
+                gray = page_to_gray(p)
+                if held is not None:
+                    held.release()
+                reserved = reserve(gray.size * GRAY_PAGE_BYTES_PER_PIXEL) if governor is not None else 0
+                slotted = False
+                try:
+                    slotted = take_slot()
+                    threads = (limiter.threads_per_worker if slotted
+                               else max(1, available_cpus() // OCR_PROCESS_WORKERS))
+                    ref = shared.put(gray)
+                    fut = pool.submit(ocr_shared_page, ref, settings,
+                                      token.remaining() if token is not None else None, threads)
+                except BaseException:
+                    if governor is not None:
+                        governor.release(reserved)
+                    if slotted:
+                        limiter.release()
+                    raise
+                del gray
+                inflight[fut] = (len(texts), ref, page_hash, reserved, slotted)
+                if queued is not None:
+                    queued.add(page_hash, str(len(texts)))
+                texts.append(None)
+                while len(inflight) >= OCR_PROCESS_WORKERS:
+                    collect()
+            while inflight:
+                collect()
+            for pos, src in copies:
+                texts[pos] = texts[src]
+        except OperationCancelled as e:
+            cancelled = e.reason
+        except BrokenProcessPool:
+            discard_ocr_process_pool(pool)
+            raise
+        finally:
+            for fut, (_, _, _, reserved, slotted) in inflight.items():
+                fut.cancel()
+                if governor is not None:
+                    governor.release(reserved)
+                if slotted:
+                    limiter.release()
+            inflight.clear()
+    # like ocr_document, only pages that got their text are reported
+    done = [(txt, info) for txt, info in zip(texts, page_info) if txt is not None]
+    out = [f"===== PAGE {info['page']} =====\n{txt}\n" for txt, info in done]
+    return {"text": "\n".join(out), "pages": [info for _, info in done], "cancelled": cancelled}
+
+def ocr_image(proc: Image.Image, options: OcrOptions, token: Optional[CancelToken] = None,
+              info: Optional[Dict[str, Any]] = None) -> str:
+    """Run tesseract on a preprocessed image, in parallel strips when it is oversized."""
+    if options.tile_min_pixels and proc.width * proc.height > options.tile_min_pixels:
+        txt, tiles = ocr_tiled(
+            proc, lambda strip: run_tesseract(strip, config=options.tesseract_config, token=token),
+            strip_height=max(options.tile_height, 4 * options.tile_overlap),
+            overlap=options.tile_overlap, workers=OCR_TILE_WORKERS)
+        if info is not None:
+            info["tiles"] = tiles
+        return txt
+    return run_tesseract(proc, config=options.tesseract_config, token=token)
+
+def ocr_document_for_fields(pages, fields: Tuple[str, ...], page_count: int, dedup_index=None,
+                            token: Optional[CancelToken] = None,
+                            timer: Optional[RequestTimer] = None,
+                            options: Optional[OcrOptions] = None,
+                            gate: Optional[PageGate] = None) -> Dict[str, Any]:
+    """
+    Like ocr_document, but for callers that only need `fields`: each page
+    is OCR'd in two steps, top band (FIELD_BAND_FRACTION of the height)
+    then full page, and the text so far is parsed after each step. OCR
+    stops as soon as every requested field is settled (see
+    src/parsers/field_targets.py); later pages are never rasterized.
+    Adds "pages_skipped" (pages not OCR'd at all) and "fields_settled".
+    The band step is left out when a requested field needs whole pages
+    (address), and fields that need the whole document (medicines) make
+    this a plain ocr_document run.
+    """
+    timer = timer or RequestTimer()
+    options = options or OcrOptions()
+    if not can_stop_early(fields):
+        doc = ocr_document(pages, dedup_index=dedup_index, token=token, timer=timer, options=options, gate=gate)
+        return {**doc, "pages_skipped": 0, "fields_settled": False}
+    use_band = band_can_settle(fields)
+    out: List[str] = []
+    page_info: List[Dict[str, Any]] = []
+    cancelled = None
+    settled = False
+
+    def check(page_text: str, page_complete: bool) -> bool:
+        text = "\n".join(out + [page_text])
+        with timer.span("parse"):
+            entities = run_extractor_on_text(text)
+        return all_settled(fields, entities, text, page_complete)
+
+    try:
+        for i, p in enumerate(pages, start=1):
+            if token is not None:
+                token.check()
+            proc = None
+            page_ok = True
+            if gate is not None:
+                with timer.span("gate", page=i):
+                    page_ok = gate.assess(p)["verdict"] == GATE_OK
+            if page_ok:
+                with timer.span("preprocess", page=i):
+                    proc = preprocess_image_for_ocr(p, options.preprocess)
+                band = top_band(proc, FIELD_BAND_FRACTION) if use_band else proc
+                if band.height < proc.height:
+                    with timer.span("ocr", page=i):
+                        txt = ocr_image(band, options, token)
+                    if check(f"===== PAGE {i} =====\n{txt}\n", page_complete=False):
+                        out.append(f"===== PAGE {i} =====\n{txt}\n")
+                        page_info.append({"page": i, "deduplicated": False, "region": "top"})
+                        settled = True
+                        break
+            # a page that passed the gate is not assessed again; one that failed gets its report
+            txt, info = ocr_page(i, p, dedup_index=dedup_index, token=token, timer=timer,
+                                 options=options, gate=None if page_ok else gate, proc=proc)
+            out.append(f"===== PAGE {i} =====\n{txt}\n")
+            page_info.append(info)
+            if not info.get("skipped") and check("", page_complete=True):
+                settled = True
+                break
+    except OperationCancelled as e:
+        cancelled = e.reason
+    return {"text": "\n".join(out), "pages": page_info, "cancelled": cancelled,
+            "pages_skipped": page_count - len(page_info) if settled else 0,
+            "fields_settled": settled}
+
+def ocr_pages(pages: List[Image.Image]) -> str:
+    return ocr_document(pages)["text"]
+
+def run_extractor_on_text(ocr_text: str) -> Dict[str, Any]:
+    """
+    Try DocumentExtractor, PrescriptionParser (class), or extract function.
+    Always return a dict (maybe empty).
+    """
+    try:
+        if DocumentExtractor is not None:
+            try:
+                de = DocumentExtractor()
+                # DocumentExtractor.extract_from_text() typically returns dict with keys "entities","patient",...
+                res = de.extract_from_text(ocr_text)
+                # prefer nested 'entities' if present
+                if isinstance(res, dict) and "entities" in res:
+                    return res.get("entities", {}) or {}
+                if isinstance(res, dict):
+                    return res
+                return {}
+            except Exception:
+                print("=== DocumentExtractor error ===")
+                print(traceback.format_exc())
+                return {}
+        if PrescriptionParser is not None:
+            try:
+                p = PrescriptionParser(ocr_text)
+                if hasattr(p, "parse"):
+                    return p.parse() or {}
+                return {}
+            except Exception:
+                print("=== PrescriptionParser error ===")
+                print(traceback.format_exc())
+                return {}
+        if extract_entities_func is not None:
+            try:
+                return extract_entities_func(ocr_text) or {}
+            except Exception:
+                print("=== extract_entities_func error ===")
+                print(traceback.format_exc())
+                return {}
+    except Exception:
+        print("=== Unknown extractor error ===")
+        print(traceback.format_exc())
+        return {}
+    return {}
+
+def extract_from_ocr_text(ocr_text: str, warnings: List[str], timer: Optional[RequestTimer] = None):
+    """
+    Parse OCR text and normalize the patient exactly once.
+    DocumentExtractor already returns the normalized patient alongside the
+    entities; only the fallback extractors need a PatientDetails pass here.
+    Returns (entities, patient_obj).
+    """
+    timer = timer or RequestTimer()
+    if DocumentExtractor is not None:
+        try:
+            de = DocumentExtractor()
+            res = de.extract_from_text(ocr_text)
+            for stage, secs in (getattr(de, "timings", None) or {}).items():
+                timer.add(stage, secs)
+            if isinstance(res, dict) and "entities" in res:
+                warnings.extend(res.get("warnings") or [])
+                return res.get("entities") or {}, res.get("patient")
+        except Exception:
+            print("=== DocumentExtractor error ===")
+            print(traceback.format_exc())
+
+    with timer.span("parse"):
+        entities = run_extractor_on_text(ocr_text) or {}
+    patient_obj = None
+    if PatientDetails is not None:
+        try:
+            with timer.span("normalize"):
+                patient_obj = PatientDetails.from_extractor(entities or {}).to_dict()
+        except Exception:
+            warnings.append("PatientDetails normalization failed.")
+            print("=== PATIENT DETAILS ERROR ===")
+            print(traceback.format_exc())
+    return entities, patient_obj
+
+def extract_document_text(text: str) -> Dict[str, Any]:
+    """One document's OCR text -> entities, patient, warnings and stage seconds; in-thread twin of pool_worker.parse_document."""
+    warnings: List[str] = []
+    timer = RequestTimer()
+    entities, patient_obj = extract_from_ocr_text(text, warnings, timer)
+    return {"entities": entities, "patient": patient_obj, "warnings": warnings, "timings": timer.stages()}
+
+def extract_documents(ocr_text: str, warnings: List[str], timer: Optional[RequestTimer] = None,
+                      split: bool = True, parallel: bool = True):
+    """
+    Like extract_from_ocr_text, but a PDF holding several prescriptions is
+    split at their headers first and each one is parsed on its own - in
+    parallel in the OCR process pool when there is one. Returns
+    (entities, patient_obj, documents): documents is None for a single
+    prescription, else one entry per prescription with its pages, text
+    and results, and the top-level entities/patient are the first one's.
+    parallel=False parses in the calling thread (e.g. inside a pool worker).
+    """
+    timer = timer or RequestTimer()
+    parts = []
+    if split and DOC_SPLIT_ENABLED:
+        parts = split_documents(page_texts(ocr_text), head_lines=DOC_SPLIT_HEAD_LINES,
+                                min_cues=DOC_SPLIT_MIN_CUES)
+    if len(parts) < 2:
+        entities, patient_obj = extract_from_ocr_text(ocr_text, warnings, timer)
+        return entities, patient_obj, None
+
+    texts = [join_pages(part) for part in parts]
+    results = None
+    if parallel and OCR_PROCESS_WORKERS > 0 and DocumentExtractor is not None:
+        pool = ocr_process_pool()
+        try:
+            results = list(pool.map(parse_document, texts))
+        except BrokenProcessPool:
+            discard_ocr_process_pool(pool)
+            print("=== DOCUMENT POOL ERROR ===")
+            print(traceback.format_exc())
+    if results is None:
+        results = [extract_document_text(text) for text in texts]
+
+    documents = []
+    for part, text, res in zip(parts, texts, results):
+        for stage, secs in res["timings"].items():
+            timer.add(stage, secs)
+        documents.append({"pages": [no for no, _ in part], "text": text, "entities": res["entities"],
+                          "patient": res["patient"], "warnings": res["warnings"]})
+    warnings.append(
+        f"Found {len(documents)} prescriptions (pages {', '.join(page_span(part) for part in parts)}); "
+        "entities and patient are those of the first, all of them are in documents."
+    )
+    warnings.extend(documents[0]["warnings"])
+    return documents[0]["entities"], documents[0]["patient"], documents
+
+# -----------------------
+# Whole-PDF entry point
+# -----------------------
+def extract_pdf_file(pdf_path: str, poppler_path: Optional[str] = None,
+                     token: Optional[CancelToken] = None,
+                     timer: Optional[RequestTimer] = None,
+                     options: Optional[OcrOptions] = None) -> Dict[str, Any]:
+    """
+    Blocking pipeline for a PDF on disk: rasterize -> OCR -> extract -> normalize.
+    Run it from a worker thread. Raises MemoryBudgetExceeded when page
+    buffers could not be reserved in time. When the token is cancelled,
+    the pages finished so far are extracted and "partial" is set.
+    With options.fields, OCR stops once those fields are settled and the
+    result reports "pages_skipped".
+    """
+    warnings: List[str] = []
+    partial = False
+    early: Dict[str, Any] = {}
+    timer = timer or RequestTimer()
+    options = options or OcrOptions()
+
+    # pdf -> page count (pages themselves are rasterized lazily)
+    layout = rasterizer = None
+    try:
+        rasterizer, layout = open_rasterizer(pdf_path, poppler_path=poppler_path)
+    except Exception:
+        warnings.append("PDF->image conversion failed (poppler may be missing). OCR skipped.")
+        print("=== PDF->IMAGE ERROR ===")
+        print(traceback.format_exc())
+
+    # OCR
+    ocr_text = ""
+    page_info: List[Dict[str, Any]] = []
+    if layout and layout[0] > 0:
+        pdf_hash = file_sha256(pdf_path) if PAGE_CACHE is not None else None
+        held = Reservation()
+        pages = iter_pdf_pages(pdf_path, poppler_path=poppler_path, dpi=options.dpi,
+                               governor=MEMORY_GOVERNOR, layout=layout, token=token,
+                               cache=PAGE_CACHE, pdf_hash=pdf_hash, timer=timer, rasterizer=rasterizer,
+                               held=held)
+        try:
+            if options.fields:
+                doc = ocr_document_for_fields(pages, options.fields, layout[0], dedup_index=PAGE_DEDUP_INDEX,
+                                              token=token, timer=timer, options=options, gate=PAGE_GATE)
+                early = {"fields": list(options.fields), "fields_settled": doc["fields_settled"],
+                         "pages_skipped": doc["pages_skipped"]}
+            else:
+                if options.batch_pages:
+                    run = ocr_document_batched
+                elif OCR_PROCESS_WORKERS > 0:
+                    run = functools.partial(ocr_document_pooled, governor=MEMORY_GOVERNOR, limiter=OCR_CONCURRENCY,
+                                            held=held)
+                else:
+                    run = ocr_document
+                doc = run(pages, dedup_index=PAGE_DEDUP_INDEX, token=token, timer=timer,
+                          options=options, gate=PAGE_GATE)
+            ocr_text = doc["text"]
+            page_info = doc["pages"]
+            if doc["cancelled"]:
+                partial = True
+                warnings.append(
+                    f"OCR stopped ({doc['cancelled']}) after {len(page_info)} of {layout[0]} pages; "
+                    "results are partial."
+                )
+            for pi in page_info:
+                if pi.get("deduplicated") and pi.get("match_exact"):
+                    warnings.append(f"Page {pi['page']}: identical to an earlier page; reused its OCR text.")
+                elif pi.get("deduplicated"):
+                    warnings.append(
+                        f"Page {pi['page']}: reused OCR text of a near-duplicate page "
+                        f"(Hamming distance {pi['match_distance']})."
+                    )
+                if pi.get("skipped") == GATE_UNREADABLE:
+                    warnings.append(f"Page {pi['page']} looks unreadable ({pi['skip_reason']}); OCR skipped.")
+                elif pi.get("skipped") == GATE_BLANK:
+                    warnings.append(f"Page {pi['page']} looks blank ({pi['skip_reason']}); OCR skipped.")
+        except MemoryBudgetExceeded:
+            raise
+        except Exception:
+            warnings.append("OCR failed (tesseract may be missing). Using placeholder text.")
+            print("=== OCR ERROR ===")
+            print(traceback.format_exc())
+            ocr_text = "### OCR_FAILED ###\n"
+        finally:
+            pages.close()
+    else:
+        ocr_text = "### NO_PAGES ###\n"
+
+    # run extractor + patient normalization (once per prescription); field-targeted
+    # runs stop at the first document's fields, so they are not split
+    entities, patient_obj, documents = extract_documents(ocr_text, warnings, timer, split=not options.fields)
+    split = {"documents": documents} if documents else {}
+
+    return {"text": ocr_text, "entities": entities, "patient": patient_obj, "warnings": warnings,
+            "parser_version": PARSER_VERSION, "pages": page_info, "partial": partial, **early, **split,
+            "timings": timer.to_dict()}
@@ -0,0 +1,46 @@
+"""
+reparse_store.py - upgrade stored extractions to the current parser
+
+Usage:
+    python reparse_store.py [--store stored_extractions.jsonl] [--workers N]
+                            [--force] [--chunk N]
+
+Re-runs text-level extraction (PrescriptionParser / PatientDetails) on
+the raw OCR text of every record saved through POST /store whose
+_parser_version is older than PARSER_VERSION, and rewrites the store in
+place (see src/store/reparse.py). Records without raw_text are left as
+they are. --force re-parses every record with raw text. Prints counts
+and throughput as JSON. Exits 3 if another reparse holds the store.
+"""
+import argparse
+import json
+import os
+import sys
+
+from src.store.jsonl_store import JsonlStore, StoreBusy
+from src.store.reparse import reparse_store
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Re-parse stored extractions from their raw OCR text")
+    ap.add_argument("--store", default=os.environ.get("STORE_FILE", "stored_extractions.jsonl"))
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count, 0 = inline)")
+    ap.add_argument("--force", action="store_true", help="re-parse records that are already current")
+    ap.add_argument("--chunk", type=int, default=32, help="lines per task sent to a worker")
+    args = ap.parse_args(argv)
+
+    # the extraction code (and its optional parser imports) lives in the API module
+    from app import reparse_fields, PARSER_VERSION
+
+    try:
+        res = reparse_store(JsonlStore(args.store), reparse_fields, PARSER_VERSION,
+                            workers=args.workers, force=args.force, chunk_size=max(1, args.chunk))
+    except StoreBusy as e:
+        print(str(e), file=sys.stderr)
+        return 3
+    print(json.dumps(res, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# src.jobs package marker
@@ -0,0 +1,243 @@
+"""
+Extraction job queue shared by API and worker processes.
+
+Jobs live in a SQLite database and their PDFs in a spool directory; both
+may sit on a volume shared by several processes (or nodes, as long as
+the filesystem honours SQLite locking). The API process only enqueues
+jobs and reads results; `worker.py` processes claim jobs, run the OCR
+pipeline and write results back.
+
+Claims are leases: a worker that dies mid-job stops renewing its lease
+and the job becomes claimable again, up to max_attempts. A worker that
+cannot run a job right now (e.g. out of page memory) hands it back with
+release(): it is queued again after retry_delay without using up an
+attempt. complete() / fail() only count from the job's current owner: a
+worker whose lease expired and was taken over can neither overwrite the
+new owner's result nor delete the PDF the new owner is reading. Finished
+jobs are deleted by purge() once they are older than retention_seconds.
+"""
+from typing import Dict, Any, Optional, Tuple
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    status       TEXT NOT NULL,
+    payload_path TEXT NOT NULL,
+    options      TEXT,
+    created      REAL NOT NULL,
+    updated      REAL NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    worker       TEXT,
+    lease_until  REAL,  -- running: lease expiry; queued: not claimable before (release())
+    result       TEXT,
+    error        TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+"""
+
+
+class JobQueue:
+    def __init__(self, db_path: str, spool_dir: str,
+                 lease_seconds: float = 60.0, max_attempts: int = 3,
+                 retry_delay: float = 5.0, retention_seconds: float = 7 * 86400.0):
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retention_seconds = retention_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        os.makedirs(spool_dir, exist_ok=True)
+        with self._conn() as c:
+            c.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        """
+        Env vars:
+          - JOB_QUEUE_DB          -> SQLite file (default jobs.sqlite3)
+          - JOB_SPOOL_DIR         -> directory for queued PDFs (default job_spool)
+          - JOB_LEASE_SECONDS     -> claim lease, renewed by the worker (default 60)
+          - JOB_MAX_ATTEMPTS      -> claims before a job is marked failed (default 3)
+          - JOB_RETRY_DELAY_SECONDS -> wait before a released job is claimable again (default 5)
+          - JOB_RETENTION_SECONDS -> keep finished jobs this long (default 7 days, 0 = forever)
+        """
+        return cls(
+            os.environ.get("JOB_QUEUE_DB", "jobs.sqlite3"),
+            os.environ.get("JOB_SPOOL_DIR", "job_spool"),
+            lease_seconds=float(os.environ.get("JOB_LEASE_SECONDS", "60")),
+            max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", "3")),
+            retry_delay=float(os.environ.get("JOB_RETRY_DELAY_SECONDS", "5")),
+            retention_seconds=float(os.environ.get("JOB_RETENTION_SECONDS", str(7 * 86400))),
+        )
+
+    @contextmanager
+    def _conn(self):
+        # one short-lived connection per operation: safe across threads and processes
+        c = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        c.row_factory = sqlite3.Row
+        try:
+            yield c
+        finally:
+            c.close()
+
+    # -----------------------
+    # API side
+    # -----------------------
+    def new_payload_path(self) -> Tuple[str, str]:
+        """Return (job_id, path) where the caller should write the PDF before enqueue()."""
+        job_id = str(uuid.uuid4())
+        return job_id, os.path.join(self.spool_dir, f"{job_id}.pdf")
+
+    def enqueue(self, job_id: str, payload_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+        now = time.time()
+        with self._conn() as c:
+            c.execute(
+                "INSERT INTO jobs (id, status, payload_path, options, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, payload_path, json.dumps(options or {}), now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._conn() as c:
+            row = c.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def version(self, job_id: str) -> Optional[Tuple[str, float]]:
+        """(status, updated) of a job without loading its result; None if unknown."""
+        with self._conn() as c:
+            row = c.execute("SELECT status, updated FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return (row["status"], row["updated"]) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._conn() as c:
+            rows = c.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    # -----------------------
+    # worker side
+    # -----------------------
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest claimable queued job (or one whose lease expired).
+        Jobs that already used up max_attempts are marked failed instead.
+        """
+        now = time.time()
+        with self._conn() as c:
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = c.execute(
+                        "SELECT * FROM jobs WHERE (status = ? AND (lease_until IS NULL OR lease_until <= ?)) "
+                        "OR (status = ? AND lease_until < ?) ORDER BY created LIMIT 1",
+                        (QUEUED, now, RUNNING, now),
+                    ).fetchone()
+                    if row is None:
+                        c.execute("COMMIT")
+                        return None
+                    if row["attempts"] >= self.max_attempts:
+                        c.execute("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                                  (FAILED, "worker lease expired too many times", now, row["id"]))
+                        self._remove_payload(row["payload_path"])
+                        continue
+                    c.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, "
+                        "updated = ? WHERE id = ?",
+                        (RUNNING, worker_id, now + self.lease_seconds, now, row["id"]),
+                    )
+                    c.execute("COMMIT")
+                    job = self._row_to_dict(row)
+                    job["status"] = RUNNING
+                    job["attempts"] = row["attempts"] + 1
+                    return job
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Renew the lease; False means the job was taken over or finished."""
+        with self._conn() as c:
+            cur = c.execute(
+                "UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time() + self.lease_seconds, time.time(), job_id, worker_id, RUNNING),
+            )
+            return cur.rowcount == 1
+
+    def release(self, job_id: str, worker_id: str, delay: Optional[float] = None) -> bool:
+        """
+        Hand a claimed job back without using up an attempt: it is queued
+        again and claimable after `delay` (default retry_delay) seconds.
+        False if the job was no longer this worker's.
+        """
+        now = time.time()
+        delay = self.retry_delay if delay is None else delay
+        with self._conn() as c:
+            cur = c.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_until = ?, attempts = MAX(attempts - 1, 0), "
+                "updated = ? WHERE id = ? AND worker = ? AND status = ?",
+                (QUEUED, now + delay, now, job_id, worker_id, RUNNING),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Store the result; False (and nothing written) if the job is no longer this worker's."""
+        return self._finish(job_id, worker_id, DONE, result=json.dumps(result, ensure_ascii=False))
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """Mark the job failed; False (and nothing written) if the job is no longer this worker's."""
+        return self._finish(job_id, worker_id, FAILED, error=error)
+
+    def _finish(self, job_id: str, worker_id: str, status: str,
+                result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        with self._conn() as c:
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                row = c.execute("SELECT payload_path FROM jobs WHERE id = ? AND worker = ? AND status = ?",
+                                (job_id, worker_id, RUNNING)).fetchone()
+                if row is not None:
+                    c.execute("UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated = ? "
+                              "WHERE id = ?", (status, result, error, time.time(), job_id))
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+        if row is None:
+            return False
+        self._remove_payload(row["payload_path"])
+        return True
+
+    @staticmethod
+    def _remove_payload(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def purge(self, older_than_seconds: Optional[float] = None) -> int:
+        """Delete finished jobs older than the given age (default retention_seconds); returns how many."""
+        if older_than_seconds is None:
+            if self.retention_seconds <= 0:
+                return 0
+            older_than_seconds = self.retention_seconds
+        cutoff = time.time() - older_than_seconds
+        with self._conn() as c:
+            cur = c.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, cutoff))
+            return cur.rowcount
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        d = dict(row)
+        d["options"] = json.loads(d.get("options") or "{}")
+        d["result"] = json.loads(d["result"]) if d.get("result") else None
+        return d
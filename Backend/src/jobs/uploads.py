@@ -0,0 +1,149 @@
+"""
+Resumable (tus-style) upload spool.
+
+Clinics on poor connections upload large scans in pieces:
+  1. create(length, metadata)      -> upload id, an empty <id>.part file
+  2. append(id, offset) per PATCH  -> bytes are written straight to the
+     .part file as they arrive; the offset is the file size on disk, so
+     whatever reached the disk before a dropped connection is kept
+  3. offset(id) (HEAD)             -> where the client should resume
+  4. once offset == length the file is handed to the extraction pipeline
+Uploads untouched for ttl_seconds are removed by purge().
+"""
+from typing import Dict, Any, Optional
+from contextlib import contextmanager
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class UploadSpool:
+    def __init__(self, root: str, max_bytes: int = 200 * 1024 * 1024, ttl_seconds: float = 24 * 3600.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._busy = set()
+        os.makedirs(root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "UploadSpool":
+        """
+        Env vars:
+          - UPLOAD_DIR          -> spool directory (default upload_spool)
+          - UPLOAD_MAX_MB       -> largest accepted Upload-Length (default 200)
+          - UPLOAD_TTL_SECONDS  -> idle time before an upload is purged (default 86400)
+        """
+        return cls(
+            os.environ.get("UPLOAD_DIR", "upload_spool"),
+            max_bytes=int(float(os.environ.get("UPLOAD_MAX_MB", "200")) * 1024 * 1024),
+            ttl_seconds=float(os.environ.get("UPLOAD_TTL_SECONDS", "86400")),
+        )
+
+    def _paths(self, upload_id: str):
+        # ids are uuid4 hex; anything else never names a file in the spool
+        try:
+            upload_id = uuid.UUID(hex=upload_id).hex
+        except ValueError:
+            raise UploadError(404, "Unknown upload.")
+        base = os.path.join(self.root, upload_id)
+        return base + ".part", base + ".json"
+
+    def create(self, length: int, metadata: Optional[Dict[str, str]] = None) -> str:
+        if length <= 0:
+            raise UploadError(400, "Upload-Length must be a positive integer.")
+        if length > self.max_bytes:
+            raise UploadError(413, f"Upload exceeds the {self.max_bytes} byte limit.")
+        upload_id = uuid.uuid4().hex
+        part, meta = self._paths(upload_id)
+        with open(meta, "w", encoding="utf-8") as f:
+            json.dump({"length": length, "metadata": metadata or {}, "created": time.time()}, f)
+        open(part, "wb").close()
+        return upload_id
+
+    def info(self, upload_id: str) -> Dict[str, Any]:
+        part, meta = self._paths(upload_id)
+        try:
+            with open(meta, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            info["offset"] = os.path.getsize(part)
+        except (OSError, ValueError):
+            raise UploadError(404, "Unknown upload.")
+        info["id"] = upload_id
+        info["path"] = part
+        return info
+
+    @contextmanager
+    def writer(self, upload_id: str, offset: int):
+        """
+        Exclusive append handle positioned at `offset`, which must equal the
+        current size on disk (409 otherwise, or when another PATCH for the
+        same upload is still running). Yields write(bytes).
+        """
+        info = self.info(upload_id)
+        with self._lock:
+            if upload_id in self._busy:
+                raise UploadError(409, "Another request is writing to this upload.")
+            self._busy.add(upload_id)
+        try:
+            if offset != info["offset"]:
+                raise UploadError(409, f"Upload-Offset mismatch; current offset is {info['offset']}.")
+            remaining = info["length"] - offset
+            with open(info["path"], "ab") as f:
+                def write(data: bytes) -> None:
+                    nonlocal remaining
+                    if len(data) > remaining:
+                        raise UploadError(413, "Chunk goes past Upload-Length.")
+                    f.write(data)
+                    remaining -= len(data)
+                yield write
+        finally:
+            with self._lock:
+                self._busy.discard(upload_id)
+
+    def take(self, upload_id: str, dest: str) -> Dict[str, Any]:
+        """Move a complete upload to dest (consuming it); 409 if bytes are still missing."""
+        info = self.info(upload_id)
+        if info["offset"] != info["length"]:
+            raise UploadError(409, f"Upload incomplete: {info['offset']} of {info['length']} bytes.")
+        shutil.move(info["path"], dest)
+        self.delete(upload_id)
+        return info
+
+    def delete(self, upload_id: str) -> None:
+        for p in self._paths(upload_id):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Remove uploads idle for longer than ttl_seconds; return how many were removed."""
+        now = now if now is not None else time.time()
+        removed = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[:-5]
+            try:
+                part, meta = self._paths(upload_id)
+            except UploadError:
+                continue
+            try:
+                last = max(os.path.getmtime(p) for p in (part, meta) if os.path.exists(p))
+            except ValueError:
+                continue
+            if now - last > self.ttl_seconds and upload_id not in self._busy:
+                self.delete(upload_id)
+                removed += 1
+        return removed
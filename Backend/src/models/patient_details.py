@@ -1,32 +1,97 @@
 # patient_details.py
 from __future__ import annotations
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, date as _date
+from functools import lru_cache
 import re
 
 from pydantic import BaseModel, Field, validator
 
 
-@dataclass
+# -----------------------
+# Date parsing
+# -----------------------
+DATE_FORMATS = (
+    "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y",
+    "%Y-%m-%d", "%d %b %Y", "%d %B %Y", "%b %d, %Y", "%B %d, %Y"
+)
+_DMY_RE = re.compile(r'^([0-9]{1,2})([/-])([0-9]{1,2})\2([0-9]{4}|[0-9]{2})$')
+_ISO_RE = re.compile(r'^([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})$')
+_HAS_ALPHA_RE = re.compile(r'[A-Za-z]')
+_YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')
+
+
+def _ws(s: Optional[str]) -> str:
+    """Collapse whitespace runs to one space and strip (same as re.sub(r'\\s+', ' ', s.strip()))."""
+    return " ".join(s.split()) if s else ""
+
+
+@lru_cache(maxsize=8192)
+def parse_date(dt_str: str) -> Optional[str]:
+    """
+    Parse an OCR date string to ISO format; same results as trying
+    DATE_FORMATS in order with strptime, then falling back to Jan 1st of
+    a bare 19xx/20xx year.
+    Numeric d/m/y and ISO shapes are decoded directly; strptime only runs
+    for strings containing month names, so a miss no longer costs one
+    raised ValueError per format. Results are memoized since the same
+    few date strings repeat across a batch.
+    """
+    if not dt_str:
+        return None
+    dt_str = dt_str.strip()
+    m = _DMY_RE.match(dt_str)
+    if m:
+        day, month, year = int(m.group(1)), int(m.group(3)), m.group(4)
+        y = int(year)
+        if len(year) == 2:
+            # strptime %y pivot: 69-99 -> 19xx, 00-68 -> 20xx
+            y += 1900 if y >= 69 else 2000
+        try:
+            return _date(y, month, day).isoformat()
+        except ValueError:
+            pass
+    else:
+        m = _ISO_RE.match(dt_str)
+        if m:
+            try:
+                return _date(int(m.group(1)), int(m.group(2)), int(m.group(3))).isoformat()
+            except ValueError:
+                pass
+        elif _HAS_ALPHA_RE.search(dt_str):
+            for p in DATE_FORMATS[5:]:
+                try:
+                    return datetime.strptime(dt_str, p).date().isoformat()
+                except ValueError:
+                    continue
+    y = _YEAR_RE.search(dt_str)
+    if y:
+        return f"{y.group(0)}-01-01"
+    return None
+
+
+@dataclass(slots=True)
 class Medicine:
     name: str
     strength: Optional[str] = ""
     directions: Optional[str] = ""
 
+    @classmethod
+    def from_raw(cls, name: Any, strength: Any = "", directions: Any = "") -> "Medicine":
+        """Build an already-normalized Medicine (one allocation instead of two)."""
+        return cls(_ws(name), _ws(strength), _ws(directions))
+
     def normalized(self) -> "Medicine":
-        name = (self.name or "").strip()
-        strength = (self.strength or "").strip()
-        directions = (self.directions or "").strip()
-        name = re.sub(r'\s+', ' ', name)
-        strength = re.sub(r'\s+', ' ', strength)
-        directions = re.sub(r'\s+', ' ', directions)
-        return Medicine(name=name, strength=strength, directions=directions)
+        return Medicine.from_raw(self.name, self.strength, self.directions)
 
     def to_dict(self) -> Dict[str, Any]:
         return {"name": self.name, "strength": self.strength, "directions": self.directions}
 
 
+_NAME_DATE_TAIL_RE = re.compile(r'\bDate\b.*$', re.I)
+
+
 class PatientDetailsModel(BaseModel):
     doctor_name: Optional[str] = Field(default=None)
     patient_name: Optional[str] = Field(default=None)
@@ -54,6 +119,9 @@ class PatientDetailsModel(BaseModel):
 
 
 class PatientDetails:
+    __slots__ = ("doctor_name", "patient_name", "date", "parsed_date",
+                 "patient_address", "medicines", "refills", "warnings")
+
     def __init__(self,
                  doctor_name: Optional[str] = None,
                  patient_name: Optional[str] = None,
@@ -67,44 +135,28 @@ class PatientDetails:
         self.date = date
         self.parsed_date = None
         self.patient_address = patient_address
-        self.medicines = [Medicine(**m) if isinstance(m, dict) else Medicine(m) for m in (medicines or [])]
+        self.medicines = [Medicine.from_raw(**m) if isinstance(m, dict) else
+                          m.normalized() if isinstance(m, Medicine) else
+                          Medicine.from_raw(m) for m in (medicines or [])]
         self.refills = int(refills or 0)
         self.warnings = warnings or []
         self._normalize()
 
     def _normalize(self):
         if self.patient_name:
-            self.patient_name = re.sub(r'\s+', ' ', self.patient_name).strip()
-            self.patient_name = re.sub(r'\bDate\b.*$', '', self.patient_name, flags=re.I).strip()
+            self.patient_name = _ws(self.patient_name)
+            self.patient_name = _NAME_DATE_TAIL_RE.sub('', self.patient_name).strip()
 
         if self.patient_address:
-            self.patient_address = re.sub(r'\s+', ' ', self.patient_address).strip()
+            self.patient_address = _ws(self.patient_address)
             self.patient_address = self.patient_address.rstrip('.,|')
 
-        self.medicines = [m.normalized() for m in self.medicines]
-
         if self.date:
-            self.parsed_date = self._try_parse_date(self.date)
+            self.parsed_date = parse_date(self.date)
 
     @staticmethod
     def _try_parse_date(dt_str: str) -> Optional[str]:
-        if not dt_str:
-            return None
-        dt_str = dt_str.strip()
-        patterns = [
-            "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y",
-            "%Y-%m-%d", "%d %b %Y", "%d %B %Y", "%b %d, %Y", "%B %d, %Y"
-        ]
-        for p in patterns:
-            try:
-                d = datetime.strptime(dt_str, p)
-                return d.date().isoformat()
-            except Exception:
-                continue
-        y = re.search(r'\b(19|20)\d{2}\b', dt_str)
-        if y:
-            return f"{y.group(0)}-01-01"
-        return None
+        return parse_date(dt_str)
 
     @classmethod
     def from_extractor(cls, entities: Dict[str, Any]) -> "PatientDetails":
@@ -116,11 +168,11 @@ class PatientDetails:
         meds_out = []
         for m in medicines:
             if isinstance(m, str):
-                meds_out.append({"name": m, "strength": "", "directions": ""})
+                meds_out.append(Medicine.from_raw(m))
             elif isinstance(m, dict):
-                meds_out.append({"name": m.get("name") or "", "strength": m.get("strength") or "", "directions": m.get("directions") or ""})
+                meds_out.append(Medicine.from_raw(m.get("name"), m.get("strength"), m.get("directions")))
             else:
-                meds_out.append({"name": str(m), "strength": "", "directions": ""})
+                meds_out.append(Medicine.from_raw(str(m)))
         refills = entities.get("refills") or entities.get("refill") or 0
         warnings = entities.get("warnings") or []
         return cls(doctor_name=doctor,
@@ -131,6 +183,23 @@ class PatientDetails:
                    refills=refills,
                    warnings=warnings)
 
+    @classmethod
+    def from_extractor_many(cls, entities_list: Iterable[Dict[str, Any]]) -> List["PatientDetails"]:
+        """
+        Batch variant of from_extractor for thousands of entity dicts
+        (e.g. re-normalizing the stored JSONL history). Records that fail
+        to normalize come back as an empty PatientDetails with a warning
+        rather than aborting the batch.
+        """
+        out: List[PatientDetails] = []
+        append = out.append
+        for entities in entities_list:
+            try:
+                append(cls.from_extractor(entities or {}))
+            except Exception:
+                append(cls(warnings=["PatientDetails normalization failed."]))
+        return out
+
     def to_model(self) -> PatientDetailsModel:
         model = PatientDetailsModel(
             doctor_name=self.doctor_name,
@@ -145,4 +214,17 @@ class PatientDetails:
         return model
 
     def to_dict(self) -> Dict[str, Any]:
-        return self.to_model().dict()
+        """
+        Same output as to_model().dict() without building a pydantic model:
+        _normalize() has already done what the model validators do.
+        """
+        return {
+            "doctor_name": self.doctor_name,
+            "patient_name": self.patient_name or None,
+            "date": self.date,
+            "parsed_date": self.parsed_date,
+            "patient_address": self.patient_address,
+            "medicines": [m.to_dict() for m in self.medicines],
+            "refills": self.refills,
+            "warnings": list(self.warnings),
+        }
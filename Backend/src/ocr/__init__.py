@@ -0,0 +1 @@
+# src.ocr package marker
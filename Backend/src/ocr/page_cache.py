@@ -0,0 +1,141 @@
+"""
+On-disk artifact cache of rasterized grayscale pages.
+
+Re-running OCR on a PDF (new tesseract config, new preprocessing, retry
+after a failure) used to send the whole file back through pdftoppm at
+300 DPI although the pixels would be identical. Pages are stored here as
+uncompressed .npy files keyed by (PDF sha256, page number, DPI) and are
+memory-mapped on a hit, so a re-OCR neither rasterizes nor copies the
+page into the heap up front.
+
+The cache is bounded by total bytes; least recently used pages are
+evicted first (use is tracked in memory and seeded from file mtimes).
+"""
+from typing import Optional, Dict, Any
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+DEFAULT_MAX_MB = 2048
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PageArtifactCache:
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, int]" = OrderedDict()   # path -> size, LRU order
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    @classmethod
+    def from_env(cls) -> Optional["PageArtifactCache"]:
+        """
+        Env vars:
+          - PAGE_CACHE_DIR     -> directory for cached pages (unset = disabled)
+          - PAGE_CACHE_MAX_MB  -> size bound (default 2048)
+        """
+        root = os.environ.get("PAGE_CACHE_DIR")
+        if not root:
+            return None
+        return cls(root, int(float(os.environ.get("PAGE_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024))
+
+    def path_for(self, pdf_hash: str, page: int, dpi: int) -> str:
+        return os.path.join(self.root, pdf_hash[:2], pdf_hash, f"p{page:05d}_d{dpi}.npy")
+
+    def get(self, pdf_hash: str, page: int, dpi: int) -> Optional[np.ndarray]:
+        """Return a read-only memory-mapped grayscale page, or None on a miss."""
+        path = self.path_for(pdf_hash, page, dpi)
+        try:
+            arr = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+                self._forget(path)
+            return None
+        with self._lock:
+            self.hits += 1
+            if path in self._files:
+                self._files.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arr
+
+    def put(self, pdf_hash: str, page: int, dpi: int, gray: np.ndarray) -> None:
+        """Store a 2-D uint8 page (atomic write) and evict down to max_bytes."""
+        path = self.path_for(pdf_hash, page, dpi)
+        d = os.path.dirname(path)
+        os.makedirs(d, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=d, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(gray, dtype=np.uint8))
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            self._forget(path)
+            self._files[path] = size
+            self._total += size
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._files), "bytes": self._total, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    # -----------------------
+    # internals (call with the lock held)
+    # -----------------------
+    def _forget(self, path: str) -> None:
+        size = self._files.pop(path, None)
+        if size is not None:
+            self._total -= size
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and len(self._files) > 1:
+            path, size = self._files.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))   # only succeeds once the PDF dir is empty
+            except OSError:
+                pass
+
+    def _scan(self) -> None:
+        found = []
+        for dirpath, _, names in os.walk(self.root):
+            for n in names:
+                if n.endswith(".npy"):
+                    p = os.path.join(dirpath, n)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, p, st.st_size))
+        for _, p, size in sorted(found):
+            self._files[p] = size
+            self._total += size
+        self._evict()
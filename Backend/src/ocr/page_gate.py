@@ -0,0 +1,120 @@
+"""
+Cheap pre-OCR gate for blank and unreadable pages.
+
+Scanned bundles contain blank backs of pages, fax cover sheets and
+near-black photocopies. Running full preprocessing + tesseract on those
+costs seconds and yields nothing (or garbage). The gate looks at a
+downscaled grayscale copy of the page (~512 px on the long side) and
+computes, fully vectorized in NumPy:
+  - ink pixels: how many pixels are clearly darker than the paper (median
+                level); an absolute count, so one short line or a
+                signature on an otherwise empty page still registers
+  - contrast:   paper level minus the level of the darkest INK_SAMPLE
+                pixels, again a count rather than a quantile of the page
+  - sharpness:  variance of the 4-neighbour Laplacian (low = blurred)
+  - mean level: near-black photocopies have a very low mean
+and classifies the page as "ok", "blank" or "unreadable". A page is only
+"blank" when both its ink and its contrast are negligible.
+
+The gate is off by default (PAGE_GATE_ENABLED=1 turns it on) until its
+thresholds have been checked against the corpus.
+"""
+from typing import Dict, Any, Union
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+OK = "ok"
+BLANK = "blank"
+UNREADABLE = "unreadable"
+# grey levels below the paper a pixel must be to count as ink
+INK_DELTA = 12
+# contrast is measured against the darkest this-many pixels of the page
+INK_SAMPLE = 20
+
+
+def downscale_gray(page: Union[Image.Image, np.ndarray], max_side: int = 512) -> np.ndarray:
+    """Area-downscale a page to at most max_side pixels and return it as uint8 grayscale."""
+    if isinstance(page, np.ndarray):
+        arr = page if page.ndim == 2 else cv2.cvtColor(page, cv2.COLOR_RGB2GRAY)
+        h, w = arr.shape
+        scale = min(1.0, max_side / float(max(h, w)))
+        if scale >= 1.0:
+            return np.asarray(arr, dtype=np.uint8)
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        return cv2.resize(arr, size, interpolation=cv2.INTER_AREA)
+    w, h = page.size
+    scale = min(1.0, max_side / float(max(w, h)))
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    return np.asarray(page.resize(size, Image.Resampling.BOX).convert("L"), dtype=np.uint8)
+
+
+def _level(cdf: np.ndarray, q: float) -> int:
+    """Grey level at quantile q (0..1) from a cumulative histogram."""
+    return int(np.searchsorted(cdf, q * cdf[-1]))
+
+
+def page_metrics(small: np.ndarray) -> Dict[str, float]:
+    # a 256-bin histogram gives every percentile in O(n) without sorting
+    hist = np.bincount(small.ravel(), minlength=256)
+    cdf = np.cumsum(hist)
+    paper = _level(cdf, 0.5)
+    darkest = int(np.searchsorted(cdf, min(INK_SAMPLE, int(cdf[-1]))))
+    ink_cut = paper - INK_DELTA
+    ink_pixels = int(cdf[ink_cut - 1]) if ink_cut > 0 else 0
+    f = small.astype(np.float32)
+    lap = (f[1:-1, :-2] + f[1:-1, 2:] + f[:-2, 1:-1] + f[2:, 1:-1] - 4.0 * f[1:-1, 1:-1])
+    return {
+        "mean": round(float(np.dot(hist, np.arange(256)) / cdf[-1]), 2),
+        "contrast": float(max(0, paper - darkest)),
+        "ink_pixels": ink_pixels,
+        "sharpness": round(float(lap.var()) if lap.size else 0.0, 2),
+    }
+
+
+class PageGate:
+    def __init__(self,
+                 blank_ink_pixels: int = 20,
+                 min_contrast: float = 30.0,
+                 dark_mean: float = 45.0,
+                 min_sharpness: float = 25.0,
+                 max_side: int = 512):
+        self.blank_ink_pixels = blank_ink_pixels
+        self.min_contrast = min_contrast
+        self.dark_mean = dark_mean
+        self.min_sharpness = min_sharpness
+        self.max_side = max_side
+
+    @classmethod
+    def from_env(cls):
+        """
+        Env vars (PAGE_GATE_ENABLED=1 enables the gate; off by default):
+          - PAGE_GATE_BLANK_INK_PIXELS -> ink pixels (on the downscaled page) below which,
+                                          with low contrast too, a page is blank
+          - PAGE_GATE_MIN_CONTRAST   -> paper-to-darkest-ink grey spread below which text is unreadable
+          - PAGE_GATE_DARK_MEAN      -> mean grey level below which a page is "too dark"
+          - PAGE_GATE_MIN_SHARPNESS  -> Laplacian variance below which a page is too blurred
+        """
+        if os.environ.get("PAGE_GATE_ENABLED", "0").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            blank_ink_pixels=int(os.environ.get("PAGE_GATE_BLANK_INK_PIXELS", "20")),
+            min_contrast=float(os.environ.get("PAGE_GATE_MIN_CONTRAST", "30")),
+            dark_mean=float(os.environ.get("PAGE_GATE_DARK_MEAN", "45")),
+            min_sharpness=float(os.environ.get("PAGE_GATE_MIN_SHARPNESS", "25")),
+        )
+
+    def assess(self, page: Union[Image.Image, np.ndarray]) -> Dict[str, Any]:
+        """Return {"verdict": ok|blank|unreadable, "reason": str, "metrics": {...}}."""
+        m = page_metrics(downscale_gray(page, self.max_side))
+        if m["mean"] < self.dark_mean:
+            return {"verdict": UNREADABLE, "reason": f"too dark, mean grey {m['mean']}", "metrics": m}
+        if m["ink_pixels"] < self.blank_ink_pixels and m["contrast"] < self.min_contrast:
+            return {"verdict": BLANK, "reason": f"no ink, {m['ink_pixels']} ink pixels", "metrics": m}
+        if m["contrast"] < self.min_contrast:
+            return {"verdict": UNREADABLE, "reason": f"low contrast, spread {m['contrast']}", "metrics": m}
+        if m["sharpness"] < self.min_sharpness:
+            return {"verdict": UNREADABLE, "reason": f"too blurred, sharpness {m['sharpness']}", "metrics": m}
+        return {"verdict": OK, "reason": "", "metrics": m}
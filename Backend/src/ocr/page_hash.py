@@ -0,0 +1,234 @@
+"""
+Perceptual page hashing and a small near-duplicate index.
+
+Re-faxed prescriptions are never byte-identical (scan noise, slight
+shifts, different fax headers), so exact hashes of the PDF miss them.
+A difference hash (dHash) of a heavily downscaled page is stable under
+that kind of noise, and two copies of the same page end up within a few
+bits of each other (Hamming distance).
+
+The index keeps (hash -> OCR text) for recently seen pages so the OCR
+step can be skipped when a new page is close enough to an earlier one.
+
+Near-duplicate reuse is OFF by default. A 256-bit dHash cannot tell two
+prescriptions on the same template apart when only the handwritten name
+or dose differs, and reusing the wrong page's text would put one
+patient's data on another's record. Finer visual checks (block-wise
+dHash, aligned thumbnails, per-line hashes) moved as much under scan
+noise and sub-cell shifts as under a changed name or dose, so none of
+them can confirm a near match either. By default (match="exact") the
+index is therefore an exact-repeat cache: the dHash only narrows the
+scan, and text is reused when a SHA-256 of the page pixels matches too,
+i.e. the same rendered page was submitted again. match="near" reuses
+text on the dHash alone, which also catches re-faxed copies, for
+deployments that accept that risk.
+
+The optional persistence file holds OCR text, i.e. patient data, in
+plain JSON: put it on encrypted storage. It is created owner-only (0600).
+"""
+from typing import Dict, Any, NamedTuple, Optional, List, Union
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_HASH_SIZE = 16          # 16x16 gradients -> 256-bit hash
+DEFAULT_MAX_DISTANCE = 12       # ~5% of the bits may differ
+DEFAULT_MAX_ENTRIES = 5000
+# gradients smaller than this (in grey levels) count as "flat"; without a
+# dead band, the white margins of a page hash to scan-noise coin flips
+GRADIENT_DEADBAND = 2
+MATCH_EXACT = "exact"
+MATCH_NEAR = "near"
+
+
+def dhash(page: Union[Image.Image, np.ndarray], hash_size: int = DEFAULT_HASH_SIZE) -> int:
+    """
+    Compute a difference hash of a page.
+    The page is box-downscaled to (hash_size + 1) x hash_size grayscale
+    and each bit records whether a pixel is brighter than its right-hand
+    neighbour by more than GRADIENT_DEADBAND. Returns the hash as a Python int of hash_size**2 bits.
+    """
+    if isinstance(page, np.ndarray):
+        page = Image.fromarray(page)
+    # resize first, convert after: avoids a full-frame grayscale copy
+    small = page.resize((hash_size + 1, hash_size), Image.Resampling.BOX).convert("L")
+    px = np.asarray(small, dtype=np.int16)
+    bits = ((px[:, 1:] - px[:, :-1]) > GRADIENT_DEADBAND).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def pixel_digest(page: Union[Image.Image, np.ndarray]) -> str:
+    """SHA-256 over a page's shape and raw pixels (exact-repeat matching)."""
+    arr = np.ascontiguousarray(np.asarray(page))
+    h = hashlib.sha256(f"{arr.shape}{arr.dtype.str}".encode())
+    h.update(memoryview(arr).cast("B"))
+    return h.hexdigest()
+
+
+class PageKey(NamedTuple):
+    """What the index stores a page under: its dHash and, for exact matching, its pixel digest."""
+    dhash: int
+    digest: Optional[str] = None
+
+
+class PageMatch:
+    __slots__ = ("page_hash", "text", "distance", "bits", "exact")
+
+    def __init__(self, page_hash: int, text: str, distance: int, bits: int, exact: bool = False):
+        self.page_hash = page_hash
+        self.text = text
+        self.distance = distance
+        self.bits = bits
+        self.exact = exact
+
+    @property
+    def similarity(self) -> float:
+        return 1.0 - (self.distance / float(self.bits or 1))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "match_distance": self.distance,
+            "match_similarity": round(self.similarity, 4),
+            "matched_hash": format(self.page_hash, "x"),
+            "match_exact": self.exact,
+        }
+
+
+class PageHashIndex:
+    """
+    Thread-safe, size-bounded (LRU) index of page hashes -> OCR text.
+    Lookups are a linear Hamming scan; with a few thousand entries this
+    costs well under a millisecond compared to seconds of tesseract.
+
+    If `path` is given, entries are appended to it as JSON lines and
+    reloaded on start-up so the index survives restarts.
+    """
+
+    def __init__(self,
+                 hash_size: int = DEFAULT_HASH_SIZE,
+                 max_distance: int = DEFAULT_MAX_DISTANCE,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 path: Optional[str] = None,
+                 match: str = MATCH_EXACT):
+        if match not in (MATCH_EXACT, MATCH_NEAR):
+            raise ValueError(f"unknown dedup match mode {match!r}; expected exact or near")
+        self.hash_size = hash_size
+        self.bits = hash_size * hash_size
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.path = path
+        self.match = match
+        # keyed by dHash and digest, so pages sharing a dHash do not evict each other
+        self._entries: "OrderedDict[PageKey, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["PageHashIndex"]:
+        """
+        Build the index from env vars, or return None when dedup is off.
+          - PAGE_DEDUP_ENABLED       -> "1" to enable (default off)
+          - PAGE_DEDUP_MATCH         -> exact (default: only identical pages reuse text)
+                                        | near (dHash within max distance; see module doc)
+          - PAGE_DEDUP_MAX_DISTANCE  -> max Hamming distance for a near match
+          - PAGE_DEDUP_MAX_ENTRIES   -> index size bound
+          - PAGE_DEDUP_INDEX_FILE    -> optional JSONL persistence file; holds OCR
+                                        text, keep it on encrypted storage
+        """
+        if os.environ.get("PAGE_DEDUP_ENABLED", "0").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            max_distance=int(os.environ.get("PAGE_DEDUP_MAX_DISTANCE", DEFAULT_MAX_DISTANCE)),
+            max_entries=int(os.environ.get("PAGE_DEDUP_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            path=os.environ.get("PAGE_DEDUP_INDEX_FILE") or None,
+            match=os.environ.get("PAGE_DEDUP_MATCH", MATCH_EXACT).strip().lower(),
+        )
+
+    def scratch(self) -> "PageHashIndex":
+        """An empty, in-memory index that matches like this one (for pages still in flight)."""
+        return PageHashIndex(hash_size=self.hash_size, max_distance=self.max_distance, match=self.match)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hash_page(self, page: Union[Image.Image, np.ndarray]) -> PageKey:
+        digest = pixel_digest(page) if self.match == MATCH_EXACT else None
+        return PageKey(dhash(page, self.hash_size), digest)
+
+    def lookup(self, key: PageKey) -> Optional[PageMatch]:
+        """Return the entry for the same page (exact) or the closest within max_distance (near), or None."""
+        with self._lock:
+            if self.match == MATCH_EXACT:
+                text = self._entries.get(key) if key.digest is not None else None
+                if text is None:
+                    return None
+                self._entries.move_to_end(key)
+                return PageMatch(key.dhash, text, 0, self.bits, exact=True)
+            best, best_dist = None, self.max_distance + 1
+            for k in self._entries:
+                d = (k.dhash ^ key.dhash).bit_count()
+                if d < best_dist:
+                    best, best_dist = k, d
+                    if d == 0:
+                        break
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            return PageMatch(best.dhash, self._entries[best], best_dist, self.bits)
+
+    def add(self, key: PageKey, text: str) -> None:
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path:
+                try:
+                    with self._open("a") as f:
+                        f.write(self._line(key, text))
+                except OSError:
+                    pass
+
+    def _open(self, mode: str, path: Optional[str] = None):
+        # owner-only: the file holds OCR text (patient data)
+        fd = os.open(path or self.path, os.O_WRONLY | os.O_CREAT | (os.O_APPEND if mode == "a" else os.O_TRUNC),
+                     0o600)
+        return os.fdopen(fd, mode, encoding="utf-8")
+
+    @staticmethod
+    def _line(key: PageKey, text: str) -> str:
+        return json.dumps({"h": format(key.dhash, "x"), "d": key.digest, "text": text}, ensure_ascii=False) + "\n"
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        n_lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for ln in f:
+                n_lines += 1
+                try:
+                    rec = json.loads(ln)
+                    key = PageKey(int(rec["h"], 16), rec.get("d"))
+                except Exception:
+                    continue
+                self._entries[key] = rec.get("text") or ""
+                self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        # compact the append-only file once it holds mostly stale lines
+        if n_lines > 2 * max(len(self._entries), 1):
+            tmp = self.path + ".tmp"
+            with self._open("w", tmp) as f:
+                for key, text in self._entries.items():
+                    f.write(self._line(key, text))
+            os.replace(tmp, self.path)
@@ -0,0 +1,87 @@
+"""
+Tasks run in the OCR process pool (OCR_PROCESS_WORKERS > 0).
+
+Pool workers are spawned, so they import only what the pickled task
+names. Everything here lives outside app.py and pipeline.py on purpose:
+importing either would repeat its start-up in every worker (memory
+governor, dedup index, rasterizer probe; upload spool, store and
+admission for the API module) and give each worker its own tesseract
+limiter. Instead the parent keeps the one OcrConcurrency:
+it holds a slot for every page it has in the pool and passes that slot's
+OMP_THREAD_LIMIT share along with the page; workers run tesseract
+unthrottled with that share, and report each page's CPU use back (the
+parent's getrusage never sees the pool) so the limiter can adapt.
+"""
+from typing import Any, Dict, NamedTuple, Optional
+import os
+import time
+
+import pytesseract
+
+from src.ocr.preprocess import preprocess_image_for_ocr
+from src.ocr.tesseract_runner import image_to_string, use_limiter
+from src.ocr.tiling import ocr_tiled
+from src.runtime.cancellation import CancelToken
+from src.runtime.ocr_concurrency import sample_cpu, set_opencv_threads
+from src.runtime.shared_pages import PageRef, attach
+
+
+class PageSettings(NamedTuple):
+    """The parts of the app's OcrOptions a worker needs (plain values, picklable without pipeline)."""
+    preprocess: str
+    tesseract_config: str
+    tile_min_pixels: int
+    tile_height: int
+    tile_overlap: int
+    tile_workers: int
+
+
+def init_worker(tesseract_cmd: Optional[str]) -> None:
+    """Pool initializer: the parent's tesseract binary, no limiter of its own."""
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    use_limiter(None)
+
+
+def ocr_shared_page(ref: PageRef, settings: PageSettings, timeout: Optional[float],
+                    threads: int) -> Dict[str, Any]:
+    """
+    Preprocess + OCR one page handed over in shared memory. "usage" is the
+    (CPU seconds, involuntary switches) the page took in this worker and
+    its tesseract children.
+    """
+    # one task at a time per worker, so the share and the usage are this page's
+    cpu0, switches0 = sample_cpu()
+    os.environ["OMP_THREAD_LIMIT"] = str(max(1, threads))
+    set_opencv_threads(max(1, threads))
+    token = CancelToken(timeout) if timeout else None
+    info: Dict[str, Any] = {}
+    try:
+        t0 = time.perf_counter()
+        with attach(ref) as gray:
+            proc = preprocess_image_for_ocr(gray, settings.preprocess)
+        t1 = time.perf_counter()
+        if settings.tile_min_pixels and proc.width * proc.height > settings.tile_min_pixels:
+            # the strips run side by side within this page's share
+            os.environ["OMP_THREAD_LIMIT"] = str(max(1, threads // max(1, settings.tile_workers)))
+            txt, info["tiles"] = ocr_tiled(
+                proc, lambda strip: image_to_string(strip, config=settings.tesseract_config, token=token),
+                strip_height=max(settings.tile_height, 4 * settings.tile_overlap),
+                overlap=settings.tile_overlap, workers=settings.tile_workers)
+        else:
+            txt = image_to_string(proc, config=settings.tesseract_config, token=token)
+    finally:
+        if token is not None:
+            token.close()
+    cpu1, switches1 = sample_cpu()
+    return {"text": txt, "info": info, "timings": {"preprocess": t1 - t0, "ocr": time.perf_counter() - t1},
+            "usage": (cpu1 - cpu0, switches1 - switches0)}
+
+
+def parse_document(text: str) -> Dict[str, Any]:
+    """DocumentExtractor over one document's OCR text (see pipeline.extract_documents)."""
+    from src.parsers.doc_extractor import DocumentExtractor
+    de = DocumentExtractor()
+    res = de.extract_from_text(text)
+    return {"entities": res.get("entities") or {}, "patient": res.get("patient"),
+            "warnings": list(res.get("warnings") or []), "timings": dict(de.timings)}
@@ -0,0 +1,35 @@
+"""
+Page preprocessing before tesseract: grayscale, then binarize.
+
+Kept free of app-level state so OCR pool workers (src/ocr/pool_worker.py)
+can import it without pulling in the API module.
+"""
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def page_to_gray(page) -> np.ndarray:
+    """2-D uint8 grayscale array for a PIL page or an (already gray) ndarray."""
+    if isinstance(page, np.ndarray):
+        return page if page.ndim == 2 else cv2.cvtColor(page, cv2.COLOR_RGB2GRAY)
+    arr = np.array(page.convert("RGB"))
+    return cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+
+
+def preprocess_image_for_ocr(pil_image: Image.Image, method: str = "adaptive") -> Image.Image:
+    gray = page_to_gray(pil_image)
+    if method == "none":
+        return Image.fromarray(gray)
+    if method == "otsu":
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        return Image.fromarray(thresh)
+    denoised = cv2.medianBlur(gray, 3)
+    thresh = cv2.adaptiveThreshold(
+        denoised, 255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        blockSize=15,
+        C=9
+    )
+    return Image.fromarray(thresh)
@@ -0,0 +1,185 @@
+"""
+PDF rasterizer backends.
+
+Both backends expose the same two calls used by the page pipeline:
+  - layout(pdf_path) -> (page_count, [(width_pt, height_pt) per page])
+  - render(pdf_path, page_no, dpi, timeout=None, token=None) -> list of pages
+and a `gray` flag telling whether pages come out as 2-D uint8 arrays
+(what preprocessing, the gate and the page cache work on) or RGB images.
+
+  - PopplerRasterizer: pdfinfo through pdf2image, then one pdftoppm
+    process per page writing a PPM to stdout, RGB pages. pdftoppm is
+    started here rather than by pdf2image so it can be registered on the
+    request's CancelToken: a disconnect or deadline kills it.
+  - PdfiumRasterizer: PDFium in-process (pypdfium2, optional), pages
+    rendered straight into grayscale buffers; no subprocess, no files.
+
+PDFium is not thread-safe, so all PDFium calls in the process share
+one lock: concurrent requests render one page at a time, where poppler
+renders in parallel child processes. A PDFium render cannot be interrupted,
+but waiting for the lock honours the request deadline. Until
+benchmarks/bench_rasterizer.py has been run under the real request mix,
+auto stays on poppler and PDFium is opt-in (RASTERIZER=pdfium).
+"""
+from typing import Any, List, Optional, Tuple
+from contextlib import contextmanager, nullcontext
+import io
+import os
+import re
+import subprocess
+import threading
+
+import numpy as np
+from PIL import Image
+
+from src.runtime.cancellation import CancelToken, OperationCancelled, kill_process
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional dependency
+    pdfium = None
+
+POPPLER = "poppler"
+PDFIUM = "pdfium"
+AUTO = "auto"
+DEFAULT_PAGE_SIZE = (612.0, 792.0)  # letter, when the PDF does not say
+_PDFINFO_PAGE_SIZE = re.compile(r"Page\s+(\d+) size$")
+
+Size = Tuple[float, float]
+
+_PDFIUM_LOCK = threading.Lock()
+
+
+class RasterizerUnavailable(RuntimeError):
+    pass
+
+
+def _pdfinfo_size(value) -> Optional[Size]:
+    """(width, height) from a pdfinfo "612 x 792 pts (letter)" value."""
+    try:
+        parts = str(value).split()
+        return float(parts[0]), float(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PopplerRasterizer:
+    name = POPPLER
+    gray = False
+
+    def __init__(self, poppler_path: Optional[str] = None):
+        self.poppler_path = poppler_path
+
+    def layout(self, pdf_path: str) -> Tuple[int, List[Size]]:
+        from pdf2image import pdfinfo_from_path
+        kwargs: dict = {"first_page": 1, "last_page": 1 << 30}  # pdfinfo clamps: one size line per page
+        if self.poppler_path:
+            kwargs["poppler_path"] = self.poppler_path
+        info = pdfinfo_from_path(pdf_path, **kwargs)
+        count = int(info.get("Pages") or 0)
+        found = {}
+        for key, value in info.items():
+            m = _PDFINFO_PAGE_SIZE.match(key)
+            no = int(m.group(1)) if m else (1 if key == "Page size" else None)
+            size = _pdfinfo_size(value) if no else None
+            if size is not None:
+                found[no] = size
+        sizes, last = [], found.get(1, DEFAULT_PAGE_SIZE)
+        for i in range(1, count + 1):
+            last = found.get(i, last)
+            sizes.append(last)
+        return count, sizes
+
+    def _command(self, name: str) -> str:
+        if os.name == "nt":
+            name += ".exe"
+        return os.path.join(self.poppler_path, name) if self.poppler_path else name
+
+    def render(self, pdf_path: str, page_no: int, dpi: int, timeout: Optional[float] = None,
+               token: Optional[CancelToken] = None) -> List[Any]:
+        cmd = [self._command("pdftoppm"), "-r", str(dpi), "-f", str(page_no), "-l", str(page_no), pdf_path]
+        env = None
+        if self.poppler_path:
+            # as pdf2image does, for poppler builds shipped with their libraries
+            env = dict(os.environ)
+            env["LD_LIBRARY_PATH"] = self.poppler_path + ":" + env.get("LD_LIBRARY_PATH", "")
+        # own process group, so a kill also reaches anything pdftoppm spawned
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                start_new_session=(os.name == "posix"), env=env)
+        with token.track(proc) if token is not None else nullcontext():
+            try:
+                out, err = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                kill_process(proc)
+                proc.communicate()
+                raise OperationCancelled("deadline exceeded")
+        if token is not None and token.cancelled:
+            raise OperationCancelled(token.reason or "cancelled")
+        if proc.returncode != 0:
+            raise RuntimeError(err.decode("utf-8", "replace").strip() or f"pdftoppm exited with {proc.returncode}")
+        if not out:
+            return []
+        page = Image.open(io.BytesIO(out))
+        page.load()
+        return [page]
+
+
+class PdfiumRasterizer:
+    name = PDFIUM
+    gray = True
+
+    def __init__(self):
+        if pdfium is None:
+            raise RasterizerUnavailable("RASTERIZER=pdfium needs pypdfium2 (pip install pypdfium2)")
+
+    @staticmethod
+    @contextmanager
+    def _locked(timeout: Optional[float]):
+        if not _PDFIUM_LOCK.acquire(timeout=-1 if timeout is None else max(0.0, timeout)):
+            raise OperationCancelled("deadline exceeded")
+        try:
+            yield
+        finally:
+            _PDFIUM_LOCK.release()
+
+    def layout(self, pdf_path: str) -> Tuple[int, List[Size]]:
+        with self._locked(None):
+            doc = pdfium.PdfDocument(pdf_path)
+            try:
+                count = len(doc)
+                # sizes from the page tree, without loading the pages
+                sizes = [tuple(doc.get_page_size(i)) for i in range(count)]
+            finally:
+                doc.close()
+        return count, sizes
+
+    def render(self, pdf_path: str, page_no: int, dpi: int, timeout: Optional[float] = None,
+               token: Optional[CancelToken] = None) -> List[np.ndarray]:
+        with self._locked(timeout):
+            doc = pdfium.PdfDocument(pdf_path)
+            try:
+                page = doc[page_no - 1]
+                bitmap = page.render(scale=dpi / 72.0, grayscale=True)
+                # copy out of the PDFium-owned buffer before it is freed
+                gray = np.array(bitmap.to_numpy(), dtype=np.uint8, copy=True)
+                bitmap.close()
+                page.close()
+            finally:
+                doc.close()
+        if gray.ndim == 3:
+            gray = gray[:, :, 0]
+        return [gray]
+
+
+def make_rasterizer(name: Optional[str] = AUTO, poppler_path: Optional[str] = None):
+    """
+    Backend for RASTERIZER=auto|pdfium|poppler. auto is poppler (see the
+    module docstring). An explicit pdfium without pypdfium2 raises
+    RasterizerUnavailable.
+    """
+    name = (name or AUTO).strip().lower()
+    if name in (POPPLER, AUTO):
+        return PopplerRasterizer(poppler_path)
+    if name == PDFIUM:
+        return PdfiumRasterizer()
+    raise ValueError(f"unknown rasterizer {name!r}; expected auto, pdfium or poppler")
@@ -0,0 +1,196 @@
+"""
+Minimal tesseract invocation with cancellation support.
+
+pytesseract starts tesseract through its own Popen and gives no handle
+on the child, so a request that is cancelled cannot stop a running OCR.
+This runner does the same thing (save image, run tesseract, read stdout)
+but registers the child on a CancelToken so it can be killed.
+
+Pages are handed over as uncompressed PNM files, 1-bit PBM for the
+binarized pages the pipeline produces (8-bit PGM otherwise), in a
+tmpfs directory when one is available (/dev/shm, or TESSERACT_TMPDIR):
+no PNG encode/decode and no disk round trip. PageBatch sends all pages
+of a document to a single tesseract process through a file list and
+splits stdout on the page separator.
+
+When the app installs an OcrConcurrency limiter (use_limiter), every
+run waits for a worker slot and gets the limiter's OMP_THREAD_LIMIT.
+"""
+from typing import List, Optional
+import os
+import shlex
+import subprocess
+import tempfile
+
+import pytesseract
+from PIL import Image
+
+from src.runtime.cancellation import CancelToken, OperationCancelled, kill_process
+
+
+class TesseractError(RuntimeError):
+    pass
+
+
+def tesseract_cmd() -> str:
+    return pytesseract.pytesseract.tesseract_cmd or "tesseract"
+
+
+PAGE_SEPARATOR = "\f"
+
+# Optional OcrConcurrency (src.runtime.ocr_concurrency): caps concurrent
+# tesseract processes and sets their OMP_THREAD_LIMIT. Installed by the app.
+_limiter = None
+
+
+def use_limiter(limiter) -> None:
+    """Route every tesseract run through `limiter` (None to run unthrottled)."""
+    global _limiter
+    _limiter = limiter
+
+
+def scratch_dir() -> Optional[str]:
+    """Directory for page files handed to tesseract: TESSERACT_TMPDIR, else /dev/shm, else the default tmp."""
+    for d in (os.environ.get("TESSERACT_TMPDIR"), "/dev/shm"):
+        if d and os.path.isdir(d) and os.access(d, os.W_OK):
+            return d
+    return None
+
+
+def write_page(image: Image.Image, path_stem: str) -> str:
+    """
+    Save a page uncompressed: 1-bit PBM if it only holds black and white
+    (what the threshold preprocessors produce), else 8-bit PGM. Returns the path.
+    """
+    if image.mode == "1":
+        path = path_stem + ".pbm"
+        image.save(path)
+        return path
+    if image.mode != "L":
+        image = image.convert("L")
+    hist = image.histogram()
+    if not any(hist[1:255]):
+        path = path_stem + ".pbm"
+        image.convert("1", dither=Image.Dither.NONE).save(path)
+    else:
+        path = path_stem + ".pgm"
+        image.save(path)
+    return path
+
+
+def _base_cmd(source: str, config: str, lang: Optional[str]) -> List[str]:
+    cmd = [tesseract_cmd(), source, "stdout"]
+    if lang:
+        cmd += ["-l", lang]
+    cmd += shlex.split(config or "")
+    return cmd
+
+
+def image_to_string(image: Image.Image,
+                    config: str = "--oem 3 --psm 6",
+                    lang: Optional[str] = None,
+                    token: Optional[CancelToken] = None) -> str:
+    """Drop-in for pytesseract.image_to_string that honours a CancelToken."""
+    if token is not None:
+        token.check()
+    with tempfile.TemporaryDirectory(prefix="ocr_", dir=scratch_dir()) as td:
+        path = write_page(image, os.path.join(td, "page"))
+        return _run(_base_cmd(path, config, lang), token)
+
+
+class PageBatch:
+    """
+    Collect the pages of a document for one tesseract run:
+
+        with PageBatch() as batch:
+            for page in pages:
+                batch.add(page)          # written to tmpfs right away
+            texts = batch.run(config, token=token)   # one string per page
+
+    Pages are written as they are added, so the caller does not have to
+    keep the bitmaps in memory until the run.
+    """
+
+    def __init__(self):
+        self._td = tempfile.TemporaryDirectory(prefix="ocr_batch_", dir=scratch_dir())
+        self.paths: List[str] = []
+
+    def __enter__(self) -> "PageBatch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._td.cleanup()
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def add(self, image: Image.Image) -> int:
+        """Write a page; return its index in the batch."""
+        self.paths.append(write_page(image, os.path.join(self._td.name, f"p{len(self.paths):05d}")))
+        return len(self.paths) - 1
+
+    def run(self, config: str = "--oem 3 --psm 6", lang: Optional[str] = None,
+            token: Optional[CancelToken] = None) -> List[str]:
+        if not self.paths:
+            return []
+        if token is not None:
+            token.check()
+        listing = os.path.join(self._td.name, "pages.txt")
+        with open(listing, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.paths) + "\n")
+        cmd = _base_cmd(listing, config, lang) + ["-c", f"page_separator={PAGE_SEPARATOR}"]
+        return split_pages(_run(cmd, token, pages=len(self.paths)), len(self.paths))
+
+
+def split_pages(out: str, count: int) -> List[str]:
+    """Split multi-page stdout on the page separator; TesseractError if the page count is off."""
+    parts = out.split(PAGE_SEPARATOR)
+    if len(parts) == count + 1 and not parts[-1].strip():
+        parts = parts[:-1]
+    if len(parts) != count:
+        raise TesseractError(f"expected {count} pages from tesseract, got {len(parts)}")
+    return parts
+
+
+def images_to_strings(images: List[Image.Image],
+                      config: str = "--oem 3 --psm 6",
+                      lang: Optional[str] = None,
+                      token: Optional[CancelToken] = None) -> List[str]:
+    """OCR several images with a single tesseract process; one string per image."""
+    with PageBatch() as batch:
+        for im in images:
+            batch.add(im)
+        return batch.run(config, lang, token)
+
+
+def _run(cmd, token: Optional[CancelToken], pages: int = 1) -> str:
+    limiter = _limiter
+    if limiter is None:
+        return _spawn(cmd, token, None)
+    with limiter.slot(pages, token):
+        return _spawn(cmd, token, limiter.child_env())
+
+
+def _spawn(cmd, token: Optional[CancelToken], env) -> str:
+    # own process group, so a kill also reaches anything tesseract spawned
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            start_new_session=(os.name == "posix"), env=env)
+    if token is None:
+        out, err = proc.communicate()
+    else:
+        with token.track(proc):
+            try:
+                out, err = proc.communicate(timeout=token.remaining())
+            except subprocess.TimeoutExpired:
+                kill_process(proc)
+                proc.communicate()
+                token.cancel("deadline exceeded")
+                raise OperationCancelled("deadline exceeded")
+        if token.cancelled:
+            raise OperationCancelled(token.reason or "cancelled")
+    if proc.returncode != 0:
+        raise TesseractError(err.decode("utf-8", "replace").strip() or f"tesseract exited with {proc.returncode}")
+    return out.decode("utf-8", "replace")
@@ -0,0 +1,142 @@
+"""
+Tiled OCR for oversized pages (A3 forms, high-resolution photo scans).
+
+One tesseract call on a 15-20 Mpx bitmap is slow and memory-hungry, and
+it runs on a single core. Above a pixel threshold the preprocessed page
+is cut into horizontal strips that overlap by `overlap` rows; the strips
+are OCR'd in parallel and their texts merged.
+
+Cuts are snapped to the emptiest pixel row near the nominal cut (row ink
+counts are one vectorized sum), so in practice both edges of a strip fall
+between text lines and the overlap holds whole lines, which appear in
+both neighbouring strips. merge_strip_texts() drops those repeats by
+matching the tail of one strip against the head of the next. Text alone
+cannot tell an OCR variant of a line from a similar neighbouring line
+("Line 10" / "Line 16"), so the number of lines to drop is taken from
+the geometry first: the count of ink runs inside the overlap rows.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+LINE_MATCH_RATIO = 0.85
+MAX_OVERLAP_LINES = 8
+
+
+def _row_ink(gray: np.ndarray) -> np.ndarray:
+    """Dark pixels per row (the image is preprocessed, so text is near 0 on ~255)."""
+    return np.count_nonzero(gray < 128, axis=1)
+
+
+def count_ink_runs(ink: np.ndarray) -> int:
+    """Number of separate runs of inked rows (~ text lines) in a row-ink profile."""
+    inked = ink > 0
+    if not inked.size:
+        return 0
+    return int(inked[0]) + int(np.count_nonzero(inked[1:] & ~inked[:-1]))
+
+
+def strip_bounds(gray: np.ndarray, strip_height: int, overlap: int,
+                 ink: Optional[np.ndarray] = None) -> List[Tuple[int, int]]:
+    """
+    [(top, bottom), ...] covering all rows; consecutive strips share about
+    `overlap` rows, and every interior edge sits on the least-inked row of
+    its search window.
+    """
+    h = gray.shape[0]
+    if h <= strip_height:
+        return [(0, h)]
+    if ink is None:
+        ink = _row_ink(gray)
+    bounds: List[Tuple[int, int]] = []
+    top = 0
+    while True:
+        nominal = top + strip_height
+        if nominal >= h:
+            bounds.append((top, h))
+            return bounds
+        # bottom edge: emptiest row in the last `overlap` rows of the strip
+        lo = max(top + overlap + 1, nominal - overlap)
+        bottom = lo + int(np.argmin(ink[lo:nominal + 1]))
+        bounds.append((top, bottom + 1))
+        # next top edge: emptiest row within `overlap` rows above that cut
+        lo = max(top + 1, bottom - overlap)
+        hi = max(lo + 1, bottom - overlap // 4)
+        top = lo + int(np.argmin(ink[lo:hi]))
+
+
+def _norm(line: str) -> str:
+    return " ".join(line.split()).lower()
+
+
+def _same_line(a: str, b: str) -> bool:
+    a, b = _norm(a), _norm(b)
+    if a == b:
+        return True
+    return bool(a and b) and SequenceMatcher(None, a, b).ratio() >= LINE_MATCH_RATIO
+
+
+def merge_strip_texts(texts: List[str], overlap_lines: Optional[List[int]] = None,
+                      max_overlap_lines: int = MAX_OVERLAP_LINES) -> str:
+    """
+    Join strip texts top to bottom, dropping the leading lines of each
+    strip that repeat the trailing lines of the previous one. For strip i
+    (i >= 1), overlap_lines[i - 1] is the expected number of repeated
+    lines and is tried first; otherwise the longest matching run of up
+    to max_overlap_lines non-empty lines is dropped.
+    """
+    merged: List[str] = []
+    for i, text in enumerate(texts):
+        lines = text.split("\n")
+        while lines and not lines[0].strip():
+            lines.pop(0)
+        tail = [ln for ln in merged if ln.strip()][-max_overlap_lines:]
+        head = [ln for ln in lines if ln.strip()][:max_overlap_lines]
+        candidates = list(range(min(len(tail), len(head)), 0, -1))
+        if overlap_lines is not None and i > 0 and overlap_lines[i - 1] in candidates:
+            candidates.remove(overlap_lines[i - 1])
+            candidates.insert(0, overlap_lines[i - 1])
+        drop = 0
+        for k in candidates:
+            if all(_same_line(tail[-k + j], head[j]) for j in range(k)):
+                drop = k
+                break
+        # remove `drop` non-empty lines (and the blank lines between them) from the head
+        while drop and lines:
+            if lines.pop(0).strip():
+                drop -= 1
+        while merged and not merged[-1].strip():
+            merged.pop()
+        merged.extend(lines)
+    return "\n".join(merged)
+
+
+def ocr_tiled(image: Image.Image, ocr: Callable[[Image.Image], str],
+              strip_height: int = 2000, overlap: int = 200,
+              workers: int = 4) -> Tuple[str, int]:
+    """OCR `image` strip by strip with `ocr` (in parallel); return (merged text, strip count)."""
+    gray = np.asarray(image.convert("L")) if image.mode != "L" else np.asarray(image)
+    ink = _row_ink(gray)
+    bounds = strip_bounds(gray, strip_height, overlap, ink=ink)
+    strips = [image.crop((0, top, image.width, bottom)) for top, bottom in bounds]
+    if len(strips) == 1:
+        return ocr(strips[0]), 1
+    shared = [count_ink_runs(ink[nxt[0]:cur[1]]) for cur, nxt in zip(bounds, bounds[1:])]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(strips)))) as pool:
+        texts = list(pool.map(ocr, strips))
+    return merge_strip_texts(texts, overlap_lines=shared), len(strips)
+
+
+def top_band(image: Image.Image, fraction: float = 0.25, window: int = 150) -> Image.Image:
+    """The top `fraction` of a page, cut on the emptiest row within `window` rows of the nominal cut."""
+    gray = np.asarray(image.convert("L")) if image.mode != "L" else np.asarray(image)
+    h = gray.shape[0]
+    nominal = int(h * fraction)
+    if nominal >= h:
+        return image
+    lo, hi = max(1, nominal - window), min(h, nominal + window + 1)
+    cut = lo + int(np.argmin(_row_ink(gray[lo:hi])))
+    return image.crop((0, 0, image.width, cut + 1))
@@ -4,6 +4,7 @@ DocumentExtractor: orchestrates the various parser classes
 normalized dict with: entities, patient, parsed_date, warnings.
 """
 from typing import Dict, Any, Optional, List
+import time
 import traceback
 
 # Try imports from likely locations
@@ -38,6 +39,8 @@ if PatientDetails is None:
 class DocumentExtractor:
     def __init__(self):
         self.warnings: List[str] = []
+        # seconds spent in the last extract_from_text call, per stage
+        self.timings: Dict[str, float] = {}
 
     def extract_from_text(self, text: str) -> Dict[str, Any]:
         """
@@ -46,15 +49,19 @@ class DocumentExtractor:
         Returns a dict with keys: entities, patient, warnings, parsed_date.
         """
         self.warnings = []
+        self.timings = {}
         entities: Dict[str, Any] = {}
         patient_obj: Optional[Dict[str, Any]] = None
         parsed_date: Optional[str] = None
 
         # Run prescription parser
+        t0 = time.perf_counter()
         try:
             if PrescriptionParser is not None:
                 # support class-based parser
                 entities = PrescriptionParser(text).parse() or {}
+                # e.g. the parse time budget running out
+                self.warnings.extend(entities.get("warnings") or [])
             else:
                 # try function fallback name
                 try:
@@ -68,12 +75,14 @@ class DocumentExtractor:
             print("=== PRESCRIPTION PARSER TRACE ===")
             print(traceback.format_exc())
             entities = {}
+        self.timings["parse"] = time.perf_counter() - t0
 
         # Normalize patient details if class exists
+        t0 = time.perf_counter()
         if PatientDetails is not None:
             try:
                 patient = PatientDetails.from_extractor(entities or {})
-                patient_obj = patient.to_model().dict()
+                patient_obj = patient.to_dict()
                 parsed_date = patient_obj.get("parsed_date") or patient_obj.get("date")
             except Exception:
                 patient_obj = None
@@ -82,6 +91,7 @@ class DocumentExtractor:
                 print(traceback.format_exc())
         else:
             parsed_date = entities.get("date")
+        self.timings["normalize"] = time.perf_counter() - t0
 
         return {
             "entities": entities or {},
@@ -0,0 +1,155 @@
+"""
+Split the OCR text of a batched PDF into separate prescriptions.
+
+Fax batches often hold several unrelated prescriptions in one PDF; parsed
+as one text they give a single patient with everyone's medicines. A page
+starts a new document when the first lines of its text carry a header:
+at least `min_cues` of a doctor line (Dr / Dr. / Doctor / Physician), a
+patient label (Name: / Patient:) and a date label (Date:). A header
+page continues the current document only if it repeats that document's
+header - same patient and doctor up to OCR slips (edit distance), same
+date - or says so ("Page 2 of 3", "continued"); the same patient with
+another doctor or date is another prescription. Blank pages and a leading
+page without a header (cover sheet) never split; they stay with the
+document they follow or precede.
+
+Works on the page-marked OCR text the pipeline produces
+("===== PAGE n =====" blocks), so it needs no image access and can run
+after OCR, on stored raw text as well.
+"""
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import re
+
+DOCTOR = "doctor"
+PATIENT = "patient"
+DATE = "date"
+
+DEFAULT_HEAD_LINES = 8
+DEFAULT_MIN_CUES = 2
+
+_PAGE_MARK = re.compile(r'^===== PAGE (\d+) =====\n', re.M)
+_CUES = (
+    (DOCTOR, re.compile(r'\b(?:Dr\.|Dr\s|Doctor\b|Physician\b)\s*[:\-]?\s*[A-Z]', re.I)),
+    (PATIENT, re.compile(r'\b(?:Patient(?:\s+Name)?|Name)\s*[:;\-]\s*\S', re.I)),
+    (DATE, re.compile(r'\bDate\s*[:\-]\s*\d', re.I)),
+)
+_PATIENT_VALUE = re.compile(r'\b(?:Patient(?:\s+Name)?|Name)\s*[:;\-]\s*([A-Za-z][A-Za-z .\'-]*)', re.I)
+_DOCTOR_VALUE = re.compile(r'\b(?:Dr\.|Dr\s|Doctor\b|Physician\b)\s*[:\-]?\s*([A-Za-z][A-Za-z .\'-]*)', re.I)
+_DATE_VALUE = re.compile(r'\bDate\s*[:\-]\s*(\d{1,4}[/.\-]\d{1,2}[/.\-]\d{1,4})', re.I)
+# a label following a value on the same line ends it ("Name: Jane Doe Date: ...")
+_NEXT_LABEL = re.compile(r'\b(?:Date|DOB|Dr|Doctor|Physician|Patient|Name|Address)\b', re.I)
+_PAGE_OF = re.compile(r'\bPage\s+(\d+)\s*(?:of|/)\s*\d+', re.I)
+_CONTINUED = re.compile(r'\b(?:continued|cont\'d|contd)\b', re.I)
+
+Page = Tuple[int, str]  # (page number, OCR text)
+
+
+def page_texts(ocr_text: str) -> List[Page]:
+    """'===== PAGE n =====' blocks -> [(n, text)]; unmarked text is page 1."""
+    marks = list(_PAGE_MARK.finditer(ocr_text or ""))
+    if not marks:
+        return [(1, ocr_text or "")]
+    out = []
+    for m, nxt in zip(marks, marks[1:] + [None]):
+        end = nxt.start() if nxt is not None else len(ocr_text)
+        out.append((int(m.group(1)), ocr_text[m.end():end].strip("\n")))
+    return out
+
+
+def join_pages(pages: Sequence[Page]) -> str:
+    """Inverse of page_texts, in the pipeline's format."""
+    return "\n".join(f"===== PAGE {no} =====\n{text}\n" for no, text in pages)
+
+
+def _head(text: str, head_lines: int) -> str:
+    lines = [ln for ln in text.splitlines() if ln.strip()]
+    return "\n".join(lines[:head_lines])
+
+
+def header_cues(text: str, head_lines: int = DEFAULT_HEAD_LINES) -> Set[str]:
+    head = _head(text, head_lines)
+    return {name for name, rx in _CUES if rx.search(head)}
+
+
+def _name_value(rx: "re.Pattern[str]", head: str) -> Optional[str]:
+    m = rx.search(head)
+    if not m:
+        return None
+    value = _NEXT_LABEL.split(m.group(1))[0]
+    key = re.sub(r'[^a-z]+', ' ', value.lower()).strip()
+    return key or None
+
+
+def patient_key(text: str, head_lines: int = DEFAULT_HEAD_LINES) -> Optional[str]:
+    """Normalized patient name from the page header, if it has one."""
+    return _name_value(_PATIENT_VALUE, _head(text, head_lines))
+
+
+def header_values(text: str, head_lines: int = DEFAULT_HEAD_LINES) -> Dict[str, Optional[str]]:
+    """Normalized doctor, patient and date of a page header (None where missing)."""
+    head = _head(text, head_lines)
+    m = _DATE_VALUE.search(head)
+    return {
+        DOCTOR: _name_value(_DOCTOR_VALUE, head),
+        PATIENT: _name_value(_PATIENT_VALUE, head),
+        DATE: "/".join(str(int(n)) for n in re.findall(r'\d+', m.group(1))) if m else None,
+    }
+
+
+def edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        cur = [i]
+        for j, cb in enumerate(b, start=1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def similar_names(a: Optional[str], b: Optional[str]) -> bool:
+    """Same name up to OCR slips: about one edit per 6 characters."""
+    if a is None or b is None:
+        return a is b
+    return edit_distance(a, b) <= max(1, max(len(a), len(b)) // 6)
+
+
+def same_header(a: Dict[str, Optional[str]], b: Dict[str, Optional[str]]) -> bool:
+    """Headers of the same prescription: patient and doctor match fuzzily, the date exactly."""
+    return (similar_names(a[PATIENT], b[PATIENT]) and similar_names(a[DOCTOR], b[DOCTOR])
+            and a[DATE] == b[DATE])
+
+
+def continues(text: str, head_lines: int = DEFAULT_HEAD_LINES) -> bool:
+    """Explicit continuation cue: "page n of m" with n > 1 anywhere, "continued" in the header."""
+    if any(int(n) > 1 for n in _PAGE_OF.findall(text)):
+        return True
+    return bool(_CONTINUED.search(_head(text, head_lines)))
+
+
+def split_documents(pages: Sequence[Page], head_lines: int = DEFAULT_HEAD_LINES,
+                    min_cues: int = DEFAULT_MIN_CUES) -> List[List[Page]]:
+    """Group consecutive pages into documents; always at least one group."""
+    docs: List[List[Page]] = []
+    current: List[Page] = []
+    header: Optional[Dict[str, Optional[str]]] = None  # of the current document, once seen
+    for no, text in pages:
+        starts = len(header_cues(text, head_lines)) >= min_cues
+        if starts:
+            values = header_values(text, head_lines)
+            if header is not None and not same_header(header, values) and not continues(text, head_lines):
+                docs.append(current)
+                current, header = [], None
+            if header is None:
+                header = values
+        current.append((no, text))
+    if current or not docs:
+        docs.append(current)
+    return docs
+
+
+def page_span(pages: Sequence[Page]) -> str:
+    """'3' or '3-5' for a document's pages."""
+    if not pages:
+        return ""
+    first, last = pages[0][0], pages[-1][0]
+    return str(first) if first == last else f"{first}-{last}"
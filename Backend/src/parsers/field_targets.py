@@ -0,0 +1,74 @@
+"""
+Field-targeted extraction: decide when the requested fields are settled.
+
+With /extract?fields=patient_name,date the pipeline OCRs the top band of
+each page, then the full page, parsing after each step, and stops once
+every requested field is settled. "Filled" is not enough on partial
+text: the parser's fallbacks fill patient_name from any capitalized line
+and date from any 4-digit year, and would give a different answer than
+a full-document parse. A field is settled only when the parser found it
+through its own label/pattern in the text seen so far.
+"""
+from typing import Dict, Any, Iterable, Set, Tuple
+import re
+
+FIELDS = ("doctor_name", "patient_name", "date", "patient_address", "medicines", "refills")
+
+# fields that can settle from a page's top band alone
+BAND_FIELDS = frozenset(("doctor_name", "patient_name", "date", "refills"))
+# fields that can only be known after the last page
+WHOLE_DOCUMENT_FIELDS = frozenset(("medicines",))
+
+_DOCTOR_CUE = re.compile(r'\b(?:Dr\.?|Doctor|Physician)[:\s\-]*[A-Z]', re.I)
+_PATIENT_CUE = re.compile(r'\b(?:Patient|Name)[:;\-\s]*[A-Z]', re.I)
+_REFILL_CUE = re.compile(r'\bRefill[s]?\s*[:\-]?\s*[0-9]', re.I)
+_YEAR_ONLY = re.compile(r'^(?:19|20)\d{2}$')
+_ADDRESS_CUE = re.compile(r'\bAddress[:\s\-]', re.I)
+
+
+def parse_fields(value: str) -> Tuple[str, ...]:
+    """'patient_name, date' -> ('patient_name', 'date'); ValueError on unknown names."""
+    out = []
+    for name in (value or "").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in FIELDS:
+            raise ValueError(f"unknown field {name!r}; expected some of {', '.join(FIELDS)}")
+        if name not in out:
+            out.append(name)
+    return tuple(out)
+
+
+def settled_fields(entities: Dict[str, Any], text: str, page_complete: bool) -> Set[str]:
+    """
+    Fields whose value would not change if more text were read.
+    page_complete is False while only the top band of the current page
+    has been OCR'd; multi-line fields (address) need the whole page, and
+    medicines can continue on any later page, so they never settle early.
+    """
+    out: Set[str] = set()
+    if entities.get("doctor_name") and _DOCTOR_CUE.search(text):
+        out.add("doctor_name")
+    if entities.get("patient_name") and _PATIENT_CUE.search(text):
+        out.add("patient_name")
+    date = (entities.get("date") or "").strip()
+    if date and not _YEAR_ONLY.match(date):
+        out.add("date")
+    if entities.get("refills") and _REFILL_CUE.search(text):
+        out.add("refills")
+    if page_complete and entities.get("patient_address") and _ADDRESS_CUE.search(text):
+        out.add("patient_address")
+    return out
+
+
+def all_settled(fields: Iterable[str], entities: Dict[str, Any], text: str, page_complete: bool) -> bool:
+    return set(fields) <= settled_fields(entities, text, page_complete)
+
+
+def can_stop_early(fields: Iterable[str]) -> bool:
+    return not (set(fields) & WHOLE_DOCUMENT_FIELDS)
+
+
+def band_can_settle(fields: Iterable[str]) -> bool:
+    return set(fields) <= BAND_FIELDS
@@ -1,7 +1,23 @@
 # extract_entities_regex.py
+import os
 import re
+import time
 from typing import List, Dict, Optional
 
+# Version of the text-level extraction (this parser + PatientDetails
+# normalization). Stored records carry the version that produced them;
+# bump it whenever the output changes so `reparse` upgrades old records.
+PARSER_VERSION = 1
+
+# Matching-time guards. Every pattern below is applied per line or per
+# label occurrence with bounded repetition, so capping line length bounds
+# the work per line and keeps parsing linear in the document size; the
+# budget stops a pathological document from pinning a CPU regardless.
+#  - MAX_LINE_CHARS: longer OCR lines are garbage in practice; the tail is dropped
+#  - PARSE_BUDGET_SECONDS: per-document wall-clock budget (env, default 2s)
+MAX_LINE_CHARS = 400
+PARSE_BUDGET_SECONDS = float(os.environ.get("PARSE_BUDGET_SECONDS", "2.0"))
+
 # --- helper functions (cleaning, regexes) ---
 def clean_ocr_text(raw: str) -> str:
     """
@@ -13,13 +29,15 @@ def clean_ocr_text(raw: str) -> str:
     text = text.replace('—', '-').replace('–', '-')
     text = re.sub(r'[^\x09\x0A\x0D\x20-\x7E]', ' ', text)
     text = re.sub(r'\n{2,}', '\n', text)
-    lines = [ln.strip() for ln in text.split('\n')]
+    lines = [ln.strip()[:MAX_LINE_CHARS] for ln in text.split('\n')]
     lines = [ln for ln in lines if ln]
     if not lines:
         return ""
     fixed_lines = []
     for ln in lines:
-        ln = re.sub(r'(\d+)\s+(me|m g|mgm)\b', r'\1 mg', ln, flags=re.I)
+        # (?<!\d): start only at the beginning of a digit run; without it
+        # every position of a long digit run re-scans the run (quadratic)
+        ln = _MG_TYPO_RE.sub(r'\1 mg', ln)
         ln = re.sub(r'(?<=\s)[A-Za-z](?=\s)', ' ', ln)
         ln = re.sub(r'\s+', ' ', ln).strip()
         fixed_lines.append(ln)
@@ -27,6 +45,7 @@ def clean_ocr_text(raw: str) -> str:
 
 
 # small compiled regexes used by class methods
+_MG_TYPO_RE = re.compile(r'(?<!\d)(\d+)\s+(me|m g|mgm)\b', re.I)
 _DOCTOR_RE = re.compile(r'\b(?:Dr\.?|Doctor|Physician)[:\s\-]*([A-Z][A-Za-z\.\s\-]{1,60})', re.I)
 _PATIENT_RE = re.compile(r'\b(?:Patient|Name)[:;\-\s]*([A-Z][A-Za-z\.\s\-]{1,60})', re.I)
 _DATE_RE = re.compile(
@@ -35,6 +54,17 @@ _DATE_RE = re.compile(
 )
 _REFILL_RE = re.compile(r'\bRefill[s]?\s*[:\-]?\s*([0-9]+)', re.I)
 
+# medicine "name strength" pairs; the separator run between name and
+# strength is possessive (*+ / ?+), so a failed strength never re-splits
+# the spaces/punctuation between the lazy name and the digits
+_PAIR_RE = re.compile(
+    r'([A-Za-z][A-Za-z0-9\-\(\)\/\.\s]{2,80}?)'
+    r'\s*+[,:-]?+\s*+'
+    r'(\d{1,3}(?:\.\d+)?\s*(?:mg|g|gram|grams|ml|mcg))',
+    re.I
+)
+_NAME_ONLY_RE = re.compile(r'\b([A-Za-z][A-Za-z\-\']{2,60})\b')
+
 UNIT_WORD_RE = re.compile(r'\b(?:mg|g|gram|grams|ml|mcg|tablet|tab|capsule|drop|patch)\b', re.I)
 DIRECTION_WORD_RE = re.compile(r'\b(?:take|every|daily|once|twice|before|after|with|apply|taper|inhale|use|for)\b', re.I)
 
@@ -50,22 +80,40 @@ _MED_LINE_RE = re.compile(
 # The class
 # ----------------------
 class PrescriptionParser:
-    def __init__(self, text: str):
+    def __init__(self, text: str, budget_seconds: Optional[float] = None):
         self.raw = text or ""
+        self._deadline = time.monotonic() + (PARSE_BUDGET_SECONDS if budget_seconds is None else budget_seconds)
         cleaned = clean_ocr_text(self.raw)
         self.text = cleaned
         self.lines = [ln.strip() for ln in cleaned.split('\n') if ln.strip()]
+        self.truncated = False
+
+    def _over_budget(self) -> bool:
+        if time.monotonic() > self._deadline:
+            self.truncated = True
+        return self.truncated
 
     def parse(self) -> Dict:
-        return {
-            "doctor_name": self.get_name(doctor=True),
-            "patient_name": self.get_name(doctor=False),
-            "date": self.get_date(),
-            "patient_address": self.get_address(),
-            "medicines": self.get_medicines(),
-            "refills": self.get_refills(),
-            "warnings": []
-        }
+        out = {"warnings": []}
+        # cheapest / most important fields first; once over budget the rest stay empty
+        steps = (
+            ("patient_name", lambda: self.get_name(doctor=False)),
+            ("date", self.get_date),
+            ("doctor_name", lambda: self.get_name(doctor=True)),
+            ("refills", self.get_refills),
+            ("patient_address", self.get_address),
+            ("medicines", self.get_medicines),
+        )
+        empty = {"medicines": [], "refills": 0}
+        for key, step in steps:
+            if self._over_budget():
+                out[key] = empty.get(key)
+                continue
+            out[key] = step()
+        if self.truncated:
+            out["warnings"].append("Parse time budget exceeded; some fields may be incomplete.")
+        return {k: out[k] for k in ("doctor_name", "patient_name", "date", "patient_address",
+                                    "medicines", "refills", "warnings")}
 
     def get_name(self, doctor: bool = False) -> Optional[str]:
         if doctor:
@@ -147,16 +195,12 @@ class PrescriptionParser:
         - Handles directions across lines.
         """
         meds = []
-
-        pair_re = re.compile(
-            r'([A-Za-z][A-Za-z0-9\-\(\)\/\.\s]{2,80}?)'
-            r'\s*[,:-]?\s*'
-            r'(\d{1,3}(?:\.\d+)?\s*(?:mg|g|gram|grams|ml|mcg))',
-            re.I
-        )
-        name_only_re = re.compile(r'\b([A-Za-z][A-Za-z\-\']{2,60})\b')
+        pair_re = _PAIR_RE
+        name_only_re = _NAME_ONLY_RE
 
         for idx, ln in enumerate(self.lines):
+            if self._over_budget():
+                break
             if re.search(r'\b(Address|Name|Date|Phone|Refill|Page|Directions)\b', ln, re.I):
                 if ln.strip().lower().startswith("directions"):
                     continue
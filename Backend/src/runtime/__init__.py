@@ -0,0 +1 @@
+# src.runtime package marker
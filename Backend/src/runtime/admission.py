@@ -0,0 +1,155 @@
+"""
+Admission control with priority lanes.
+
+Requests are admitted into a lane ("interactive" for clinicians using the
+frontend, "bulk" for batch ingest). Each lane has its own number of
+concurrent slots and a bounded wait queue. When a lane's queue is full the
+request is rejected immediately (429 + Retry-After) instead of piling up,
+and a request that waits longer than the queue timeout gets a 503.
+The interactive lane therefore keeps its slots no matter how much bulk
+traffic arrives.
+
+All bookkeeping happens on the event loop, so no locks are needed.
+"""
+from typing import Dict, Any, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import os
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, lane: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.lane = lane
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class Lane:
+    def __init__(self, name: str, concurrency: int, max_queue: int,
+                 queue_timeout: float, retry_after: int):
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: deque = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def saturated(self) -> bool:
+        return self.running >= self.concurrency and self.waiting >= self.max_queue
+
+    async def acquire(self) -> None:
+        if self.running < self.concurrency and not self._waiters:
+            self.running += 1
+            self.admitted += 1
+            return
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.name, 429, self.retry_after, f"{self.name} queue is full")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # the slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                fut.cancel()
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise AdmissionRejected(self.name, 503, self.retry_after, f"timed out waiting in {self.name} queue")
+        self.admitted += 1
+
+    def release(self) -> None:
+        # hand the slot straight to the oldest live waiter, else free it
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self.running = max(0, self.running - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "max_queue": self.max_queue,
+            "waiting": self.waiting,
+            "saturated": self.saturated,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionController:
+    def __init__(self, lanes: Dict[str, Lane], default_lane: str = INTERACTIVE):
+        self.lanes = lanes
+        self.default_lane = default_lane
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Env vars:
+          - ADMISSION_SLOTS              -> total concurrent extractions (default: CPU count)
+          - ADMISSION_INTERACTIVE_SHARE  -> fraction of slots for interactive (default 0.75)
+          - ADMISSION_INTERACTIVE_QUEUE  -> interactive max queue depth (default 8)
+          - ADMISSION_BULK_QUEUE         -> bulk max queue depth (default 4)
+          - ADMISSION_QUEUE_TIMEOUT      -> max seconds a request waits for a slot (default 30)
+          - ADMISSION_INTERACTIVE_RETRY_AFTER / ADMISSION_BULK_RETRY_AFTER -> seconds (2 / 30)
+
+        The lanes never hold more than ADMISSION_SLOTS between them: each gets
+        at least one slot, so with a single slot there is no separate bulk
+        lane and bulk requests queue in the interactive one.
+        """
+        slots = max(1, int(os.environ.get("ADMISSION_SLOTS", os.cpu_count() or 2)))
+        share = float(os.environ.get("ADMISSION_INTERACTIVE_SHARE", "0.75"))
+        interactive = min(slots - 1, max(1, int(math.ceil(slots * share)))) if slots > 1 else 1
+        timeout = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "30"))
+        lanes = {
+            INTERACTIVE: Lane(INTERACTIVE, interactive, int(os.environ.get("ADMISSION_INTERACTIVE_QUEUE", "8")),
+                              timeout, int(os.environ.get("ADMISSION_INTERACTIVE_RETRY_AFTER", "2"))),
+        }
+        if slots > 1:
+            lanes[BULK] = Lane(BULK, slots - interactive, int(os.environ.get("ADMISSION_BULK_QUEUE", "4")),
+                               timeout, int(os.environ.get("ADMISSION_BULK_RETRY_AFTER", "30")))
+        return cls(lanes)
+
+    def lane_for(self, name: Optional[str]) -> Lane:
+        return self.lanes.get((name or "").strip().lower()) or self.lanes[self.default_lane]
+
+    @asynccontextmanager
+    async def admit(self, lane_name: Optional[str] = None):
+        lane = self.lane_for(lane_name)
+        await lane.acquire()
+        try:
+            yield lane
+        finally:
+            lane.release()
+
+    @property
+    def ready(self) -> bool:
+        """Not ready once the interactive lane cannot take another request."""
+        return not self.lanes[self.default_lane].saturated
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: lane.snapshot() for name, lane in self.lanes.items()}
@@ -0,0 +1,103 @@
+"""
+Per-request deadline / cancellation token.
+
+A CancelToken is created per request and handed down the OCR pipeline.
+Long-running steps call `check()` between units of work (pages), and
+child processes (tesseract, pdftoppm) are registered on the token so a
+cancel - client disconnect or deadline - kills them immediately instead
+of letting them run to completion.
+"""
+from typing import Optional, List
+from contextlib import contextmanager
+import os
+import signal
+import threading
+import time
+
+
+class OperationCancelled(Exception):
+    """Raised by CancelToken.check() once the token is cancelled or expired."""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def kill_process(proc) -> None:
+    """
+    Kill a child and, if it leads its own process group (started with
+    start_new_session=True), everything it spawned as well.
+    """
+    try:
+        if hasattr(os, "killpg") and os.getpgid(proc.pid) == proc.pid:
+            os.killpg(proc.pid, signal.SIGKILL)
+            return
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+    try:
+        proc.kill()
+    except Exception:
+        pass
+
+
+class CancelToken:
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline: Optional[float] = (time.monotonic() + timeout) if timeout else None
+        self._reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._procs: List = []
+        self._timer: Optional[threading.Timer] = None
+        if timeout:
+            # fire at the deadline even if nobody polls, so running children get killed
+            self._timer = threading.Timer(timeout, self.cancel, args=("deadline exceeded",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self) -> bool:
+        if self._reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self._reason is not None
+
+    @property
+    def reason(self) -> Optional[str]:
+        return self._reason
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline (None = no deadline)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise OperationCancelled(self._reason or "cancelled")
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._reason is not None:
+                return
+            self._reason = reason
+            procs = list(self._procs)
+        for p in procs:
+            kill_process(p)
+
+    @contextmanager
+    def track(self, proc):
+        """Register a subprocess.Popen so cancel() kills it."""
+        with self._lock:
+            self._procs.append(proc)
+            already = self._reason is not None
+        if already:
+            kill_process(proc)
+        try:
+            yield proc
+        finally:
+            with self._lock:
+                if proc in self._procs:
+                    self._procs.remove(proc)
+
+    def close(self) -> None:
+        """Stop the deadline timer once the request is finished."""
+        if self._timer is not None:
+            self._timer.cancel()
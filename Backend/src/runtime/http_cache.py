@@ -0,0 +1,53 @@
+"""
+Conditional GET helpers for the polled read endpoints.
+
+Handlers derive an ETag from a cheap version of the data (a stat of the
+store file, a job's status and update time) before doing any real work.
+If the client's If-None-Match matches, they answer 304 straight away
+without reading or serialising anything.
+
+Everything these endpoints return is patient data, so Cache-Control is
+always "private". Browsers may cache and revalidate, but shared proxies
+must not store it.
+"""
+from typing import Dict, Optional
+
+from starlette.responses import Response
+
+# per endpoint kind
+NO_STORE = "no-store"
+REVALIDATE = "private, no-cache"
+FINAL = "private, max-age=3600, immutable"
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(p) for p in parts) + '"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison (RFC 9110 13.1.2) against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    want = _opaque(etag)
+    return any(_opaque(t) == want for t in if_none_match.split(","))
+
+
+def cache_headers(etag: Optional[str], cache_control: str) -> Dict[str, str]:
+    headers = {"Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+def not_modified(if_none_match: Optional[str], etag: str, cache_control: str) -> Optional[Response]:
+    """A 304 response if the client already has `etag`, else None."""
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers(etag, cache_control))
+    return None
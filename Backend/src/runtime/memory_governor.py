@@ -0,0 +1,155 @@
+"""
+Process-wide memory governor for page pixel buffers.
+
+Every page that is rasterized and preprocessed holds several full-frame
+buffers at once (RGB page, grayscale/denoised/thresholded arrays). The
+governor accounts for those bytes across all requests in the process and
+makes new page work wait while the budget is exhausted, so concurrent
+large uploads queue up instead of getting the pod OOM-killed.
+"""
+from typing import Dict, Any, Optional
+from contextlib import contextmanager
+import os
+import threading
+import time
+
+# bytes held per page pixel while a page is in flight:
+# RGB raster (3) + RGB array copy (3) + gray/denoised/threshold (3) + PIL copy (1)
+PAGE_BYTES_PER_PIXEL = 10
+# page that arrives already grayscale (e.g. memory-mapped from the page cache):
+# denoised + threshold arrays + PIL copy of the result (+1 slack)
+GRAY_PAGE_BYTES_PER_PIXEL = 4
+DEFAULT_BUDGET_MB = 1024
+DEFAULT_WAIT_SECONDS = 30.0
+DEFAULT_RETRY_AFTER = 5
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when a reservation could not be granted within the wait time."""
+
+    def __init__(self, requested: int, retry_after: int = DEFAULT_RETRY_AFTER):
+        super().__init__(f"memory budget exhausted (requested {requested} bytes)")
+        self.requested = requested
+        self.retry_after = retry_after
+
+
+def estimate_page_bytes(width_pt: float, height_pt: float, dpi: int,
+                        bytes_per_pixel: int = PAGE_BYTES_PER_PIXEL) -> int:
+    """Estimate in-flight bytes for one page given its size in PDF points."""
+    w = int(width_pt / 72.0 * dpi)
+    h = int(height_pt / 72.0 * dpi)
+    return w * h * bytes_per_pixel
+
+
+class MemoryGovernor:
+    """
+    Counting budget guarded by a condition variable.
+    A single reservation larger than the whole budget is clamped to the
+    budget, so an oversized page still runs (alone) instead of failing.
+    """
+
+    def __init__(self,
+                 budget_bytes: int,
+                 wait_seconds: float = DEFAULT_WAIT_SECONDS,
+                 retry_after: int = DEFAULT_RETRY_AFTER):
+        self.budget = int(budget_bytes)
+        self.wait_seconds = wait_seconds
+        self.retry_after = retry_after
+        self._used = 0
+        self._high_water = 0
+        self._waiting = 0
+        self._rejected = 0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls) -> "MemoryGovernor":
+        """
+        Env vars:
+          - PAGE_MEMORY_BUDGET_MB     -> budget for page buffers (default 1024)
+          - PAGE_MEMORY_WAIT_SECONDS  -> how long page work may wait (default 30)
+          - PAGE_MEMORY_RETRY_AFTER   -> Retry-After seconds sent with a 503
+        """
+        return cls(
+            budget_bytes=int(float(os.environ.get("PAGE_MEMORY_BUDGET_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024),
+            wait_seconds=float(os.environ.get("PAGE_MEMORY_WAIT_SECONDS", DEFAULT_WAIT_SECONDS)),
+            retry_after=int(os.environ.get("PAGE_MEMORY_RETRY_AFTER", DEFAULT_RETRY_AFTER)),
+        )
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    @property
+    def high_water(self) -> int:
+        return self._high_water
+
+    def acquire(self, nbytes: int, timeout: Optional[float] = None) -> int:
+        """
+        Reserve nbytes (clamped to the budget), waiting up to `timeout`
+        seconds (default: wait_seconds). Returns the reserved amount;
+        raises MemoryBudgetExceeded on timeout.
+        """
+        n = max(0, min(int(nbytes), self.budget))
+        timeout = self.wait_seconds if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._used + n > self.budget:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected += 1
+                        raise MemoryBudgetExceeded(n, self.retry_after)
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._used += n
+            self._high_water = max(self._high_water, self._used)
+        return n
+
+    def release(self, nbytes: int) -> None:
+        with self._cond:
+            self._used = max(0, self._used - int(nbytes))
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: int, timeout: Optional[float] = None):
+        n = self.acquire(nbytes, timeout)
+        try:
+            yield n
+        finally:
+            self.release(n)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "budget_bytes": self.budget,
+                "used_bytes": self._used,
+                "high_water_bytes": self._high_water,
+                "waiting": self._waiting,
+                "rejected": self._rejected,
+            }
+
+
+class Reservation:
+    """
+    The bytes one page holds in a governor, released exactly once by
+    whichever side is done with them first: the producer that reserved
+    them before rendering, or a consumer that has already copied the page
+    elsewhere (and reserved that copy itself).
+    """
+
+    def __init__(self):
+        self._governor: Optional[MemoryGovernor] = None
+        self.nbytes = 0
+
+    def acquire(self, governor: MemoryGovernor, nbytes: int, timeout: Optional[float] = None) -> int:
+        self.release()
+        self._governor = governor
+        self.nbytes = governor.acquire(nbytes, timeout=timeout)
+        return self.nbytes
+
+    def release(self) -> None:
+        if self._governor is not None and self.nbytes:
+            self._governor.release(self.nbytes)
+        self.nbytes = 0
@@ -0,0 +1,307 @@
+"""
+Adaptive limit on concurrent tesseract processes.
+
+Each tesseract child starts its own OpenMP team (one thread per core by
+default) and OpenCV keeps its own pool, so running pages, strips and
+requests in parallel quickly ends up with workers x cores threads
+fighting for the same CPUs. The controller caps how many tesseract
+processes run at once and splits the cores between them: every child
+gets OMP_THREAD_LIMIT = cores // workers, and cv2.setNumThreads follows
+the same share. "Cores" are the ones this process may actually use (CPU
+affinity and a cgroup cpu.max / CFS quota), not the host's count.
+
+The worker count starts small (cores // 4, so a lone page still gets
+several threads) and is tuned AIMD-style once per interval from what the
+finished pages show:
+  - additive increase (+1) while pages had to wait for a slot and the
+    CPUs still have headroom,
+  - multiplicative decrease when our own threads are being preempted
+    (involuntary context switches per CPU-second of this process and its
+    tesseract children, from getrusage) or, with pages still queueing,
+    the last increase made throughput drop,
+  - otherwise hold.
+Host-wide signals such as the load average are not used: in a container
+they mostly measure the neighbours. Work done in long-lived OCR pool
+workers never shows up in this process's getrusage, so the pool reports
+each page's CPU seconds and switches with release(usage=...).
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
+import math
+import os
+import threading
+import time
+
+from src.runtime.cancellation import CancelToken
+
+DEFAULT_INTERVAL = 10.0
+DEFAULT_TARGET_CPU = 0.85
+DEFAULT_OVERLOAD = 50.0
+DEFAULT_MIN_PAGES = 2
+DEFAULT_TOLERANCE = 0.1
+DEFAULT_DECREASE = 0.5
+SLOT_POLL_SECONDS = 0.25
+
+
+def sample_cpu() -> Tuple[float, float]:
+    """
+    (CPU seconds, involuntary context switches) of this process and its
+    reaped children - the tesseract processes it ran. A pool worker takes
+    the difference of two samples around a page to report its usage.
+    """
+    try:
+        import resource
+    except ImportError:
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system, 0.0
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime,
+            float(me.ru_nivcsw + kids.ru_nivcsw))
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """CPUs allowed by the cgroup's CFS quota (v2 cpu.max, else v1), None if unlimited."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    for d in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        try:
+            with open(os.path.join(d, "cpu.cfs_quota_us")) as f:
+                quota = int(f.read())
+            with open(os.path.join(d, "cpu.cfs_period_us")) as f:
+                period = int(f.read())
+        except (OSError, ValueError):
+            continue
+        return None if quota <= 0 or period <= 0 else quota / period
+    return None
+
+
+def available_cpus() -> int:
+    """CPUs this process can run on: its affinity mask, capped by a cgroup quota."""
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota:
+        n = min(n, math.ceil(quota))
+    return max(1, n)
+
+
+def set_opencv_threads(n: int) -> None:
+    try:
+        import cv2
+        cv2.setNumThreads(int(n))
+    except Exception:
+        pass
+
+
+class OcrConcurrency:
+    """
+    Counting slot limit guarded by a condition variable (like
+    MemoryGovernor) whose size moves with the AIMD rule above.
+    `clock` and `sampler` are injectable for tests.
+    """
+
+    def __init__(self,
+                 cpus: Optional[int] = None,
+                 min_workers: int = 1,
+                 max_workers: Optional[int] = None,
+                 start_workers: Optional[int] = None,
+                 interval: float = DEFAULT_INTERVAL,
+                 target_cpu: float = DEFAULT_TARGET_CPU,
+                 overload: float = DEFAULT_OVERLOAD,
+                 min_pages: int = DEFAULT_MIN_PAGES,
+                 tolerance: float = DEFAULT_TOLERANCE,
+                 decrease: float = DEFAULT_DECREASE,
+                 fixed_threads: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sampler: Callable[[], Tuple[float, float]] = sample_cpu,
+                 on_threads: Optional[Callable[[int], None]] = set_opencv_threads):
+        self.cpus = max(1, int(cpus or available_cpus()))
+        self.min_workers = max(1, int(min_workers))
+        self.max_workers = max(self.min_workers, int(max_workers or self.cpus))
+        start = start_workers if start_workers is not None else self.cpus // 4
+        self.interval = interval
+        self.target_cpu = target_cpu
+        self.overload = overload
+        self.min_pages = max(1, int(min_pages))
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.fixed_threads = fixed_threads
+        self._clock = clock
+        self._sampler = sampler
+        self._on_threads = on_threads
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._limit = 0
+        self._threads = 0
+        self._prev: Optional[Tuple[int, float]] = None  # (limit, pages/s) of the last evaluated window
+        self._last: Dict[str, Any] = {}
+        self.adjustments: deque = deque(maxlen=20)
+        with self._cond:
+            self._set_limit(min(self.max_workers, max(self.min_workers, int(start))), "start")
+            self._reset_window()
+
+    @classmethod
+    def from_env(cls) -> Optional["OcrConcurrency"]:
+        """
+        Build the controller from env vars, or return None when it is off.
+          - OCR_CONCURRENCY_ENABLED   -> "0" to disable (default on)
+          - OCR_WORKERS_MIN / OCR_WORKERS_MAX / OCR_WORKERS_START
+                                      -> worker bounds and start (1 / CPUs / CPUs // 4)
+          - OCR_AIMD_INTERVAL         -> seconds between adjustments (default 10)
+          - OCR_AIMD_TARGET_CPU       -> grow only below this CPU utilisation (0.85)
+          - OCR_AIMD_OVERLOAD         -> shrink above this many involuntary context
+                                         switches per CPU-second of OCR work (50)
+          - OCR_THREADS_PER_WORKER    -> pin OMP_THREAD_LIMIT instead of cores // workers
+        """
+        if os.environ.get("OCR_CONCURRENCY_ENABLED", "1").lower() not in ("1", "true", "yes"):
+            return None
+
+        def opt_int(name):
+            v = os.environ.get(name)
+            return int(v) if v else None
+
+        return cls(
+            min_workers=int(os.environ.get("OCR_WORKERS_MIN", "1")),
+            max_workers=opt_int("OCR_WORKERS_MAX"),
+            start_workers=opt_int("OCR_WORKERS_START"),
+            interval=float(os.environ.get("OCR_AIMD_INTERVAL", DEFAULT_INTERVAL)),
+            target_cpu=float(os.environ.get("OCR_AIMD_TARGET_CPU", DEFAULT_TARGET_CPU)),
+            overload=float(os.environ.get("OCR_AIMD_OVERLOAD", DEFAULT_OVERLOAD)),
+            fixed_threads=opt_int("OCR_THREADS_PER_WORKER"),
+        )
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def threads_per_worker(self) -> int:
+        return self._threads
+
+    def child_env(self) -> Dict[str, str]:
+        """Environment for a tesseract child: the current OpenMP thread share."""
+        env = dict(os.environ)
+        env["OMP_THREAD_LIMIT"] = str(self._threads)
+        return env
+
+    def _set_limit(self, limit: int, reason: str) -> None:
+        if limit != self._limit:
+            if self._limit:
+                self.adjustments.append({"from": self._limit, "to": limit, "reason": reason,
+                                         "ts": round(self._clock(), 3)})
+            self._limit = limit
+            self._cond.notify_all()
+        threads = self.fixed_threads or max(1, self.cpus // limit)
+        if threads != self._threads:
+            self._threads = threads
+            if self._on_threads is not None:
+                self._on_threads(threads)
+
+    def _reset_window(self) -> None:
+        self._window_start = self._clock()
+        self._window_cpu, self._window_switches = self._sampler()
+        self._window_reported = (0.0, 0.0)  # usage released by pool workers
+        self._window_pages = 0
+        self._window_waited = 0
+
+    @contextmanager
+    def slot(self, pages: int = 1, token: Optional[CancelToken] = None):
+        """
+        Hold one worker slot while a tesseract process runs `pages` pages.
+        Waits while the limit is reached; a cancelled token stops the wait.
+        """
+        self.acquire(token)
+        try:
+            yield self
+        finally:
+            self.release(pages)
+
+    def acquire(self, token: Optional[CancelToken] = None, blocking: bool = True) -> bool:
+        """
+        Take a slot for work that outlives one call (pages in the OCR
+        process pool); pair with release(). With blocking=False, returns
+        False instead of waiting when the limit is reached.
+        """
+        with self._cond:
+            if self._running >= self._limit:
+                self._window_waited += 1
+                if not blocking:
+                    return False
+                self._waiting += 1
+                try:
+                    while self._running >= self._limit:
+                        if token is not None:
+                            token.check()
+                        self._cond.wait(SLOT_POLL_SECONDS)
+                finally:
+                    self._waiting -= 1
+            self._running += 1
+            return True
+
+    def release(self, pages: int = 1, usage: Optional[Tuple[float, float]] = None) -> None:
+        """
+        Give the slot back. `usage` is the (CPU seconds, involuntary switches)
+        the work took outside this process (an OCR pool worker and its
+        tesseract), which the sampler cannot see.
+        """
+        with self._cond:
+            self._running -= 1
+            self._window_pages += pages
+            if usage is not None:
+                cpu, switches = self._window_reported
+                self._window_reported = (cpu + usage[0], switches + usage[1])
+            self._cond.notify()
+            if self._clock() - self._window_start >= self.interval:
+                self._adjust()
+
+    def _adjust(self) -> None:
+        """One AIMD step over the window that just closed (called with the lock held)."""
+        if self._window_pages < self.min_pages:
+            return  # too few pages to judge; keep accumulating
+        now = self._clock()
+        cpu, switches = self._sampler()
+        elapsed = max(now - self._window_start, 1e-6)
+        rate = self._window_pages / elapsed
+        used = cpu - self._window_cpu + self._window_reported[0]
+        util = used / (elapsed * self.cpus)
+        preempted = (switches - self._window_switches + self._window_reported[1]) / max(used, 0.1)
+        limit = self._limit
+        if preempted > self.overload:
+            new, reason = int(limit * self.decrease), "overloaded"
+        elif (self._window_waited and self._prev is not None and self._prev[0] < limit
+              and rate < self._prev[1] * (1 - self.tolerance)):
+            new, reason = int(limit * self.decrease), "throughput fell"
+        elif self._window_waited and util < self.target_cpu:
+            new, reason = limit + 1, "headroom"
+        else:
+            new, reason = limit, "hold"
+        new = min(self.max_workers, max(self.min_workers, new))
+        self._last = {"pages_per_second": round(rate, 3), "cpu_utilization": round(util, 3),
+                      "preemptions_per_cpu_second": round(preempted, 1), "waited": self._window_waited,
+                      "decision": reason}
+        self._prev = (limit, rate)
+        self._set_limit(new, reason)
+        self._reset_window()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "cpus": self.cpus,
+                "workers": self._limit,
+                "min_workers": self.min_workers,
+                "max_workers": self.max_workers,
+                "threads_per_worker": self._threads,
+                "running": self._running,
+                "waiting": self._waiting,
+                "last_window": dict(self._last),
+                "adjustments": list(self.adjustments),
+            }
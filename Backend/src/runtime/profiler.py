@@ -0,0 +1,96 @@
+"""
+Opt-in, single-request sampling profiler.
+
+Samples the stack of one thread (the one running the request's pipeline)
+every few milliseconds via sys._current_frames() and reports the hottest
+functions and stacks, together with the tracemalloc peak while the
+request ran. That peak is process-wide: it includes whatever other
+requests allocated at the same time, so it is an upper bound for this
+one. Only one request is profiled at a time: tracemalloc is global, and
+a profiled request runs noticeably slower, so this is an admin tool.
+"""
+from typing import Dict, Any, Tuple, Callable
+from collections import Counter
+import sys
+import threading
+import time
+import tracemalloc
+
+_PROFILE_LOCK = threading.Lock()
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 40):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._self = Counter()
+        self._total = Counter()
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            funcs, lines = [], []
+            while frame is not None and len(funcs) < self.max_depth:
+                code = frame.f_code
+                fn = f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]})"
+                funcs.append(fn)
+                lines.append(f"{fn[:-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples += 1
+            self._self[lines[0]] += 1
+            for fn in set(funcs):
+                self._total[fn] += 1
+            self._stacks[";".join(reversed(funcs[:12]))] += 1
+
+    def report(self, top: int = 15) -> Dict[str, Any]:
+        n = max(self.samples, 1)
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "top_self": [{"frame": k, "samples": v, "pct": round(100.0 * v / n, 1)}
+                         for k, v in self._self.most_common(top)],
+            "top_cumulative": [{"function": k, "samples": v, "pct": round(100.0 * v / n, 1)}
+                               for k, v in self._total.most_common(top)],
+            "top_stacks": [{"stack": k, "samples": v} for k, v in self._stacks.most_common(5)],
+        }
+
+
+def run_profiled(func: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Call func(*args, **kwargs) in the current thread under the sampling
+    profiler and tracemalloc; return (result, report).
+    """
+    with _PROFILE_LOCK:
+        prof = SamplingProfiler(threading.get_ident())
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        prof.start()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            prof.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+        report = prof.report()
+        report["wall_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        # all threads of the process, not just the profiled request
+        report["process_tracemalloc_peak_bytes"] = peak
+        return result, report
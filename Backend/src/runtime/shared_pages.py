@@ -0,0 +1,127 @@
+"""
+Zero-copy page hand-off to OCR worker processes.
+
+Submitting a 300-DPI page to a process pool pickles it through a pipe:
+~8 MB for a grayscale array, ~25 MB for an RGB image, copied on both
+ends, which eats the gain from running pages in parallel. Instead each
+page is copied once into a POSIX shared memory segment; the task only
+carries a PageRef (segment name, shape, dtype) and the worker maps the
+same memory as a read-only NumPy view.
+
+Lifetime is explicit and owned by the process that created the segment:
+  - SharedPageSet.put(page) creates a segment for one request,
+  - release(ref) unlinks it as soon as the page's result is back,
+  - leaving the set (done, error or cancellation) unlinks what is left.
+Workers only attach() and close; a worker keeping part of a page past
+attach() keeps the mapping, not a dangling pointer. Unlinking while a worker still maps a
+page is safe: the name goes away at once, the memory with the last
+mapping.
+"""
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import ctypes
+import threading
+
+import numpy as np
+
+_live_lock = threading.Lock()
+_live = 0
+
+
+class PageRef(NamedTuple):
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def live_segments() -> int:
+    """Segments created by this process and not yet unlinked."""
+    return _live
+
+
+def _count(delta: int) -> None:
+    global _live
+    with _live_lock:
+        _live += delta
+
+
+class SharedPageSet:
+    """The shared pages of one request; use as a context manager."""
+
+    def __init__(self):
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SharedPageSet":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def put(self, page: np.ndarray) -> PageRef:
+        """Copy a page into a new segment and return the reference to hand to a worker."""
+        page = np.asarray(page)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, page.nbytes))
+        _count(1)
+        with self._lock:
+            self._segments[shm.name] = shm
+        view = np.ndarray(page.shape, dtype=page.dtype, buffer=shm.buf)
+        view[...] = page
+        del view  # no exported buffer may outlive the copy, or close() fails
+        return PageRef(shm.name, tuple(page.shape), page.dtype.str)
+
+    def release(self, ref: PageRef) -> None:
+        with self._lock:
+            shm = self._segments.pop(ref.name, None)
+        if shm is None:
+            return
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        _count(-1)
+
+    def close(self) -> None:
+        for name in list(self._segments):
+            self.release(PageRef(name, (), ""))
+
+
+# worker side: segments whose pages were still referenced when attach() ended
+_deferred: List[shared_memory.SharedMemory] = []
+
+
+def _close_deferred() -> None:
+    for shm in list(_deferred):
+        try:
+            shm.close()
+        except BufferError:
+            continue
+        _deferred.remove(shm)
+
+
+@contextmanager
+def attach(ref: PageRef) -> Iterator[np.ndarray]:
+    """Worker side: a read-only view of a shared page."""
+    _close_deferred()
+    shm = shared_memory.SharedMemory(name=ref.name)
+    try:
+        # NumPy does not keep a buffer export on what it wraps, so close()
+        # would unmap under a view still in use. The ctypes array holds one:
+        # while anything derived from the page lives, close() fails instead.
+        raw = (ctypes.c_ubyte * shm.size).from_buffer(shm.buf)
+        count = int(np.prod(ref.shape, dtype=np.int64))
+        view = np.frombuffer(raw, dtype=np.dtype(ref.dtype), count=count).reshape(ref.shape)
+        view.flags.writeable = False
+        del raw
+        yield view
+    finally:
+        view = None
+        try:
+            shm.close()
+        except BufferError:
+            _deferred.append(shm)  # the caller kept part of the page; retried on the next attach
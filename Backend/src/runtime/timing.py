@@ -0,0 +1,95 @@
+"""
+Per-request timing trace.
+
+A RequestTimer collects wall-clock durations for the stages of one
+/extract call (upload, queue = waiting for admission, rasterize,
+preprocess, ocr, parse, normalize),
+per page where it applies, and renders them both as a `timings` block
+for the JSON body and as a `Server-Timing` header for browser devtools.
+"""
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import time
+
+# stage order used for the header and the summary block
+STAGES = ("upload", "queue", "rasterize", "preprocess", "ocr", "parse", "normalize")
+PAGE_STAGES = ("rasterize", "preprocess", "ocr")
+
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._totals: "OrderedDict[str, float]" = OrderedDict()
+        self._pages: Dict[int, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, page: Optional[int] = None) -> None:
+        with self._lock:
+            self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+            if page is not None:
+                p = self._pages.setdefault(page, {})
+                p[stage] = p.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage: str, page: Optional[int] = None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t0, page)
+
+    def stages(self) -> Dict[str, float]:
+        """Seconds per stage so far."""
+        with self._lock:
+            return dict(self._totals)
+
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {f"{s}_ms": round(self._totals.get(s, 0.0) * 1000, 2) for s in STAGES}
+            for s, v in self._totals.items():
+                if s not in STAGES:
+                    out[f"{s}_ms"] = round(v * 1000, 2)
+            out["total_ms"] = round(self.total_seconds() * 1000, 2)
+            pages: List[Dict[str, Any]] = []
+            for n in sorted(self._pages):
+                row: Dict[str, Any] = {"page": n}
+                row.update({f"{s}_ms": round(v * 1000, 2) for s, v in self._pages[n].items()})
+                pages.append(row)
+            out["pages"] = pages
+        return out
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: stage totals, then per-page entries."""
+        parts = []
+        with self._lock:
+            for s in list(STAGES) + [k for k in self._totals if k not in STAGES]:
+                if s in self._totals:
+                    parts.append(f"{s};dur={self._totals[s] * 1000:.1f}")
+            for n in sorted(self._pages):
+                for s in PAGE_STAGES:
+                    if s in self._pages[n]:
+                        parts.append(f"{s}-p{n};dur={self._pages[n][s] * 1000:.1f}")
+        parts.append(f"total;dur={self.total_seconds() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class RequestTimerMiddleware:
+    """
+    ASGI middleware that starts a RequestTimer as soon as a request
+    arrives (before the body is read), available as request.state.timer.
+    The time until the endpoint runs is then the upload time; endpoints
+    record it before they wait for admission.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["timer"] = RequestTimer()
+        await self.app(scope, receive, send)
@@ -0,0 +1 @@
+# src.store package marker
@@ -0,0 +1,272 @@
+"""
+Columnar (Arrow / Parquet) export of stored extractions.
+
+Two tables are produced:
+  - extractions: one row per stored record (scalar fields, warnings as list<string>)
+  - medicines:   one row per medicine, keyed by extraction_id + position
+so analytics never has to walk the nested JSON. Records are streamed from
+the JSONL store and converted in chunks of `chunk_size` rows; only one
+chunk is held in memory at a time. Exports are incremental: pass the
+previous run's watermark (latest change exported) as `since`. A record
+re-parsed in place (src/store/reparse.py) keeps its "_ts" but counts as
+changed at its "_reparsed_ts" (also a column), so its rows are exported
+again in a later part: when reading parts together, keep the rows of an
+extraction_id from the newest part (part names sort by watermark). A
+full export with replace=True rewrites the dataset without duplicates.
+
+pyarrow is optional; without it the export functions raise
+ColumnarUnavailable.
+"""
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - exercised only without pyarrow
+    pa = None
+    pa_ipc = None
+    pq = None
+
+from src.store.jsonl_store import JsonlStore, changed_ts, parse_ts, format_ts
+
+EXTRACTIONS = "extractions"
+MEDICINES = "medicines"
+TABLES = (EXTRACTIONS, MEDICINES)
+
+
+class ColumnarUnavailable(RuntimeError):
+    pass
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ColumnarUnavailable("pyarrow is not installed; columnar export is unavailable.")
+
+
+def schemas() -> Dict[str, "pa.Schema"]:
+    _require_pyarrow()
+    return {
+        EXTRACTIONS: pa.schema([
+            ("_id", pa.string()),
+            ("_ts", pa.timestamp("us", tz="UTC")),
+            ("_reparsed_ts", pa.timestamp("us", tz="UTC")),
+            ("doctor_name", pa.string()),
+            ("patient_name", pa.string()),
+            ("date", pa.string()),
+            ("patient_address", pa.string()),
+            ("refills", pa.int32()),
+            ("medicine_count", pa.int32()),
+            ("warnings", pa.list_(pa.string())),
+        ]),
+        MEDICINES: pa.schema([
+            ("extraction_id", pa.string()),
+            ("_ts", pa.timestamp("us", tz="UTC")),
+            ("position", pa.int32()),
+            ("name", pa.string()),
+            ("strength", pa.string()),
+            ("directions", pa.string()),
+        ]),
+    }
+
+
+def _as_int(v) -> Optional[int]:
+    try:
+        return int(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_str(v) -> Optional[str]:
+    return None if v is None else str(v)
+
+
+def _as_ts(v) -> Optional[datetime]:
+    try:
+        return parse_ts(v) if v else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def iter_batches(store: JsonlStore, since: Optional[datetime] = None,
+                 chunk_size: int = 10000) -> Iterator[Tuple["pa.RecordBatch", "pa.RecordBatch", Optional[datetime]]]:
+    """
+    Yield (extractions_batch, medicines_batch, max_ts) per chunk of
+    `chunk_size` stored records changed after `since`; max_ts is the
+    latest change seen so far (the next watermark).
+    """
+    _require_pyarrow()
+    sch = schemas()
+    ext_cols: Dict[str, List[Any]] = {n: [] for n in sch[EXTRACTIONS].names}
+    med_cols: Dict[str, List[Any]] = {n: [] for n in sch[MEDICINES].names}
+    max_ts: Optional[datetime] = None
+
+    def flush():
+        ext = pa.RecordBatch.from_pydict(ext_cols, schema=sch[EXTRACTIONS])
+        med = pa.RecordBatch.from_pydict(med_cols, schema=sch[MEDICINES])
+        for cols in (ext_cols, med_cols):
+            for v in cols.values():
+                v.clear()
+        return ext, med
+
+    for rec in store.iter_records(since=since):
+        ts, reparsed = (_as_ts(rec.get(k)) for k in ("_ts", "_reparsed_ts"))
+        changed = changed_ts(rec)
+        if changed is not None and (max_ts is None or changed > max_ts):
+            max_ts = changed
+        rid = _as_str(rec.get("_id"))
+        meds = rec.get("medicines") or []
+        ext_cols["_id"].append(rid)
+        ext_cols["_ts"].append(ts)
+        ext_cols["_reparsed_ts"].append(reparsed)
+        for k in ("doctor_name", "patient_name", "date", "patient_address"):
+            ext_cols[k].append(_as_str(rec.get(k)))
+        ext_cols["refills"].append(_as_int(rec.get("refills")))
+        ext_cols["medicine_count"].append(len(meds))
+        ext_cols["warnings"].append([str(w) for w in (rec.get("warnings") or [])])
+        for pos, m in enumerate(meds):
+            m = m if isinstance(m, dict) else {"name": m}
+            med_cols["extraction_id"].append(rid)
+            med_cols["_ts"].append(ts)
+            med_cols["position"].append(pos)
+            med_cols["name"].append(_as_str(m.get("name")))
+            med_cols["strength"].append(_as_str(m.get("strength")))
+            med_cols["directions"].append(_as_str(m.get("directions")))
+        if len(ext_cols["_id"]) >= chunk_size:
+            yield (*flush(), max_ts)
+    if ext_cols["_id"]:
+        yield (*flush(), max_ts)
+
+
+WATERMARK_FILE = "_watermark"
+
+
+def read_watermark(out_dir: str) -> Optional[datetime]:
+    """Watermark left by the last export_files() run into out_dir, if any."""
+    try:
+        with open(os.path.join(out_dir, WATERMARK_FILE), "r", encoding="utf-8") as f:
+            return parse_ts(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _old_parts(out_dir: str) -> List[str]:
+    found = []
+    for t in TABLES:
+        d = os.path.join(out_dir, t)
+        if os.path.isdir(d):
+            found += [os.path.join(d, n) for n in os.listdir(d) if n.startswith("part-")]
+    return found
+
+
+def export_files(store: JsonlStore, out_dir: str, since: Optional[datetime] = None,
+                 fmt: str = "parquet", chunk_size: int = 10000,
+                 replace: bool = False) -> Dict[str, Any]:
+    """
+    Export records changed after `since` as one part file per table:
+        <out_dir>/extractions/part-<watermark>.<ext>
+        <out_dir>/medicines/part-<watermark>.<ext>
+    (ext = parquet or arrow), so successive incremental runs add parts
+    that read together as one dataset. Parts are written chunk by chunk
+    to temp names and renamed at the end, then the new watermark is saved
+    to <out_dir>/_watermark; a crashed export leaves neither a truncated
+    part nor an advanced watermark. replace=True (meant for a full export,
+    since=None) removes the parts of earlier runs once the new ones are in
+    place. Returns row counts, files and the watermark (unchanged, with no
+    files, when nothing was new).
+    """
+    _require_pyarrow()
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError(f"unknown export format: {fmt}")
+    sch = schemas()
+    tmp = {t: os.path.join(out_dir, t, f".part-{os.getpid()}.{fmt}.tmp") for t in TABLES}
+    writers: Dict[str, Any] = {}
+    rows = {EXTRACTIONS: 0, MEDICINES: 0}
+    watermark = since
+    try:
+        for ext, med, max_ts in iter_batches(store, since=since, chunk_size=chunk_size):
+            if not writers:
+                for t in TABLES:
+                    os.makedirs(os.path.dirname(tmp[t]), exist_ok=True)
+                    if fmt == "parquet":
+                        writers[t] = pq.ParquetWriter(tmp[t], sch[t], compression="zstd")
+                    else:
+                        writers[t] = pa_ipc.new_file(tmp[t], sch[t])
+            for t, batch in ((EXTRACTIONS, ext), (MEDICINES, med)):
+                if batch.num_rows:
+                    writers[t].write_batch(batch)
+                rows[t] += batch.num_rows
+            if max_ts is not None and (watermark is None or max_ts > watermark):
+                watermark = max_ts
+    except BaseException:
+        for w in writers.values():
+            w.close()
+        for p in tmp.values():
+            if os.path.exists(p):
+                os.remove(p)
+        raise
+    files: Dict[str, str] = {}
+    old = _old_parts(out_dir) if replace else []
+    if writers:
+        stamp = (watermark.strftime("%Y%m%dT%H%M%S%fZ") if watermark else "unstamped")
+        for t, w in writers.items():
+            w.close()
+            files[t] = os.path.join(out_dir, t, f"part-{stamp}.{fmt}")
+            os.replace(tmp[t], files[t])
+        if watermark is not None:
+            with open(os.path.join(out_dir, WATERMARK_FILE), "w", encoding="utf-8") as f:
+                f.write(format_ts(watermark))
+    if replace:
+        for p in old:
+            if p not in files.values():
+                os.remove(p)
+        if not writers and os.path.exists(os.path.join(out_dir, WATERMARK_FILE)):
+            os.remove(os.path.join(out_dir, WATERMARK_FILE))
+    return {
+        "rows": rows,
+        "files": files,
+        "since": format_ts(since) if since else None,
+        "watermark": format_ts(watermark) if watermark else None,
+    }
+
+
+class _ChunkSink:
+    """Write-only file object that hands out whatever was written since the last take()."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.closed = False
+
+    def write(self, b) -> int:
+        self.parts.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts.clear()
+        return out
+
+
+def stream_ipc(store: JsonlStore, table: str, since: Optional[datetime] = None,
+               chunk_size: int = 10000) -> Iterator[bytes]:
+    """Arrow IPC stream of one table, produced chunk by chunk (for a streaming HTTP response)."""
+    _require_pyarrow()
+    if table not in TABLES:
+        raise ValueError(f"unknown table: {table}")
+    sink = _ChunkSink()
+    writer = pa_ipc.new_stream(pa.PythonFile(sink, mode="w"), schemas()[table])
+    try:
+        yield sink.take()
+        for ext, med, _ in iter_batches(store, since=since, chunk_size=chunk_size):
+            batch = ext if table == EXTRACTIONS else med
+            if batch.num_rows:
+                writer.write_batch(batch)
+                yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
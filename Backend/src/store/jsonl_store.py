@@ -0,0 +1,202 @@
+"""
+Append-only JSONL store behind /store and /list.
+
+One JSON object per line, stamped with "_id" (uuid4) and "_ts" (UTC ISO
+timestamp with a trailing "Z"); records re-parsed in place also carry
+"_reparsed_ts" (src/store/reparse.py). Readers stream the file line by line so
+memory stays bounded however large it grows; malformed lines (e.g. a
+torn final write) are skipped.
+
+rewrite() replaces the file in place (e.g. when records are re-parsed);
+appends from other threads or processes are serialised against it with
+a lock file next to the store.
+"""
+from typing import Callable, Dict, Any, Iterator, List, Optional
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+import os
+import shutil
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: in-process locking only
+    fcntl = None
+
+_TS_KEY = '"_ts": "'
+_REPARSED_TS_KEY = '"_reparsed_ts": "'
+
+
+def parse_ts(value: str) -> datetime:
+    """Parse a stored "_ts" (or a user-supplied watermark) into an aware UTC datetime."""
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    ts = datetime.fromisoformat(value)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+def format_ts(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+def _line_ts(line: str, key: str = _TS_KEY) -> Optional[datetime]:
+    """Read a timestamp straight from the raw line, so old records can be skipped without json.loads."""
+    at = line.rfind(key)
+    if at < 0:
+        return None
+    start = at + len(key)
+    end = line.find('"', start)
+    try:
+        return parse_ts(line[start:end])
+    except ValueError:
+        return None
+
+
+def _line_changed_ts(line: str) -> Optional[datetime]:
+    ts = _line_ts(line)
+    reparsed = _line_ts(line, _REPARSED_TS_KEY)
+    return reparsed if ts is None or (reparsed is not None and reparsed > ts) else ts
+
+
+def changed_ts(rec: Dict[str, Any]) -> Optional[datetime]:
+    """When a record last changed: its "_ts", or "_reparsed_ts" if it was re-parsed since."""
+    latest = None
+    for key in ("_ts", "_reparsed_ts"):
+        try:
+            ts = parse_ts(rec.get(key) or "")
+        except (AttributeError, ValueError):
+            continue
+        if latest is None or ts > latest:
+            latest = ts
+    return latest
+
+
+class StoreBusy(RuntimeError):
+    """Another rewrite of the same store is in progress."""
+
+
+class JsonlStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self, suffix: str, blocking: bool = True):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + suffix, "a") as lf:
+            flags = fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)
+            try:
+                fcntl.flock(lf, flags)
+            except BlockingIOError:
+                raise StoreBusy(f"{self.path} is being rewritten")
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock, self._file_lock(".lock"):
+            yield
+
+    def append(self, rec: Dict[str, Any]) -> Dict[str, Any]:
+        rec = dict(rec)
+        rec["_id"] = str(uuid.uuid4())
+        with self._write_lock():
+            # stamped under the lock, so _ts never goes backwards in file order
+            # and an incremental export cannot step past a line not written yet
+            rec["_ts"] = format_ts(datetime.now(timezone.utc))
+            line = json.dumps(rec, ensure_ascii=False) + "\n"
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return rec
+
+    def rewrite(self, transform: Callable[[Iterator[str]], Iterator[str]]) -> bool:
+        """
+        Replace the store with transform(lines), streamed through a temp file.
+        Appends are not blocked while transform runs: complete lines present
+        at the start are transformed, anything written after that is copied
+        over unchanged just before the swap. Raises StoreBusy if another
+        rewrite is running; returns False if there is no store file yet.
+        """
+        with self._file_lock(".rewrite.lock", blocking=False):
+            if not os.path.exists(self.path):
+                return False
+            tmp = self.path + ".rewrite"
+            done = 0
+            try:
+                with open(self.path, "rb") as src, open(tmp, "w", encoding="utf-8") as dst:
+                    end = os.fstat(src.fileno()).st_size
+
+                    def lines() -> Iterator[str]:
+                        nonlocal done
+                        for raw in src:
+                            # stop at the snapshot end or a line still being written
+                            if done + len(raw) > end or not raw.endswith(b"\n"):
+                                break
+                            done += len(raw)
+                            yield raw.decode("utf-8", "replace")
+
+                    for line in transform(lines()):
+                        dst.write(line)
+                with self._write_lock():
+                    with open(self.path, "rb") as src, open(tmp, "ab") as dst:
+                        src.seek(done)
+                        shutil.copyfileobj(src, dst)
+                    os.replace(tmp, self.path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            return True
+
+    def version(self) -> str:
+        """
+        Cheap write version of the store: one stat, no read. Changes on
+        every append (size, mtime) and on every rewrite (new inode).
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return "0"
+        return f"{st.st_ino:x}.{st.st_size:x}.{st.st_mtime_ns:x}"
+
+    def iter_records(self, since: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield stored records in file order; with since, only those that
+        changed after it (see changed_ts), so a record re-parsed in place
+        is yielded again.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if since is not None:
+                    ts = _line_changed_ts(line)
+                    if ts is not None and ts <= since:
+                        continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if since is not None and ts is None:
+                    ts = changed_ts(rec)
+                    if ts is None or ts <= since:
+                        continue
+                yield rec
+
+    def tail(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The last `limit` records, newest first."""
+        if limit <= 0:
+            return []
+        return list(deque(self.iter_records(), maxlen=limit))[::-1]
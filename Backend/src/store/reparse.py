@@ -0,0 +1,115 @@
+"""
+Re-run text-level extraction over stored records.
+
+Records saved with their raw OCR text ("raw_text") and the parser
+version that produced them ("_parser_version", missing = 0) can be
+upgraded after a parser / normalizer change without re-OCRing the PDFs:
+every record whose version is older than the current one is re-parsed
+from its raw text and rewritten in place (JsonlStore.rewrite).
+
+Lines are streamed to a process pool in order (imap), so memory stays
+bounded and output order matches the file; the JSON decode / encode
+runs in the workers too. `extract` must be a picklable top-level
+function mapping raw text to the record fields it owns (for the app:
+app.reparse_fields). Fields it does not return (warnings about the OCR,
+user-supplied ids, ...) are kept.
+"""
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from datetime import datetime, timezone
+import json
+import multiprocessing
+import os
+import time
+
+from src.store.jsonl_store import JsonlStore, format_ts
+
+KEPT = "kept"
+REPARSED = "reparsed"
+CHANGED = "changed"
+NO_TEXT = "no_text"
+FAILED = "failed"
+INVALID = "invalid"
+
+_extract: Optional[Callable[[str], Dict[str, Any]]] = None
+_version = 0
+_force = False
+
+
+def _init(extract: Callable[[str], Dict[str, Any]], version: int, force: bool) -> None:
+    global _extract, _version, _force
+    _extract, _version, _force = extract, version, force
+
+
+def is_stale(rec: Dict[str, Any], version: int) -> bool:
+    return int(rec.get("_parser_version") or 0) < version
+
+
+def reparse_line(line: str) -> Tuple[str, str]:
+    """(status, line to write) for one stored line; runs in a pool worker."""
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return INVALID, line
+    if not isinstance(rec, dict) or not (_force or is_stale(rec, _version)):
+        return KEPT, line
+    if not rec.get("raw_text"):
+        return NO_TEXT, line
+    try:
+        fields = _extract(rec["raw_text"])
+    except Exception:
+        return FAILED, line
+    status = CHANGED if any(rec.get(k) != v for k, v in fields.items()) else REPARSED
+    rec.update(fields)
+    rec["_parser_version"] = _version
+    rec["_reparsed_ts"] = format_ts(datetime.now(timezone.utc))
+    return status, json.dumps(rec, ensure_ascii=False) + "\n"
+
+
+def reparse_store(store: JsonlStore,
+                  extract: Callable[[str], Dict[str, Any]],
+                  version: int,
+                  workers: Optional[int] = None,
+                  force: bool = False,
+                  chunk_size: int = 32,
+                  mp_context: str = "spawn") -> Dict[str, Any]:
+    """
+    Re-parse stale records of `store` in place with `workers` processes
+    (default: CPU count; 0 runs in this process). force=True re-parses
+    every record that has raw text. Returns counts per status and throughput.
+    StoreBusy propagates if another rewrite is running.
+    """
+    counts = {s: 0 for s in (KEPT, REPARSED, CHANGED, NO_TEXT, FAILED, INVALID)}
+    workers = (os.cpu_count() or 1) if workers is None else max(0, int(workers))
+    pool = None
+    if workers:
+        # spawn: the API process is threaded, forking it is not safe
+        pool = multiprocessing.get_context(mp_context).Pool(
+            workers, initializer=_init, initargs=(extract, version, force))
+
+    def transform(lines: Iterator[str]) -> Iterator[str]:
+        results = pool.imap(reparse_line, lines, chunksize=chunk_size) if pool else map(reparse_line, lines)
+        for status, line in results:
+            counts[status] += 1
+            yield line
+
+    t0 = time.perf_counter()
+    try:
+        if pool is None:
+            _init(extract, version, force)
+        store.rewrite(transform)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    secs = time.perf_counter() - t0
+    total = sum(counts.values())
+    parsed = counts[REPARSED] + counts[CHANGED]
+    return {
+        "parser_version": version,
+        "workers": workers,
+        "records": total,
+        **counts,
+        "seconds": round(secs, 3),
+        "records_per_second": round(total / secs, 1) if secs > 0 else None,
+        "reparsed_per_second": round(parsed / secs, 1) if secs > 0 else None,
+    }
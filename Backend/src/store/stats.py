@@ -0,0 +1,208 @@
+"""
+Aggregate statistics over the JSONL store, maintained incrementally.
+
+StoreStats keeps running aggregates (records per day, medicine counts,
+refills, warning rates) together with the byte offset of the store file
+they cover. catch_up() reads only what was appended after that offset,
+so after the one-time backfill a read costs a stat() plus the new lines,
+however large the store is; appends from other processes are picked up
+the same way. A rewrite (new inode) or a shrunk file means the records
+may have changed, so the aggregates are rebuilt from scratch.
+
+The aggregates are saved next to the store (`state_path`, written
+atomically at most every `save_interval` seconds) and reloaded on the
+next start, so the full backfill happens once, not on every restart.
+"""
+from typing import Any, Dict, Optional, Tuple
+from collections import Counter
+import json
+import os
+import threading
+import time
+import traceback
+
+from src.store.jsonl_store import JsonlStore
+
+STATE_FORMAT = 1
+
+
+def medicine_key(name: Any) -> str:
+    return " ".join(str(name or "").split()).lower()
+
+
+class StoreStats:
+    def __init__(self, store: JsonlStore, state_path: Optional[str] = None, save_interval: float = 30.0):
+        self.store = store
+        self.state_path = state_path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._saved_at = 0.0
+        self._dirty = False
+        self._cached: Optional[Tuple[Any, Dict[str, Any]]] = None
+        self.generation = 0  # bumped whenever the aggregates change
+        self._reset()
+
+    def _reset(self) -> None:
+        self.inode = 0
+        self.offset = 0
+        self.records = 0
+        self.per_day: Counter = Counter()
+        self.medicines: Counter = Counter()
+        self.refills_total = 0
+        self.with_warnings = 0
+        self.warnings_total = 0
+        self.first_ts: Optional[str] = None
+        self.last_ts: Optional[str] = None
+
+    # ---- aggregation
+    def add(self, rec: Dict[str, Any]) -> None:
+        """Fold one stored record into the aggregates."""
+        ts = str(rec.get("_ts") or "")
+        if ts:
+            self.per_day[ts[:10]] += 1
+            self.first_ts = ts if self.first_ts is None else min(self.first_ts, ts)
+            self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+        self.records += 1
+        for med in rec.get("medicines") or []:
+            key = medicine_key(med.get("name") if isinstance(med, dict) else med)
+            if key:
+                self.medicines[key] += 1
+        try:
+            self.refills_total += max(0, int(rec.get("refills") or 0))
+        except (TypeError, ValueError):
+            pass
+        warnings = rec.get("warnings") or []
+        if warnings:
+            self.with_warnings += 1
+            self.warnings_total += len(warnings)
+
+    # ---- catching up with the file
+    def catch_up(self, backfill: bool = True) -> bool:
+        """
+        Fold in records appended since the last call; returns True if the
+        aggregates changed. backfill=False is for the write path: it never
+        waits for the lock and never does O(store) work - before the first
+        backfill, after a rewrite, or while another call holds the lock it
+        does nothing and leaves the work to the next backfill=True call.
+        """
+        if not self._lock.acquire(blocking=backfill):
+            return False
+        try:
+            if not self._loaded:
+                if not backfill:
+                    return False
+                self._load_state()
+                self._loaded = True
+            try:
+                st = os.stat(self.store.path)
+            except FileNotFoundError:
+                st = None
+            inode = st.st_ino if st is not None else 0
+            size = st.st_size if st is not None else 0
+            changed = False
+            if inode != self.inode or size < self.offset:
+                # rewritten or replaced: start over
+                if not backfill:
+                    return False
+                self._reset()
+                self.inode = inode
+                changed = True
+            if st is not None and size > self.offset:
+                changed = self._read_from(self.offset, size) or changed
+            if changed:
+                self.generation += 1
+                self._dirty = True
+                self._cached = None
+            if backfill and self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+                self._save_state()
+            return changed
+        finally:
+            self._lock.release()
+
+    def _read_from(self, offset: int, end: int) -> bool:
+        done = offset
+        added = False
+        with open(self.store.path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                # stop at a line still being written; it is read next time
+                if done + len(raw) > end or not raw.endswith(b"\n"):
+                    break
+                done += len(raw)
+                try:
+                    rec = json.loads(raw)
+                except ValueError:
+                    continue
+                if isinstance(rec, dict):
+                    self.add(rec)
+                    added = True
+        moved = done != self.offset
+        self.offset = done
+        return added or moved
+
+    # ---- persistence
+    def _state(self) -> Dict[str, Any]:
+        return {"format": STATE_FORMAT, "path": os.path.abspath(self.store.path), "inode": self.inode,
+                "offset": self.offset, "records": self.records, "per_day": dict(self.per_day),
+                "medicines": dict(self.medicines), "refills_total": self.refills_total,
+                "with_warnings": self.with_warnings, "warnings_total": self.warnings_total,
+                "first_ts": self.first_ts, "last_ts": self.last_ts}
+
+    def _save_state(self) -> None:
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        if not self.state_path:
+            return
+        tmp = self.state_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._state(), f)
+            os.replace(tmp, self.state_path)
+        except OSError:
+            print("=== STATS SAVE FAILED ===")
+            print(traceback.format_exc())
+
+    def _load_state(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                s = json.load(f)
+            if s.get("format") != STATE_FORMAT or s.get("path") != os.path.abspath(self.store.path):
+                return
+            self.inode, self.offset, self.records = int(s["inode"]), int(s["offset"]), int(s["records"])
+            self.per_day = Counter(s["per_day"])
+            self.medicines = Counter(s["medicines"])
+            self.refills_total = int(s["refills_total"])
+            self.with_warnings, self.warnings_total = int(s["with_warnings"]), int(s["warnings_total"])
+            self.first_ts, self.last_ts = s.get("first_ts"), s.get("last_ts")
+        except (OSError, ValueError, KeyError, TypeError):
+            self._reset()  # unreadable: rebuilt from the store
+
+    # ---- reading
+    def snapshot(self, days: int = 30, top: int = 10) -> Dict[str, Any]:
+        """
+        The aggregates as returned by /stats: the last `days` days that have
+        records and the `top` most stored medicines. Memoized until the
+        aggregates change, so repeated reads do no work.
+        """
+        with self._lock:
+            key = (self.generation, days, top)
+            if self._cached is not None and self._cached[0] == key:
+                return self._cached[1]
+            recent = sorted(self.per_day.items())[-days:] if days > 0 else []
+            n = self.records
+            out = {
+                "records": n,
+                "first_ts": self.first_ts,
+                "last_ts": self.last_ts,
+                "per_day": [{"day": d, "count": c} for d, c in recent],
+                "top_medicines": [{"name": m, "count": c} for m, c in self.medicines.most_common(top)],
+                "refills": {"total": self.refills_total,
+                            "average": round(self.refills_total / n, 3) if n else 0.0},
+                "warnings": {"records_with_warnings": self.with_warnings, "total": self.warnings_total,
+                             "rate": round(self.with_warnings / n, 4) if n else 0.0},
+            }
+            self._cached = (key, out)
+            return out
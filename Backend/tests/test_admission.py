@@ -0,0 +1,81 @@
+# tests/test_admission.py
+import asyncio
+
+import pytest
+
+from src.runtime.admission import AdmissionController, AdmissionRejected, Lane, INTERACTIVE, BULK
+
+
+def _controller(queue_timeout=1.0):
+    return AdmissionController({
+        INTERACTIVE: Lane(INTERACTIVE, 1, 1, queue_timeout, 2),
+        BULK: Lane(BULK, 1, 0, queue_timeout, 30),
+    })
+
+
+def test_full_queue_is_rejected_fast_and_lanes_are_independent():
+    async def scenario():
+        ac = _controller()
+        async with ac.admit("bulk"):
+            with pytest.raises(AdmissionRejected) as exc:
+                async with ac.admit("bulk"):
+                    pass
+            assert exc.value.status_code == 429
+            assert exc.value.retry_after == 30
+            # bulk saturation does not block interactive work
+            async with ac.admit(None) as lane:
+                assert lane.name == INTERACTIVE
+    asyncio.run(scenario())
+
+
+def test_waiter_gets_slot_in_order_and_readiness():
+    async def scenario():
+        ac = _controller()
+        order = []
+        release = asyncio.Event()
+
+        async def job(name):
+            async with ac.admit("interactive"):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.ensure_future(job("a"))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(job("b"))
+        await asyncio.sleep(0)
+        assert ac.lanes[INTERACTIVE].waiting == 1
+        assert not ac.ready
+        release.set()
+        await asyncio.gather(first, second)
+        assert order == ["a", "b"]
+        assert ac.ready
+        assert ac.snapshot()[INTERACTIVE]["running"] == 0
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_gives_503():
+    async def scenario():
+        ac = _controller(queue_timeout=0.05)
+        async with ac.admit("interactive"):
+            with pytest.raises(AdmissionRejected) as exc:
+                async with ac.admit("interactive"):
+                    pass
+            assert exc.value.status_code == 503
+        assert ac.lanes[INTERACTIVE].waiting == 0
+        assert ac.lanes[INTERACTIVE].running == 0
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("slots,share,expected", [
+    ("1", "0.75", {INTERACTIVE: 1}),
+    ("2", "0.75", {INTERACTIVE: 1, BULK: 1}),
+    ("4", "0.75", {INTERACTIVE: 3, BULK: 1}),
+    ("4", "1.0", {INTERACTIVE: 3, BULK: 1}),
+])
+def test_from_env_never_exceeds_the_slot_budget(monkeypatch, slots, share, expected):
+    monkeypatch.setenv("ADMISSION_SLOTS", slots)
+    monkeypatch.setenv("ADMISSION_INTERACTIVE_SHARE", share)
+    ac = AdmissionController.from_env()
+    assert {name: lane.concurrency for name, lane in ac.lanes.items()} == expected
+    # with one slot, bulk requests share the interactive lane
+    assert ac.lane_for(BULK) is ac.lanes[BULK if BULK in expected else INTERACTIVE]
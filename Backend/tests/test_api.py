@@ -0,0 +1,143 @@
+# tests/test_api.py
+import base64
+import os
+import tempfile
+import time
+
+_TMP = tempfile.mkdtemp(prefix="api-test-")
+os.environ["STORE_FILE"] = os.path.join(_TMP, "store.jsonl")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "uploads")
+os.environ["ADMIN_TOKEN"] = "secret"
+
+import app  # noqa: E402
+import pipeline  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from src.jobs.queue import JobQueue  # noqa: E402
+from src.runtime.admission import AdmissionController, Lane  # noqa: E402
+
+JANE = ("Dr. John Smith MD\nName: Jane Doe\nDate: 01/02/2023\n"
+        "Amoxicillin 500 mg\nTake one capsule three times daily\nRefills: 1")
+BOB = ("Dr. Alice Roe\nName: Bob Ray\nDate: 03/04/2023\n"
+       "Ibuprofen 200 mg\nTake two tablets as needed\nRefills: 3")
+
+
+def _medicine_names(fields):
+    return " ".join(m["name"] for m in fields["medicines"])
+
+
+def test_reparse_keeps_the_first_of_several_prescriptions():
+    fields = app.reparse_fields(pipeline.join_pages([(1, JANE), (2, BOB)]))
+    assert fields["patient_name"] == "Jane Doe"
+    assert "Amoxicillin" in _medicine_names(fields)
+    assert "Ibuprofen" not in _medicine_names(fields)
+    assert fields["refills"] == 1
+
+
+def test_store_reparse_runs_in_the_background():
+    client = TestClient(app.app)
+    assert client.post("/store/reparse").status_code == 403
+    stored = client.post("/store", json={"raw_text": JANE, "parser_version": 0}).json()["id"]
+    started = client.post("/store/reparse", headers={"X-Admin-Token": "secret"})
+    assert started.status_code == 202 and started.headers["location"] == "/store/reparse"
+    for _ in range(200):
+        state = client.get("/store/reparse", headers={"X-Admin-Token": "secret"}).json()
+        if state["status"] != "running":
+            break
+        time.sleep(0.05)
+    assert state["status"] == "done" and state["result"]["workers"] == 0
+    assert state["result"]["changed"] >= 1
+    rec = next(r for r in app.STORE.iter_records() if r["_id"] == stored)
+    assert rec["patient_name"] == "Jane Doe" and rec["_parser_version"] == app.PARSER_VERSION
+
+
+def _revalidates(client, url):
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers["etag"]
+    again = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+    return first
+
+
+def test_polled_reads_answer_304_until_the_store_changes():
+    client = TestClient(app.app)
+    client.post("/store", json={"patient_name": "Jane Doe", "medicines": [{"name": "Amoxicillin"}]})
+    for url in ("/list?limit=5", "/stats", "/export/extractions.arrow"):
+        first = _revalidates(client, url)
+        assert first.headers["cache-control"] == app.REVALIDATE
+    etag = client.get("/list?limit=5").headers["etag"]
+    client.post("/store", json={"patient_name": "Bob Ray"})
+    changed = client.get("/list?limit=5", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["results"][0]["patient_name"] == "Bob Ray"
+
+
+def test_resumable_upload_is_queued_and_job_revalidates(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "spool"))
+    monkeypatch.setattr(app, "JOB_QUEUE", queue)
+    client = TestClient(app.app)
+    pdf = b"%PDF-1.4\n" + os.urandom(3000)
+    name = base64.b64encode(b"scan.pdf").decode()
+    created = client.post("/uploads", headers={"Upload-Length": str(len(pdf)),
+                                                "Upload-Metadata": f"filename {name}"})
+    assert created.status_code == 201
+    url = created.headers["location"]
+    chunk = {"Content-Type": "application/offset+octet-stream"}
+    assert client.patch(url, content=pdf[:1000], headers={**chunk, "Upload-Offset": "0"}).headers["upload-offset"] == "1000"
+    assert client.patch(url, content=pdf[500:], headers={**chunk, "Upload-Offset": "500"}).status_code == 409
+    assert client.post(url + "/extract").status_code == 409  # incomplete
+    assert client.head(url).headers["upload-offset"] == "1000"
+    done = client.patch(url, content=pdf[1000:], headers={**chunk, "Upload-Offset": "1000"})
+    assert done.status_code == 204 and done.headers["upload-offset"] == str(len(pdf))
+
+    queued = client.post(url + "/extract?fields=patient_name")
+    assert queued.status_code == 202
+    job_url = queued.headers["location"]
+    assert client.head(url).status_code == 404  # the upload went to the job spool
+    job = queue.get(queued.json()["job_id"])
+    assert open(job["payload_path"], "rb").read() == pdf
+    assert job["options"]["filename"] == "scan.pdf" and job["options"]["fields"] == ["patient_name"]
+
+    running = _revalidates(client, job_url)
+    assert running.json()["status"] == "queued" and running.headers["cache-control"] == app.REVALIDATE
+    assert queue.claim("w1")["id"] == job["id"]
+    queue.complete(job["id"], "w1", {"text": "ok"})
+    finished = client.get(job_url, headers={"If-None-Match": running.headers["etag"]})
+    assert finished.status_code == 200 and finished.json()["result"] == {"text": "ok"}
+    assert finished.headers["cache-control"] == app.FINAL
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_ready_turns_503_when_the_interactive_lane_is_saturated(monkeypatch):
+    lane = Lane("interactive", 1, 0, 1.0, 2)
+    monkeypatch.setattr(app, "ADMISSION", AdmissionController({"interactive": lane}))
+    client = TestClient(app.app)
+    ok = client.get("/ready")
+    assert ok.status_code == 200 and ok.json()["ready"] and ok.headers["cache-control"] == app.NO_STORE
+    lane.running = 1
+    busy = client.get("/ready")
+    assert busy.status_code == 503 and not busy.json()["ready"]
+
+
+def test_each_page_is_reserved_by_its_own_size():
+    import numpy as np
+    from src.runtime.memory_governor import MemoryGovernor, Reservation
+
+    class Rasterizer:
+        name, gray = "fake", True
+
+        def render(self, path, page_no, dpi, timeout=None, token=None):
+            return [np.zeros((10, 10), dtype=np.uint8)]
+
+    gov = MemoryGovernor(budget_bytes=1 << 30)
+    held = Reservation()
+    layout = (2, [(612.0, 792.0), (1224.0, 792.0)])
+    pages = pipeline.iter_pdf_pages("x.pdf", dpi=72, governor=gov, layout=layout, rasterizer=Rasterizer(), held=held)
+    next(pages)
+    assert gov.used == 612 * 792 * 4
+    held.release()  # e.g. the pooled path, once the page is in shared memory
+    assert gov.used == 0
+    next(pages)
+    assert gov.used == 1224 * 792 * 4
+    pages.close()
+    assert gov.used == 0
@@ -0,0 +1,57 @@
+# tests/test_cancellation.py
+import os
+import stat
+import subprocess
+import threading
+import time
+
+import pytest
+import pytesseract
+from PIL import Image
+
+from src.runtime.cancellation import CancelToken, OperationCancelled
+from src.ocr import tesseract_runner
+
+
+def test_token_expires_at_deadline():
+    token = CancelToken(timeout=0.05)
+    assert not token.cancelled
+    time.sleep(0.1)
+    assert token.cancelled
+    assert token.reason == "deadline exceeded"
+    with pytest.raises(OperationCancelled):
+        token.check()
+
+
+def test_cancel_kills_tracked_process():
+    token = CancelToken()
+    proc = subprocess.Popen(["sleep", "30"])
+    with token.track(proc):
+        token.cancel("client disconnected")
+        assert proc.wait(timeout=5) != 0
+    assert token.reason == "client disconnected"
+
+
+@pytest.fixture
+def slow_tesseract(tmp_path, monkeypatch):
+    script = tmp_path / "tesseract"
+    script.write_text("#!/bin/sh\nsleep 30\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(pytesseract.pytesseract, "tesseract_cmd", str(script))
+    return script
+
+
+def test_runner_is_killed_on_deadline(slow_tesseract):
+    token = CancelToken(timeout=0.3)
+    start = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        tesseract_runner.image_to_string(Image.new("L", (20, 20), 255), token=token)
+    assert time.monotonic() - start < 5
+
+
+def test_runner_is_killed_on_cancel(slow_tesseract):
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel, args=("client disconnected",)).start()
+    with pytest.raises(OperationCancelled) as exc:
+        tesseract_runner.image_to_string(Image.new("L", (20, 20), 255), token=token)
+    assert exc.value.reason == "client disconnected"
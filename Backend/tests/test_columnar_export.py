@@ -0,0 +1,92 @@
+# tests/test_columnar_export.py
+import os
+
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from src.store.jsonl_store import JsonlStore, parse_ts
+from src.store.columnar import export_files, read_watermark, stream_ipc
+
+
+def _fill(store, n, start=0):
+    for i in range(start, start + n):
+        store.append({
+            "patient_name": f"Patient {i}",
+            "medicines": [{"name": f"Med{j}", "strength": "5 mg", "directions": "daily"} for j in range(i % 3)],
+            "refills": i,
+            "warnings": ["low confidence"] if i % 2 else [],
+        })
+
+
+def test_export_flattens_medicines_in_chunks(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    _fill(store, 25)
+    with open(store.path, "a", encoding="utf-8") as f:
+        f.write('{"torn line\n')
+    res = export_files(store, str(tmp_path / "out"), chunk_size=4)
+    assert res["rows"] == {"extractions": 25, "medicines": 24}
+
+    ext = pq.read_table(res["files"]["extractions"])
+    med = pq.read_table(res["files"]["medicines"])
+    assert ext.column("refills").to_pylist() == list(range(25))
+    assert ext.column("medicine_count").to_pylist()[:3] == [0, 1, 2]
+    first = ext.column("_id")[2].as_py()
+    rows = [r for r in med.to_pylist() if r["extraction_id"] == first]
+    assert [(r["position"], r["name"]) for r in rows] == [(0, "Med0"), (1, "Med1")]
+
+
+def test_incremental_export_from_watermark(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    out = str(tmp_path / "out")
+    _fill(store, 5)
+    first = export_files(store, out)
+    assert read_watermark(out) == parse_ts(first["watermark"])
+
+    nothing = export_files(store, out, since=read_watermark(out))
+    assert nothing["rows"]["extractions"] == 0 and nothing["files"] == {}
+
+    _fill(store, 3, start=5)
+    second = export_files(store, out, since=read_watermark(out), fmt="arrow")
+    table = ipc.open_file(second["files"]["extractions"]).read_all()
+    assert table.column("patient_name").to_pylist() == ["Patient 5", "Patient 6", "Patient 7"]
+
+
+def test_concurrent_appends_keep_ts_in_file_order(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: store.append({"patient_name": "x" * (i % 50_000), "i": i}), range(200)))
+    stamps = [parse_ts(r["_ts"]) for r in store.iter_records()]
+    assert len(stamps) == 200 and stamps == sorted(stamps)
+
+
+def test_stream_ipc(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    _fill(store, 10)
+    body = b"".join(stream_ipc(store, "medicines", chunk_size=3))
+    table = ipc.open_stream(body).read_all()
+    assert table.num_rows == sum(i % 3 for i in range(10))
+    assert set(table.column_names) >= {"extraction_id", "position", "name"}
+
+
+def test_reparsed_records_are_exported_again(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    out = str(tmp_path / "out")
+    _fill(store, 3)
+    first = export_files(store, out)
+    store.rewrite(lambda lines: (
+        line.replace('"Patient 1"', '"Patient One"').replace('}\n', ', "_reparsed_ts": "2999-01-01T00:00:00Z"}\n')
+        if '"Patient 1"' in line else line for line in lines))
+
+    second = export_files(store, out, since=read_watermark(out))
+    ext = pq.read_table(second["files"]["extractions"])
+    assert ext.column("patient_name").to_pylist() == ["Patient One"]
+    assert ext.column("_reparsed_ts")[0].as_py() == parse_ts("2999-01-01T00:00:00Z")
+    assert second["watermark"] == "2999-01-01T00:00:00Z"
+    assert export_files(store, out, since=read_watermark(out))["files"] == {}
+
+    full = export_files(store, out, replace=True)
+    parts = sorted(p.name for p in (tmp_path / "out" / "extractions").iterdir())
+    assert parts == [os.path.basename(full["files"]["extractions"])]
+    assert first["files"]["extractions"] != full["files"]["extractions"]
+    assert pq.read_table(full["files"]["extractions"]).num_rows == 3
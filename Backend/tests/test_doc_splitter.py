@@ -0,0 +1,78 @@
+# tests/test_doc_splitter.py
+import os
+
+from src.parsers.doc_splitter import (DOCTOR, DATE, PATIENT, header_cues, header_values, join_pages, page_span,
+                                      page_texts, patient_key, similar_names, split_documents)
+
+JANE = "Dr. John Smith MD\nName: Jane Doe\nDate: 01/02/2023\nAmoxicillin 500 mg"
+BOB = "Dr. Alice Roe\nPatient Name: Bob Ray\nDate: 3/4/2023\nIbuprofen 200 mg"
+CONTINUED = "Metformin 850 mg\nDate: 01/02/2023\nRefills: 2"
+COVER = "FAX COVER SHEET\nTo: Main St Pharmacy\nPages: 6"
+
+
+def _numbers(docs):
+    return [[no for no, _ in doc] for doc in docs]
+
+
+def test_page_texts_roundtrip():
+    pages = [(1, JANE), (2, ""), (3, BOB)]
+    assert page_texts(join_pages(pages)) == pages
+    assert page_texts("no markers") == [(1, "no markers")]
+
+
+def test_header_cues_only_look_at_the_first_lines():
+    assert header_cues(JANE) == {DOCTOR, PATIENT, DATE}
+    assert header_cues(CONTINUED) == {DATE}
+    late = "\n".join(["line"] * 10) + "\n" + JANE
+    assert header_cues(late) == set()
+    assert patient_key("Name: Jane  DOE\n") == patient_key(JANE) == "jane doe"
+
+
+def test_split_at_new_headers():
+    pages = [(1, COVER), (2, JANE), (3, CONTINUED), (4, ""), (5, BOB), (6, CONTINUED)]
+    docs = split_documents(pages)
+    # cover sheet goes with the first prescription, blank page with the one it follows
+    assert _numbers(docs) == [[1, 2, 3, 4], [5, 6]]
+    assert [page_span(d) for d in docs] == ["1-4", "5-6"]
+
+
+def test_header_values_and_fuzzy_names():
+    assert header_values("Dr. John Smith MD\nName: Jane Doe Date: 01/02/2023") == {
+        DOCTOR: "john smith md", PATIENT: "jane doe", DATE: "1/2/2023"}
+    assert similar_names("jon doe", "john doe")
+    assert not similar_names("jane doe", "john doe")
+    assert similar_names(None, None) and not similar_names("a", None)
+
+
+def test_repeated_header_of_the_same_prescription_does_not_split():
+    repeat = JANE.replace("Amoxicillin 500 mg", "Metformin 850 mg")
+    assert _numbers(split_documents([(1, JANE), (2, repeat), (3, BOB)])) == [[1, 2], [3]]
+    # one-letter OCR slip in the repeated header
+    slip = repeat.replace("John Smith", "Jon Smith")
+    assert _numbers(split_documents([(1, JANE), (2, slip)])) == [[1, 2]]
+    slip = repeat.replace("Jane Doe", "Jan Doe")
+    assert _numbers(split_documents([(1, JANE), (2, slip)])) == [[1, 2]]
+    # explicit continuation cue, even with a header that differs
+    cont = BOB + "\nPage 2 of 2"
+    assert _numbers(split_documents([(1, JANE), (2, cont)])) == [[1, 2]]
+
+
+def test_same_patient_with_another_doctor_or_date_is_another_prescription():
+    other_doctor = JANE.replace("John Smith", "Alice Roe")
+    other_date = JANE.replace("01/02/2023", "05/06/2023")
+    assert _numbers(split_documents([(1, JANE), (2, other_doctor), (3, other_date)])) == [[1], [2], [3]]
+
+
+def test_split_needs_enough_cues():
+    assert _numbers(split_documents([(1, JANE), (2, BOB)], min_cues=4)) == [[1, 2]]
+    assert split_documents([]) == [[]]
+
+
+def test_undotted_doctor_title_is_a_cue():
+    undotted = JANE.replace("Dr. John Smith MD", "Dr John Smith, M.D")
+    assert header_cues(undotted) == {DOCTOR, PATIENT, DATE}
+    assert header_values(undotted)[DOCTOR].startswith("john smith")
+    assert DOCTOR not in header_cues("Drive safely\nDrug: none")
+    # the real sample fax starts with an undotted doctor line
+    with open(os.path.join(os.path.dirname(__file__), "..", "pre_2.txt")) as f:
+        assert DOCTOR in header_cues(f.read())
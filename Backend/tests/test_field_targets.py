@@ -0,0 +1,42 @@
+# tests/test_field_targets.py
+import pytest
+
+from src.parsers.field_targets import parse_fields, settled_fields, can_stop_early, band_can_settle
+from src.parsers.prescription_parser import PrescriptionParser
+
+
+def _settled(text, page_complete=True):
+    return settled_fields(PrescriptionParser(text).parse(), text, page_complete)
+
+
+def test_parse_fields():
+    assert parse_fields(" patient_name, date,patient_name ") == ("patient_name", "date")
+    assert parse_fields("") == ()
+    with pytest.raises(ValueError):
+        parse_fields("patient_name,ssn")
+
+
+def test_labelled_fields_settle_on_header_band():
+    band = "City Clinic\nName: Marta Sharapova Date: 5/11/2022\n"
+    assert {"patient_name", "date"} <= _settled(band, page_complete=False)
+
+
+def test_fallback_values_do_not_settle():
+    # parser fills patient_name from any capitalized line and date from a bare year
+    text = "City General Hospital\nEst. 1998\n"
+    entities = PrescriptionParser(text).parse()
+    assert entities["patient_name"] and entities["date"] == "1998"
+    assert settled_fields(entities, text, page_complete=True) == set()
+
+
+def test_address_needs_full_page():
+    text = "Name: Marta Sharapova\nAddress: 9 tennis court, new Russia, DC\nPrednisone 20 mg\n"
+    assert "patient_address" not in _settled(text, page_complete=False)
+    assert "patient_address" in _settled(text, page_complete=True)
+
+
+def test_stop_rules():
+    assert band_can_settle(("patient_name", "date"))
+    assert not band_can_settle(("patient_name", "patient_address"))
+    assert can_stop_early(("patient_address",))
+    assert not can_stop_early(("date", "medicines"))
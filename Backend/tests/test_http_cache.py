@@ -0,0 +1,45 @@
+# tests/test_http_cache.py
+from src.jobs.queue import JobQueue
+from src.runtime.http_cache import etag_matches, make_etag, not_modified, REVALIDATE
+from src.store.jsonl_store import JsonlStore
+
+
+def test_etag_matching():
+    tag = make_etag("list", "abc", 50)
+    assert tag == '"list-abc-50"'
+    assert etag_matches(tag, tag)
+    assert etag_matches(f'"other", W/{tag}', tag)
+    assert etag_matches("*", tag)
+    assert not etag_matches(None, tag)
+    assert not etag_matches('"list-abc-20"', tag)
+
+
+def test_not_modified_response():
+    tag = make_etag("x")
+    resp = not_modified(tag, tag, REVALIDATE)
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == tag and resp.headers["cache-control"] == REVALIDATE
+    assert not_modified('"y"', tag, REVALIDATE) is None
+
+
+def test_store_version_tracks_writes(tmp_path):
+    store = JsonlStore(str(tmp_path / "s.jsonl"))
+    assert store.version() == "0"
+    store.append({"n": 1})
+    v1 = store.version()
+    assert store.version() == v1
+    store.append({"n": 2})
+    v2 = store.version()
+    assert v2 != v1
+    # a same-size rewrite still changes the version (new inode)
+    store.rewrite(lambda lines: lines)
+    assert store.version() != v2
+
+
+def test_job_version_without_result(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "spool"))
+    assert q.version("missing") is None
+    job_id, path = q.new_payload_path()
+    q.enqueue(job_id, path)
+    status, updated = q.version(job_id)
+    assert status == "queued" and updated == q.get(job_id)["updated"]
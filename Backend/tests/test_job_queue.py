@@ -0,0 +1,101 @@
+# tests/test_job_queue.py
+import os
+
+from src.jobs.queue import JobQueue, DONE, FAILED, RUNNING
+
+
+def _queue(tmp_path, **kw):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "spool"), **kw)
+
+
+def _enqueue(q, options=None):
+    job_id, path = q.new_payload_path()
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4")
+    return q.enqueue(job_id, path, options), path
+
+
+def test_enqueue_claim_complete(tmp_path):
+    q = _queue(tmp_path)
+    job_id, path = _enqueue(q, {"timeout": 30})
+    job = q.claim("w1")
+    assert job["id"] == job_id
+    assert job["status"] == RUNNING
+    assert job["options"] == {"timeout": 30}
+    assert q.claim("w2") is None                     # already leased
+    assert q.heartbeat(job_id, "w1")
+    assert not q.heartbeat(job_id, "w2")
+    assert q.complete(job_id, "w1", {"text": "ok"})
+    got = q.get(job_id)
+    assert got["status"] == DONE
+    assert got["result"] == {"text": "ok"}
+    assert not os.path.exists(path)                  # spooled PDF removed
+    assert q.counts() == {DONE: 1}
+
+
+def test_expired_lease_is_reclaimed_then_failed(tmp_path):
+    q = _queue(tmp_path, lease_seconds=-1, max_attempts=2)
+    job_id, path = _enqueue(q)
+    assert q.claim("w1")["attempts"] == 1
+    assert q.claim("w2")["attempts"] == 2            # lease already expired
+    assert q.claim("w3") is None
+    assert q.get(job_id)["status"] == FAILED
+    assert not os.path.exists(path)                  # spooled PDF removed
+
+
+def test_only_the_current_owner_finishes_a_job(tmp_path):
+    q = _queue(tmp_path, lease_seconds=-1)
+    job_id, path = _enqueue(q)
+    q.claim("w1")
+    q.claim("w2")                                    # w1's lease expired, w2 took over
+    assert not q.complete(job_id, "w1", {"text": "stale"})
+    assert not q.fail(job_id, "w1", "boom")
+    assert q.get(job_id)["status"] == RUNNING and os.path.exists(path)
+    assert q.complete(job_id, "w2", {"text": "ok"})
+    assert q.get(job_id)["result"] == {"text": "ok"} and not os.path.exists(path)
+    assert not q.fail(job_id, "w2", "late")           # finished jobs stay as they are
+
+
+def test_jobs_are_claimed_in_order_and_purged(tmp_path):
+    q = _queue(tmp_path)
+    first, _ = _enqueue(q)
+    second, _ = _enqueue(q)
+    assert q.claim("w")["id"] == first
+    q.fail(first, "w", "boom")
+    assert q.claim("w")["id"] == second
+    assert q.purge(older_than_seconds=-1) == 1
+    assert q.get(first) is None
+
+
+def test_released_job_waits_and_keeps_its_attempt(tmp_path):
+    q = _queue(tmp_path, max_attempts=1, retry_delay=60)
+    job_id, _ = _enqueue(q)
+    assert q.claim("w1")["attempts"] == 1
+    assert not q.release(job_id, "w2")               # not w2's job
+    assert q.release(job_id, "w1")
+    assert q.claim("w1") is None                     # not before the delay
+    assert q.get(job_id)["attempts"] == 0
+
+    with q._conn() as c:                             # the delay has passed
+        c.execute("UPDATE jobs SET lease_until = 0 WHERE id = ?", (job_id,))
+    job = q.claim("w1")
+    assert job["id"] == job_id and job["attempts"] == 1  # still within max_attempts
+
+
+def test_default_purge_uses_the_retention(tmp_path):
+    q = _queue(tmp_path, retention_seconds=0)
+    job_id, _ = _enqueue(q)
+    q.claim("w")
+    q.fail(job_id, "w", "boom")
+    assert q.purge() == 0                            # 0 keeps finished jobs
+    q.retention_seconds = 1e-9
+    assert q.purge() == 1
+
+
+def test_worker_does_not_start_the_api():
+    import subprocess
+    import sys
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", "import sys, worker; print('app' in sys.modules)"],
+                         cwd=backend, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,64 @@
+# tests/test_memory_governor.py
+import threading
+import time
+
+import pytest
+
+from src.runtime.memory_governor import MemoryGovernor, MemoryBudgetExceeded, Reservation, estimate_page_bytes
+
+
+def test_reserve_tracks_usage_and_high_water():
+    gov = MemoryGovernor(budget_bytes=100)
+    with gov.reserve(60):
+        assert gov.used == 60
+        with gov.reserve(40):
+            assert gov.used == 100
+    assert gov.used == 0
+    snap = gov.snapshot()
+    assert snap["high_water_bytes"] == 100
+    assert snap["budget_bytes"] == 100
+
+
+def test_exhausted_budget_times_out():
+    gov = MemoryGovernor(budget_bytes=100, retry_after=7)
+    gov.acquire(80)
+    with pytest.raises(MemoryBudgetExceeded) as exc:
+        gov.acquire(30, timeout=0.05)
+    assert exc.value.retry_after == 7
+    assert gov.snapshot()["rejected"] == 1
+
+
+def test_waiter_proceeds_after_release():
+    gov = MemoryGovernor(budget_bytes=100)
+    gov.acquire(100)
+    got = []
+    t = threading.Thread(target=lambda: got.append(gov.acquire(50, timeout=2)))
+    t.start()
+    time.sleep(0.05)
+    assert not got
+    gov.release(100)
+    t.join(2)
+    assert got == [50]
+
+
+def test_oversized_request_is_clamped_to_budget():
+    gov = MemoryGovernor(budget_bytes=100)
+    assert gov.acquire(10_000, timeout=0) == 100
+
+
+def test_page_estimate_for_letter_at_300_dpi():
+    est = estimate_page_bytes(612, 792, 300)
+    assert 2550 * 3300 * 3 < est < 2550 * 3300 * 16
+
+
+def test_reservation_is_released_once_by_either_side():
+    gov = MemoryGovernor(budget_bytes=100)
+    held = Reservation()
+    held.release()  # nothing held yet
+    assert held.acquire(gov, 40) == 40 and gov.used == 40
+    held.release()
+    held.release()
+    assert gov.used == 0
+    held.acquire(gov, 30)
+    held.acquire(gov, 20)  # the previous page's bytes are given back first
+    assert gov.used == 20
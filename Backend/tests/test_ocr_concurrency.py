@@ -0,0 +1,167 @@
+# tests/test_ocr_concurrency.py
+import threading
+import time
+
+import pytest
+import pytesseract
+from PIL import Image
+
+from src.ocr import tesseract_runner
+from src.runtime.cancellation import CancelToken, OperationCancelled
+from src.runtime.ocr_concurrency import OcrConcurrency
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Cpu:
+    def __init__(self):
+        self.seconds = 0.0
+        self.switches = 0.0
+
+    def __call__(self):
+        return self.seconds, self.switches
+
+
+def controller(**kw):
+    clock, cpu = Clock(), Cpu()
+    threads = []
+    ctl = OcrConcurrency(cpus=8, interval=10, clock=clock, sampler=cpu, on_threads=threads.append, **kw)
+    return ctl, clock, cpu, threads
+
+
+def run_window(ctl, clock, cpu, pages, cpu_seconds, waited=True, switches=0):
+    """Simulate one interval: `pages` finished pages, `cpu_seconds` used, optionally with queueing."""
+    for i in range(pages):
+        if waited and i == 0:
+            ctl._window_waited += 1
+        with ctl.slot():
+            pass
+        if i == pages - 2:
+            clock.now += 10
+            cpu.seconds += cpu_seconds
+            cpu.switches += switches
+
+
+def test_threads_split_cores_between_workers():
+    ctl, _, _, threads = controller(start_workers=2)
+    assert ctl.limit == 2 and ctl.threads_per_worker == 4
+    assert threads == [4]
+    assert ctl.child_env()["OMP_THREAD_LIMIT"] == "4"
+    fixed, _, _, _ = controller(start_workers=2, fixed_threads=1)
+    assert fixed.threads_per_worker == 1
+
+
+def test_starts_small_so_a_lone_page_gets_several_threads(monkeypatch):
+    from src.runtime import ocr_concurrency
+    ctl, _, _, _ = controller()
+    assert ctl.limit == 2 and ctl.threads_per_worker == 4
+    monkeypatch.setattr(ocr_concurrency.os, "sched_getaffinity", lambda pid: {0, 1, 2, 3}, raising=False)
+    monkeypatch.setattr(ocr_concurrency, "_cgroup_cpu_quota", lambda: 1.5)
+    assert ocr_concurrency.available_cpus() == 2
+    monkeypatch.setattr(ocr_concurrency, "_cgroup_cpu_quota", lambda: None)
+    assert ocr_concurrency.available_cpus() == 4
+
+
+def test_additive_increase_with_queueing_and_headroom():
+    ctl, clock, cpu, threads = controller(start_workers=2)
+    run_window(ctl, clock, cpu, pages=10, cpu_seconds=20)  # 25% of 8 cores
+    assert ctl.limit == 3
+    assert ctl.threads_per_worker == 2 and threads[-1] == 2
+    assert ctl.adjustments[-1]["reason"] == "headroom"
+
+
+def test_hold_without_queueing_or_when_cpu_busy():
+    ctl, clock, cpu, _ = controller(start_workers=2)
+    run_window(ctl, clock, cpu, pages=10, cpu_seconds=20, waited=False)
+    assert ctl.limit == 2
+    run_window(ctl, clock, cpu, pages=10, cpu_seconds=78)
+    assert ctl.limit == 2
+    assert ctl.snapshot()["last_window"]["decision"] == "hold"
+
+
+def test_multiplicative_decrease_on_overload():
+    ctl, clock, cpu, _ = controller(start_workers=8)
+    run_window(ctl, clock, cpu, pages=10, cpu_seconds=80, switches=80 * 20)
+    assert ctl.limit == 8  # a few preemptions per CPU-second are normal
+    run_window(ctl, clock, cpu, pages=10, cpu_seconds=80, switches=80 * 200)
+    assert ctl.limit == 4
+    assert ctl.adjustments[-1]["reason"] == "overloaded"
+
+
+def test_pool_workers_report_the_usage_the_sampler_cannot_see():
+    ctl, clock, cpu, _ = controller(start_workers=8)
+    ctl._window_waited += 1
+    for _ in range(10):
+        ctl.acquire()
+        clock.now += 1
+        # the parent itself stays idle; each page burnt 8 CPU-s in a pool worker
+        ctl.release(usage=(8.0, 8.0 * 200))
+    assert ctl.limit == 4
+    last = ctl.snapshot()["last_window"]
+    assert last["decision"] == "overloaded" and last["cpu_utilization"] == 1.0
+
+
+def test_decrease_when_increase_lowers_throughput():
+    ctl, clock, cpu, _ = controller(start_workers=4)
+    run_window(ctl, clock, cpu, pages=20, cpu_seconds=20)
+    assert ctl.limit == 5
+    run_window(ctl, clock, cpu, pages=10, cpu_seconds=20)
+    assert ctl.limit == 2
+    assert ctl.adjustments[-1]["reason"] == "throughput fell"
+
+
+def test_too_few_pages_keeps_window_open():
+    ctl, clock, cpu, _ = controller(start_workers=2, min_pages=5)
+    run_window(ctl, clock, cpu, pages=3, cpu_seconds=1)
+    assert ctl.limit == 2 and ctl._window_pages == 3
+
+
+def test_bounds_are_respected():
+    ctl, clock, cpu, _ = controller(start_workers=3, max_workers=3, min_workers=2)
+    run_window(ctl, clock, cpu, pages=10, cpu_seconds=1)
+    assert ctl.limit == 3
+    run_window(ctl, clock, cpu, pages=10, cpu_seconds=1, switches=1000)
+    assert ctl.limit == 2
+
+
+def test_slot_limits_concurrency_and_honours_cancel():
+    ctl, _, _, _ = controller(start_workers=1)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with ctl.slot():
+            entered.set()
+            release.wait(5)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    entered.wait(5)
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+    t0 = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        with ctl.slot(token=token):
+            pass
+    assert time.monotonic() - t0 < 2
+    assert ctl.snapshot()["waiting"] == 0
+    release.set()
+    t.join(5)
+    assert ctl.snapshot()["running"] == 0
+
+
+def test_runner_passes_thread_limit(tmp_path, monkeypatch):
+    script = tmp_path / "tesseract"
+    script.write_text("#!/bin/sh\nprintf 'threads=%s' \"$OMP_THREAD_LIMIT\"\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(pytesseract.pytesseract, "tesseract_cmd", str(script))
+    ctl, _, _, _ = controller(start_workers=4)
+    monkeypatch.setattr(tesseract_runner, "_limiter", ctl)
+    assert tesseract_runner.image_to_string(Image.new("L", (20, 20), 255)) == "threads=2"
+    assert ctl._window_pages == 1
@@ -0,0 +1,35 @@
+# tests/test_page_cache.py
+import numpy as np
+
+from src.ocr.page_cache import PageArtifactCache, file_sha256
+
+
+def test_put_then_get_is_memory_mapped(tmp_path):
+    cache = PageArtifactCache(str(tmp_path))
+    page = np.arange(200 * 100, dtype=np.uint32).reshape(200, 100).astype(np.uint8)
+    assert cache.get("ab" * 32, 1, 300) is None
+    cache.put("ab" * 32, 1, 300, page)
+    got = cache.get("ab" * 32, 1, 300)
+    assert isinstance(got, np.memmap)
+    assert np.array_equal(got, page)
+    assert cache.get("ab" * 32, 1, 200) is None      # DPI is part of the key
+    assert cache.stats()["hits"] == 1
+
+
+def test_eviction_keeps_size_bound(tmp_path):
+    page = np.zeros((100, 100), dtype=np.uint8)
+    cache = PageArtifactCache(str(tmp_path), max_bytes=25_000)
+    for i in range(1, 5):
+        cache.put("cd" * 32, i, 300, page)
+    assert cache.stats()["bytes"] <= 25_000
+    assert cache.get("cd" * 32, 1, 300) is None       # oldest evicted
+    assert cache.get("cd" * 32, 4, 300) is not None
+    # a fresh instance sees the same files
+    assert PageArtifactCache(str(tmp_path), max_bytes=25_000).stats()["entries"] == cache.stats()["entries"]
+
+
+def test_file_sha256(tmp_path):
+    p = tmp_path / "a.pdf"
+    p.write_bytes(b"%PDF-1.4 test")
+    assert file_sha256(str(p)) == file_sha256(str(p))
+    assert len(file_sha256(str(p))) == 64
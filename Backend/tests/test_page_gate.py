@@ -0,0 +1,75 @@
+# tests/test_page_gate.py
+import numpy as np
+import cv2
+from PIL import Image
+
+from src.ocr.page_gate import PageGate, OK, BLANK, UNREADABLE
+
+
+def _paper(level=245, noise=5, seed=0):
+    rng = np.random.default_rng(seed)
+    page = np.full((1650, 1275), level, np.float32) + rng.normal(0, noise, (1650, 1275))
+    return np.clip(page, 0, 255).astype(np.uint8)
+
+
+def _text_page(ink=20, lines=30):
+    page = _paper()
+    for k in range(lines):
+        cv2.putText(page, "Rx: Prednisone 20 mg twice daily", (60, 80 + 48 * k),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, ink, 2)
+    return page
+
+
+def test_text_page_passes():
+    gate = PageGate()
+    assert gate.assess(_text_page())["verdict"] == OK
+    assert gate.assess(Image.fromarray(_text_page()))["verdict"] == OK
+
+
+def test_sparse_text_is_not_blank():
+    assert PageGate().assess(_text_page(lines=2))["verdict"] == OK
+
+
+def test_single_line_or_signature_is_not_blank():
+    line = _paper()
+    cv2.putText(line, "Refill: 2 times", (100, 800), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 20, 1)
+    signature = _paper()
+    cv2.line(signature, (700, 1400), (1100, 1400), 30, 1)
+    for page in (line, signature):
+        assert PageGate().assess(page)["verdict"] != BLANK
+
+
+def test_blank_page_skipped():
+    res = PageGate().assess(_paper(noise=8))
+    assert res["verdict"] == BLANK
+    assert res["metrics"]["ink_pixels"] < 20
+    specks = _paper(noise=8)
+    specks[100:102, 100:102] = 0
+    assert PageGate().assess(specks)["verdict"] == BLANK
+
+
+def test_dark_page_unreadable():
+    res = PageGate().assess(_paper(level=20))
+    assert res["verdict"] == UNREADABLE
+    assert "dark" in res["reason"]
+
+
+def test_washed_out_text_unreadable():
+    res = PageGate().assess(_text_page(ink=225))
+    assert res["verdict"] == UNREADABLE
+    assert "contrast" in res["reason"]
+
+
+def test_blurred_page_unreadable():
+    res = PageGate().assess(cv2.GaussianBlur(_text_page(), (0, 0), 15))
+    assert res["verdict"] == UNREADABLE
+    assert "blur" in res["reason"]
+
+
+def test_off_unless_enabled_from_env(monkeypatch):
+    monkeypatch.delenv("PAGE_GATE_ENABLED", raising=False)
+    assert PageGate.from_env() is None
+    monkeypatch.setenv("PAGE_GATE_ENABLED", "1")
+    monkeypatch.setenv("PAGE_GATE_BLANK_INK_PIXELS", "100000")
+    monkeypatch.setenv("PAGE_GATE_MIN_CONTRAST", "256")
+    assert PageGate.from_env().assess(_text_page(lines=2))["verdict"] == BLANK
@@ -0,0 +1,76 @@
+# tests/test_page_hash.py
+import os
+
+import numpy as np
+
+from src.ocr.page_hash import PageHashIndex, dhash, hamming
+
+
+def _page(seed: int = 0, noise: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    img = np.full((600, 400), 255, dtype=np.uint8)
+    # a few dark "text blocks" at seed-dependent positions
+    for _ in range(12):
+        y, x = rng.integers(0, 560), rng.integers(0, 300)
+        img[y:y + 30, x:x + 90] = 0
+    if noise:
+        jitter = np.random.default_rng(seed + 1000).integers(-noise, noise + 1, img.shape)
+        img = np.clip(img.astype(np.int16) + jitter, 0, 255).astype(np.uint8)
+    return img
+
+
+def test_dhash_is_stable_under_noise():
+    a = dhash(_page(1))
+    b = dhash(_page(1, noise=20))
+    c = dhash(_page(2))
+    assert hamming(a, b) <= 12
+    assert hamming(a, c) > 12
+
+
+def test_index_reuses_text_for_near_duplicate():
+    idx = PageHashIndex(max_distance=12, match="near")
+    idx.add(idx.hash_page(_page(1)), "Name: Marta Sharapova")
+    match = idx.lookup(idx.hash_page(_page(1, noise=20)))
+    assert match is not None
+    assert match.text == "Name: Marta Sharapova"
+    assert match.to_dict()["match_distance"] == match.distance
+    assert idx.lookup(idx.hash_page(_page(2))) is None
+
+
+def test_default_only_reuses_text_of_the_same_page():
+    idx = PageHashIndex(max_distance=12)
+    idx.add(idx.hash_page(_page(1)), "Name: Marta Sharapova")
+    # same template, different handwriting: the dHash alone would match
+    other = _page(1)
+    other[5:15, 5:60] = 0
+    assert hamming(idx.hash_page(other).dhash, idx.hash_page(_page(1)).dhash) <= 12
+    assert idx.lookup(idx.hash_page(other)) is None
+    assert idx.lookup(idx.hash_page(_page(1, noise=20))) is None
+    match = idx.lookup(idx.hash_page(_page(1)))
+    assert match.text == "Name: Marta Sharapova" and match.to_dict()["match_exact"]
+
+
+def test_pages_sharing_a_dhash_keep_their_own_text():
+    idx = PageHashIndex()
+    a, b = _page(1), _page(1)
+    b[300, 200] = 128
+    assert idx.hash_page(a).dhash == idx.hash_page(b).dhash
+    idx.add(idx.hash_page(a), "Name: Jane Doe")
+    idx.add(idx.hash_page(b), "Name: John Roe")
+    assert len(idx) == 2
+    assert idx.lookup(idx.hash_page(a)).text == "Name: Jane Doe"
+    assert idx.lookup(idx.hash_page(b)).text == "Name: John Roe"
+
+
+def test_index_is_bounded_and_persisted(tmp_path):
+    path = str(tmp_path / "hashes.jsonl")
+    idx = PageHashIndex(max_entries=2, path=path)
+    for seed in range(3):
+        idx.add(idx.hash_page(_page(seed)), f"page {seed}")
+    assert len(idx) == 2
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    reloaded = PageHashIndex(max_entries=2, path=path)
+    assert len(reloaded) == 2
+    assert reloaded.lookup(reloaded.hash_page(_page(2))).text == "page 2"
+    # the pixel digest is persisted too, so a reloaded index still confirms
+    assert reloaded.lookup(reloaded.hash_page(_page(2, noise=20))) is None
@@ -0,0 +1,32 @@
+# tests/test_parser_limits.py
+import time
+
+from src.parsers.prescription_parser import PrescriptionParser, clean_ocr_text, MAX_LINE_CHARS
+
+
+def test_long_digit_run_is_fast():
+    # the unanchored "(\d+)\s+me" cleanup was quadratic here (~5s at 20k digits)
+    text = "Name: Marta Sharapova\n" + "1" * 200000 + " x\nPrednisone 20 me\n"
+    t0 = time.perf_counter()
+    res = PrescriptionParser(text).parse()
+    assert time.perf_counter() - t0 < 1.0
+    assert res["patient_name"] == "Marta Sharapova"
+    assert "20 mg" in clean_ocr_text(text)
+
+
+def test_lines_are_capped():
+    cleaned = clean_ocr_text("a" * (MAX_LINE_CHARS * 3) + "\nRefill: 2")
+    assert [len(ln) for ln in cleaned.split("\n")] == [MAX_LINE_CHARS, len("Refill: 2")]
+
+
+def test_budget_exhausted_returns_partial_with_warning():
+    res = PrescriptionParser("Name: Marta Sharapova\nPrednisone 20 mg\nRefill: 2", budget_seconds=0).parse()
+    assert res["medicines"] == [] and res["refills"] == 0 and res["patient_name"] is None
+    assert any("budget" in w for w in res["warnings"])
+
+
+def test_normal_document_unchanged_within_budget():
+    res = PrescriptionParser("Name: Marta Sharapova Date: 5/11/2022\nPrednisone 20 mg\nRefill: 2").parse()
+    assert res["warnings"] == []
+    assert res["refills"] == 2
+    assert {"name": "Prednisone", "strength": "20 mg", "directions": ""} in res["medicines"]
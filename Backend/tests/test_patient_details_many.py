@@ -0,0 +1,45 @@
+# tests/test_patient_details_many.py
+from src.models.patient_details import PatientDetails, Medicine, parse_date
+
+RECORDS = [
+    {
+        "patient_name": "Adarta  Sharapova Date",
+        "date": "wfil/2022",
+        "patient_address": "9 tennis court,  new Russia, DC.",
+        "medicines": [{"name": " Prednisone ", "strength": "20  mg", "directions": "Taper 5 mg\nevery 3 days"}],
+        "refills": "2",
+    },
+    {"patient_name": "Virat Kohli", "date": "2/05/2022", "medicines": ["Omeprazole"], "refills": 3},
+    {},
+]
+
+
+def test_from_extractor_many_matches_per_record_path():
+    batch = PatientDetails.from_extractor_many(RECORDS)
+    assert len(batch) == len(RECORDS)
+    for rec, p in zip(RECORDS, batch):
+        assert p.to_dict() == PatientDetails.from_extractor(rec).to_model().dict()
+
+
+def test_batch_normalizes_fields():
+    p = PatientDetails.from_extractor_many(RECORDS)[0]
+    assert p.patient_name == "Adarta Sharapova"
+    assert p.parsed_date == "2022-01-01"
+    assert p.patient_address == "9 tennis court, new Russia, DC"
+    assert p.medicines[0] == Medicine("Prednisone", "20 mg", "Taper 5 mg every 3 days")
+
+
+def test_parse_date_formats():
+    assert parse_date("5/11/2022") == "2022-11-05"
+    assert parse_date("05-11-22") == "2022-11-05"
+    assert parse_date("1/1/99") == "1999-01-01"
+    assert parse_date("2021-04-01") == "2021-04-01"
+    assert parse_date("Jan 3, 2020") == "2020-01-03"
+    assert parse_date("31/02/2022") == "2022-01-01"
+    assert parse_date("no date") is None
+
+
+def test_records_use_slots():
+    p = PatientDetails.from_extractor(RECORDS[1])
+    assert not hasattr(p, "__dict__")
+    assert not hasattr(p.medicines[0], "__dict__")
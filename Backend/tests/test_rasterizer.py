@@ -0,0 +1,81 @@
+# tests/test_rasterizer.py
+import os
+
+import pytest
+
+from src.ocr import rasterizer
+from src.ocr.rasterizer import PdfiumRasterizer, PopplerRasterizer, make_rasterizer
+from src.runtime.cancellation import OperationCancelled
+
+PDF = os.path.join(os.path.dirname(__file__), "..", "pre_1.pdf")
+
+
+def test_selection():
+    assert isinstance(make_rasterizer("poppler", "/opt/poppler"), PopplerRasterizer)
+    assert make_rasterizer("poppler", "/opt/poppler").poppler_path == "/opt/poppler"
+    with pytest.raises(ValueError):
+        make_rasterizer("ghostscript")
+
+
+def test_auto_uses_poppler(monkeypatch):
+    assert make_rasterizer("auto").name == "poppler"
+    monkeypatch.setattr(rasterizer, "pdfium", None)
+    with pytest.raises(rasterizer.RasterizerUnavailable):
+        make_rasterizer("pdfium")
+
+
+def test_poppler_layout_reads_every_page_size(monkeypatch):
+    import pdf2image
+    info = {"Pages": 3, "Page    1 size": "612 x 792 pts (letter)",
+            "Page    2 size": "1224 x 792 pts (tabloid)", "Page    3 size": "garbled"}
+    monkeypatch.setattr(pdf2image, "pdfinfo_from_path", lambda path, **kw: info)
+    assert PopplerRasterizer().layout(PDF) == (3, [(612.0, 792.0), (1224.0, 792.0), (1224.0, 792.0)])
+
+
+def _fake_pdftoppm(tmp_path, body):
+    script = tmp_path / "pdftoppm"
+    script.write_text("#!/bin/sh\n" + body)
+    script.chmod(0o755)
+    return PopplerRasterizer(str(tmp_path))
+
+
+def test_poppler_renders_the_page_from_pdftoppm_stdout(tmp_path):
+    r = _fake_pdftoppm(tmp_path, 'echo "$@" > "$(dirname "$0")/args"\nprintf "P6\\n2 1\\n255\\n\\377\\0\\0\\0\\0\\377"\n')
+    (page,) = r.render(PDF, 3, 150)
+    assert page.size == (2, 1) and page.getpixel((0, 0)) == (255, 0, 0)
+    assert (tmp_path / "args").read_text().split() == ["-r", "150", "-f", "3", "-l", "3", PDF]
+
+
+def test_cancelling_the_token_kills_pdftoppm(tmp_path):
+    import threading
+    import time
+    from src.runtime.cancellation import CancelToken
+    r = _fake_pdftoppm(tmp_path, "sleep 30\n")
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel, args=("client disconnected",)).start()
+    t0 = time.monotonic()
+    with pytest.raises(OperationCancelled, match="client disconnected"):
+        r.render(PDF, 1, 150, token=token)
+    assert time.monotonic() - t0 < 5
+    with pytest.raises(OperationCancelled, match="deadline"):
+        r.render(PDF, 1, 150, timeout=0.2)
+
+
+def test_pdfium_renders_gray_pages():
+    pytest.importorskip("pypdfium2")
+    r = make_rasterizer("pdfium")
+    assert r.name == "pdfium" and r.gray
+    count, sizes = r.layout(PDF)
+    assert count == 1 and sizes == [(612.0, 792.0)]
+    (page,) = r.render(PDF, 1, 100)
+    assert page.ndim == 2 and page.dtype.name == "uint8"
+    assert abs(page.shape[0] - 1100) <= 1 and abs(page.shape[1] - 850) <= 1
+    assert page.min() < 128 < page.max()
+
+
+def test_pdfium_lock_wait_honours_deadline():
+    pytest.importorskip("pypdfium2")
+    r = PdfiumRasterizer()
+    with rasterizer._PDFIUM_LOCK:  # another thread is rendering
+        with pytest.raises(OperationCancelled):
+            r.render(PDF, 1, 50, timeout=0.05)
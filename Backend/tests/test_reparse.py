@@ -0,0 +1,95 @@
+# tests/test_reparse.py
+import json
+
+import pytest
+
+from src.store.jsonl_store import JsonlStore, StoreBusy
+from src.store.reparse import reparse_store
+
+
+def fake_extract(text):
+    if text == "boom":
+        raise ValueError(text)
+    name, _, drug = text.partition("|")
+    return {"patient_name": name, "medicines": [{"name": drug, "strength": "", "directions": ""}]}
+
+
+def _fill(store):
+    ids = {}
+    for key, rec in {
+        "stale": {"patient_name": "old", "raw_text": "Jane Doe|Amoxicillin", "warnings": ["ocr warning"]},
+        "current": {"patient_name": "kept", "raw_text": "X|Y", "_parser_version": 2},
+        "same": {"patient_name": "Ann", "medicines": [{"name": "Z", "strength": "", "directions": ""}],
+                 "raw_text": "Ann|Z", "_parser_version": 1},
+        "no_text": {"patient_name": "no text"},
+        "failing": {"patient_name": "old", "raw_text": "boom"},
+    }.items():
+        ids[key] = store.append(rec)["_id"]
+    return ids
+
+
+def _by_id(store):
+    return {r["_id"]: r for r in store.iter_records()}
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_reparse_upgrades_stale_records_in_place(tmp_path, workers):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    ids = _fill(store)
+    with open(store.path, "a") as f:
+        f.write("not json\n")
+    res = reparse_store(store, fake_extract, version=2, workers=workers)
+    assert (res["records"], res["changed"], res["reparsed"], res["kept"]) == (6, 1, 1, 1)
+    assert (res["no_text"], res["failed"], res["invalid"]) == (1, 1, 1)
+    assert res["records_per_second"] > 0
+
+    recs = _by_id(store)
+    stale = recs[ids["stale"]]
+    assert stale["patient_name"] == "Jane Doe"
+    assert stale["medicines"][0]["name"] == "Amoxicillin"
+    assert stale["warnings"] == ["ocr warning"]
+    assert stale["_parser_version"] == 2 and "_reparsed_ts" in stale
+    assert recs[ids["current"]]["patient_name"] == "kept"
+    assert recs[ids["same"]]["_parser_version"] == 2
+    assert "_parser_version" not in recs[ids["no_text"]]
+    assert recs[ids["failing"]]["patient_name"] == "old"
+    assert [r["_id"] for r in store.iter_records()] == list(ids.values())
+    assert open(store.path).read().endswith("not json\n")
+
+    again = reparse_store(store, fake_extract, version=2, workers=0)
+    assert again["reparsed"] + again["changed"] == 0
+    forced = reparse_store(store, fake_extract, version=2, workers=0, force=True)
+    assert (forced["reparsed"], forced["changed"]) == (2, 1)
+
+
+def test_rewrite_keeps_records_appended_meanwhile(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    store.append({"n": 1})
+    store.append({"n": 2})
+
+    def transform(lines):
+        store.append({"n": 3})  # arrives while the rewrite runs
+        for line in lines:
+            rec = json.loads(line)
+            rec["n"] *= 10
+            yield json.dumps(rec) + "\n"
+
+    assert store.rewrite(transform)
+    assert [r["n"] for r in store.iter_records()] == [10, 20, 3]
+    assert not (tmp_path / "store.jsonl.rewrite").exists()
+
+
+def test_rewrite_leaves_torn_line_and_refuses_concurrent_rewrite(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    store.append({"n": 1})
+    with open(store.path, "a") as f:
+        f.write('{"n": 2')
+
+    def nested(lines):
+        with pytest.raises(StoreBusy):
+            store.rewrite(lambda ls: ls)
+        yield from lines
+
+    store.rewrite(nested)
+    assert open(store.path).read().endswith('{"n": 2')
+    assert not JsonlStore(str(tmp_path / "missing.jsonl")).rewrite(lambda ls: ls)
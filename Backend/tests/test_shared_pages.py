@@ -0,0 +1,80 @@
+# tests/test_shared_pages.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.ocr.pool_worker import PageSettings, init_worker, ocr_shared_page
+from src.runtime.shared_pages import SharedPageSet, attach, live_segments
+
+
+def page_sum(ref):
+    with attach(ref) as page:
+        assert not page.flags.writeable
+        return int(page.sum()), page.shape
+
+
+def _exists(ref):
+    return os.path.exists(os.path.join("/dev/shm", ref.name))
+
+
+def test_worker_reads_page_without_copying_it_through_the_pipe():
+    page = np.arange(300 * 200, dtype=np.uint32).reshape(300, 200).astype(np.uint8)
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        with SharedPageSet() as shared:
+            ref = shared.put(page)
+            assert ref.shape == (300, 200) and ref.dtype == "|u1"
+            assert pool.submit(page_sum, ref).result() == (int(page.sum()), (300, 200))
+            assert pool.submit(page_sum, ref).result()[0] == int(page.sum())
+            shared.release(ref)
+            assert len(shared) == 0
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="no /dev/shm")
+def test_segments_are_unlinked_on_release_and_on_error():
+    before = live_segments()
+    with pytest.raises(RuntimeError):
+        with SharedPageSet() as shared:
+            a = shared.put(np.zeros((10, 10), dtype=np.uint8))
+            b = shared.put(np.ones((4, 4), dtype=np.uint8))
+            assert live_segments() == before + 2 and _exists(a) and _exists(b)
+            shared.release(a)
+            shared.release(a)  # twice is harmless
+            assert not _exists(a) and live_segments() == before + 1
+            raise RuntimeError("request failed")
+    assert not _exists(b)
+    assert live_segments() == before
+
+
+def test_attach_survives_a_view_kept_by_the_caller():
+    with SharedPageSet() as shared:
+        ref = shared.put(np.full((8, 8), 7, dtype=np.uint8))
+        with attach(ref) as page:
+            kept = page[2:4]
+        assert int(kept.sum()) == 7 * 16
+    assert live_segments() == 0
+
+
+def loaded_modules(_):
+    import sys
+    return "app" in sys.modules, os.environ.get("OMP_THREAD_LIMIT")
+
+
+def test_pool_worker_ocrs_a_shared_page_without_importing_the_app(tmp_path):
+    script = tmp_path / "tesseract"
+    script.write_text("#!/bin/sh\necho \"threads=$OMP_THREAD_LIMIT\"\n")
+    script.chmod(0o755)
+    settings = PageSettings("otsu", "--psm 6", 0, 2000, 200, 2)
+    page = np.full((40, 60), 255, dtype=np.uint8)
+    page[10:30, 10:50] = 0
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker, initargs=(str(script),)) as pool:
+        with SharedPageSet() as shared:
+            res = pool.submit(ocr_shared_page, shared.put(page), settings, 30.0, 3).result()
+        assert res["text"].strip() == "threads=3"
+        assert set(res["timings"]) == {"preprocess", "ocr"}
+        cpu_seconds, switches = res["usage"]
+        assert cpu_seconds >= 0 and switches >= 0
+        assert pool.submit(loaded_modules, None).result() == (False, "3")
@@ -0,0 +1,73 @@
+# tests/test_store_stats.py
+import json
+
+from src.store.jsonl_store import JsonlStore
+from src.store.stats import StoreStats
+
+
+def _rec(meds, refills=0, warnings=()):
+    return {"medicines": [{"name": m} for m in meds], "refills": refills, "warnings": list(warnings)}
+
+
+def test_catch_up_reads_only_new_complete_lines(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    stats = StoreStats(store)
+    store.append(_rec(["Amoxicillin"], refills=2, warnings=["blurry"]))
+    assert not stats.catch_up(backfill=False)  # write path never backfills
+    assert stats.catch_up()
+    store.append(_rec(["amoxicillin ", "Ibuprofen"]))
+    with open(store.path, "a") as f:
+        f.write('{"medicines": [')  # still being written
+    assert stats.catch_up(backfill=False)
+    snap = stats.snapshot(top=1)
+    assert snap["records"] == 2
+    assert snap["top_medicines"] == [{"name": "amoxicillin", "count": 2}]
+    assert snap["refills"] == {"total": 2, "average": 1.0}
+    assert snap["warnings"]["rate"] == 0.5
+    assert snap["per_day"][0]["count"] == 2
+    assert stats.snapshot(top=1) is snap
+    assert not stats.catch_up()
+
+
+def test_rewrite_rebuilds_the_aggregates(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    stats = StoreStats(store)
+    store.append(_rec(["A"]))
+    store.append(_rec(["B"]))
+    stats.catch_up()
+    store.rewrite(lambda lines: (line.replace('"B"', '"C"') for line in lines))
+    assert stats.catch_up()
+    assert {m["name"] for m in stats.snapshot()["top_medicines"]} == {"a", "c"}
+
+
+def test_saved_state_avoids_a_second_backfill(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    state = str(tmp_path / "stats.json")
+    store.append(_rec(["A"]))
+    StoreStats(store, state_path=state, save_interval=0).catch_up()
+    assert json.load(open(state))["records"] == 1
+
+    # the saved offset is trusted: a record slipped in before it is not re-read
+    lines = open(store.path).read()
+    with open(store.path, "w") as f:
+        f.write(lines.replace('"A"', '"Z"'))
+    store.append(_rec(["B"]))
+    restarted = StoreStats(store, state_path=state, save_interval=0)
+    restarted.catch_up()
+    assert {m["name"] for m in restarted.snapshot()["top_medicines"]} == {"a", "b"}
+    assert restarted.snapshot()["records"] == 2
+
+
+def test_write_path_never_waits_or_rebuilds(tmp_path):
+    store = JsonlStore(str(tmp_path / "store.jsonl"))
+    stats = StoreStats(store)
+    store.append(_rec(["A"]))
+    stats.catch_up()
+    store.append(_rec(["B"]))
+    with stats._lock:  # e.g. a /stats backfill in progress
+        assert not stats.catch_up(backfill=False)
+    store.rewrite(lambda lines: lines)
+    assert not stats.catch_up(backfill=False)
+    assert stats.snapshot()["records"] == 1
+    assert stats.catch_up()
+    assert stats.snapshot()["records"] == 2
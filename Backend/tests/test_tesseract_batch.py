@@ -0,0 +1,65 @@
+# tests/test_tesseract_batch.py
+import numpy as np
+import pytest
+import pytesseract
+from PIL import Image
+
+from src.ocr import tesseract_runner
+from src.ocr.tesseract_runner import PageBatch, TesseractError, split_pages, write_page
+
+
+@pytest.fixture
+def list_tesseract(tmp_path, monkeypatch):
+    """Fake tesseract: one '<file> <header>' line per listed page, pages separated by form feeds."""
+    calls = tmp_path / "calls"
+    script = tmp_path / "tesseract"
+    script.write_text(
+        "#!/bin/sh\n"
+        f"echo x >> {calls}\n"
+        "case \"$1\" in *.txt) ;; *) head -c 2 \"$1\"; printf '\\f'; exit 0;; esac\n"
+        "while read -r f; do printf '%s ' \"$(basename \"$f\")\"; head -c 2 \"$f\"; printf '\\f'; done < \"$1\"\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setattr(pytesseract.pytesseract, "tesseract_cmd", str(script))
+    return calls
+
+
+def _binary_page(seed):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(((rng.random((60, 40)) > 0.5) * 255).astype(np.uint8))
+
+
+def test_write_page_formats(tmp_path):
+    page = _binary_page(0)
+    path = write_page(page, str(tmp_path / "a"))
+    assert path.endswith(".pbm")
+    assert (np.asarray(Image.open(path).convert("L")) == np.asarray(page)).all()
+    gray = Image.fromarray(np.arange(2400, dtype=np.uint8).reshape(60, 40))
+    assert write_page(gray, str(tmp_path / "b")).endswith(".pgm")
+
+
+def test_batch_runs_one_process_and_splits_pages(list_tesseract):
+    pages = [_binary_page(i) for i in range(3)] + [Image.fromarray(np.full((60, 40), 128, np.uint8))]
+    texts = tesseract_runner.images_to_strings(pages)
+    assert texts == ["p00000.pbm P4", "p00001.pbm P4", "p00002.pbm P4", "p00003.pgm P5"]
+    assert list_tesseract.read_text().count("x") == 1
+
+
+def test_single_page_uses_pnm(list_tesseract):
+    assert tesseract_runner.image_to_string(_binary_page(1)) == "P4\f"
+
+
+def test_batch_is_cleaned_up_and_empty_batch_skips_tesseract(list_tesseract):
+    with PageBatch() as batch:
+        assert batch.run() == []
+        batch.add(_binary_page(2))
+        root = batch._td.name
+    import os
+    assert not os.path.exists(root)
+    assert not list_tesseract.exists()
+
+
+def test_split_pages_checks_count():
+    assert split_pages("a\fb\f", 2) == ["a", "b"]
+    with pytest.raises(TesseractError):
+        split_pages("a\fb\fc\f", 2)
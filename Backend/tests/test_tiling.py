@@ -0,0 +1,71 @@
+# tests/test_tiling.py
+import numpy as np
+from PIL import Image
+
+from src.ocr.tiling import merge_strip_texts, ocr_tiled, strip_bounds, top_band
+
+
+def _lined_page(n_lines=60, line_h=30, gap=26, width=400):
+    """White page with n text-like bands; band k is drawn in grey level k (so it can be 'read')."""
+    page = np.full(((line_h + gap) * n_lines + gap, width), 255, np.uint8)
+    for k in range(n_lines):
+        top = gap + k * (line_h + gap)
+        page[top:top + line_h, 20:width - 20] = k
+    return page
+
+
+def _fake_ocr(strip: Image.Image) -> str:
+    """'Read' every band in the strip; bands cut by the strip edge come out garbled."""
+    a = np.asarray(strip)
+    dark = a[:, 200] < 128
+    lines, row = [], 0
+    while row < len(dark):
+        if not dark[row]:
+            row += 1
+            continue
+        end = row
+        while end < len(dark) and dark[end]:
+            end += 1
+        cut = row == 0 or end == len(dark)
+        k = int(a[row, 200])
+        lines.append(f"~{k}?" if cut and end - row < 30 else f"Line {k}: Amoxicillin 500 mg")
+        row = end
+    return "\n".join(lines) + "\n"
+
+
+def test_strip_edges_fall_between_lines():
+    page = _lined_page()
+    bounds = strip_bounds(page, strip_height=700, overlap=120)
+    assert bounds[0][0] == 0 and bounds[-1][1] == page.shape[0]
+    for (t0, b0), (t1, b1) in zip(bounds, bounds[1:]):
+        assert t1 < b0  # strips overlap
+        assert page[b0 - 1, 200] == 255 and page[t1, 200] == 255
+
+
+def test_tiled_text_matches_lines_once():
+    page = _lined_page()
+    text, n = ocr_tiled(Image.fromarray(page), _fake_ocr, strip_height=700, overlap=120, workers=3)
+    assert n > 1
+    assert text.rstrip("\n").split("\n") == [f"Line {k}: Amoxicillin 500 mg" for k in range(60)]
+
+
+def test_small_page_is_single_call():
+    page = _lined_page(n_lines=5)
+    whole = _fake_ocr(Image.fromarray(page))
+    assert ocr_tiled(Image.fromarray(page), _fake_ocr, strip_height=2000, overlap=200) == (whole, 1)
+
+
+def test_merge_tolerates_ocr_noise_in_overlap():
+    a = "Patient: Jane Doe\nAddress: 12 Main St\nRx: Lisinopril 10 mg"
+    b = "Address: 12 Main St.\nRx: Lisinopri1 10 mg\n\nDirections: once daily"
+    assert merge_strip_texts([a, b]) == (
+        "Patient: Jane Doe\nAddress: 12 Main St\nRx: Lisinopril 10 mg\n\nDirections: once daily")
+    assert merge_strip_texts(["one\ntwo", "three"]) == "one\ntwo\nthree"
+
+
+def test_top_band_cuts_between_lines():
+    page = _lined_page()
+    band = top_band(Image.fromarray(page), fraction=0.25, window=60)
+    h = band.height
+    assert abs(h - page.shape[0] * 0.25) <= 61
+    assert page[h - 1, 200] == 255
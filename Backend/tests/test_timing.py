@@ -0,0 +1,42 @@
+# tests/test_timing.py
+import time
+
+from src.runtime.timing import RequestTimer
+from src.runtime.profiler import run_profiled
+
+
+def test_timer_totals_and_pages():
+    t = RequestTimer()
+    t.add("upload", 0.010)
+    t.add("queue", 0.005)
+    t.add("ocr", 0.200, page=1)
+    t.add("ocr", 0.100, page=2)
+    with t.span("parse"):
+        pass
+    d = t.to_dict()
+    assert d["upload_ms"] == 10.0
+    assert d["ocr_ms"] == 300.0
+    assert d["rasterize_ms"] == 0.0
+    assert [p["page"] for p in d["pages"]] == [1, 2]
+    assert d["pages"][0]["ocr_ms"] == 200.0
+    header = t.server_timing()
+    assert d["queue_ms"] == 5.0
+    assert header.startswith("upload;dur=10.0, queue;dur=5.0, ocr;dur=300.0")
+    assert "ocr-p2;dur=100.0" in header
+    assert header.split(", ")[-1].startswith("total;dur=")
+
+
+def _busy():
+    end = time.perf_counter() + 0.1
+    data = []
+    while time.perf_counter() < end:
+        data.append(bytearray(1024))
+    return len(data)
+
+
+def test_run_profiled_reports_samples_and_peak():
+    result, report = run_profiled(_busy)
+    assert result > 0
+    assert report["samples"] > 0
+    assert report["process_tracemalloc_peak_bytes"] > 0
+    assert report["top_self"][0]["frame"].startswith("_busy (test_timing.py:")
@@ -0,0 +1,72 @@
+# tests/test_uploads.py
+import os
+import time
+
+import pytest
+
+from src.jobs.uploads import UploadSpool, UploadError
+
+
+def test_chunks_append_at_offsets(tmp_path):
+    spool = UploadSpool(str(tmp_path / "up"))
+    data = os.urandom(5000)
+    uid = spool.create(len(data), {"filename": "scan.pdf"})
+    with spool.writer(uid, 0) as write:
+        write(data[:1200])
+        write(data[1200:2000])
+    assert spool.info(uid)["offset"] == 2000
+
+    with pytest.raises(UploadError) as e:
+        with spool.writer(uid, 1000):
+            pass
+    assert e.value.status_code == 409
+
+    with pytest.raises(UploadError) as e:
+        with spool.writer(uid, 2000) as write:
+            write(data[2000:] + b"extra")
+    assert e.value.status_code == 413
+    assert spool.info(uid)["offset"] == 2000
+
+    with spool.writer(uid, 2000) as write:
+        write(data[2000:])
+    dest = str(tmp_path / "done.pdf")
+    info = spool.take(uid, dest)
+    assert info["metadata"] == {"filename": "scan.pdf"}
+    assert open(dest, "rb").read() == data
+    with pytest.raises(UploadError):
+        spool.info(uid)
+
+
+def test_one_writer_per_upload(tmp_path):
+    spool = UploadSpool(str(tmp_path / "up"))
+    uid = spool.create(10)
+    with spool.writer(uid, 0):
+        with pytest.raises(UploadError) as e:
+            with spool.writer(uid, 0):
+                pass
+        assert e.value.status_code == 409
+
+
+def test_incomplete_take_and_limits(tmp_path):
+    spool = UploadSpool(str(tmp_path / "up"), max_bytes=100)
+    uid = spool.create(50)
+    with pytest.raises(UploadError) as e:
+        spool.take(uid, str(tmp_path / "x.pdf"))
+    assert e.value.status_code == 409
+    with pytest.raises(UploadError) as e:
+        spool.create(101)
+    assert e.value.status_code == 413
+    with pytest.raises(UploadError) as e:
+        spool.info("../../etc/passwd")
+    assert e.value.status_code == 404
+
+
+def test_purge_removes_abandoned_uploads(tmp_path):
+    spool = UploadSpool(str(tmp_path / "up"), ttl_seconds=60)
+    old = spool.create(10)
+    fresh = spool.create(10)
+    stale = time.time() - 3600
+    for p in spool._paths(old):
+        os.utime(p, (stale, stale))
+    assert spool.purge() == 1
+    assert sorted(os.listdir(spool.root)) == sorted([fresh + ".json", fresh + ".part"])
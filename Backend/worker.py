@@ -0,0 +1,98 @@
+"""
+worker.py - standalone OCR worker
+
+Usage:
+    python worker.py [--threads N] [--poll SECONDS] [--once]
+
+Claims extraction jobs from the shared queue (JOB_QUEUE_DB / JOB_SPOOL_DIR,
+see src/jobs/queue.py), runs the same pipeline as /extract (pipeline.py;
+the API module itself is never imported) and stores the
+result for the API to serve from GET /jobs/{id}.
+Run as many workers (processes, pods, nodes) as the OCR load needs; the
+API nodes started with OCR_MODE=queue only enqueue and read results.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+from pipeline import (extract_pdf_file, set_external_binaries, OcrOptions,
+                      EXTRACT_TIMEOUT_SECONDS, EXTRACT_MAX_TIMEOUT_SECONDS)
+from src.jobs.queue import JobQueue
+from src.runtime.cancellation import CancelToken
+from src.runtime.memory_governor import MemoryBudgetExceeded
+
+STOP = threading.Event()
+
+
+def run_job(queue: JobQueue, job, worker_id: str) -> None:
+    timeout = job["options"].get("timeout") or EXTRACT_TIMEOUT_SECONDS
+    token = CancelToken(min(float(timeout), EXTRACT_MAX_TIMEOUT_SECONDS))
+    done = threading.Event()
+
+    def heartbeat():
+        # renew the lease; if another worker took the job over, stop working on it
+        while not done.wait(queue.lease_seconds / 3.0):
+            if not queue.heartbeat(job["id"], worker_id):
+                token.cancel("lease lost")
+                return
+
+    hb = threading.Thread(target=heartbeat, daemon=True)
+    hb.start()
+    try:
+        options = OcrOptions(fields=tuple(job["options"].get("fields") or ()) or None)
+        result = extract_pdf_file(job["payload_path"], set_external_binaries(), token, options=options)
+        if token.reason == "lease lost" or not queue.complete(job["id"], worker_id, result):
+            print(f"[WARN] {job['id']}: lease lost to another worker, result dropped")
+            return
+    except MemoryBudgetExceeded:
+        # not the job's fault: hand it back for a later try without using up an attempt
+        queue.release(job["id"], worker_id)
+        print(f"[WARN] {job['id']}: memory budget exhausted, job requeued for {queue.retry_delay:g}s later")
+    except Exception:
+        print(f"=== JOB {job['id']} FAILED ===")
+        print(traceback.format_exc())
+        queue.fail(job["id"], worker_id, "extraction failed; see worker logs")
+    finally:
+        done.set()
+        token.close()
+
+
+def worker_loop(queue: JobQueue, worker_id: str, poll: float, once: bool = False) -> None:
+    while not STOP.is_set():
+        job = queue.claim(worker_id)
+        if job is None:
+            if once:
+                return
+            STOP.wait(poll)
+            continue
+        print(f"[INFO] {worker_id} took job {job['id']} (attempt {job['attempts']})")
+        run_job(queue, job, worker_id)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="OCR worker")
+    ap.add_argument("--threads", type=int, default=int(os.environ.get("WORKER_THREADS", "1")))
+    ap.add_argument("--poll", type=float, default=float(os.environ.get("WORKER_POLL_SECONDS", "1.0")))
+    ap.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = ap.parse_args(argv)
+
+    queue = JobQueue.from_env()
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    signal.signal(signal.SIGTERM, lambda *_: STOP.set())
+    signal.signal(signal.SIGINT, lambda *_: STOP.set())
+
+    threads = [threading.Thread(target=worker_loop, args=(queue, f"{base_id}:{i}", args.poll, args.once))
+               for i in range(max(1, args.threads))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        while t.is_alive():
+            t.join(0.5)
+
+
+if __name__ == "__main__":
+    main()